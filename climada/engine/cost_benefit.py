@@ -23,7 +23,9 @@ __all__ = ['CostBenefit', 'risk_aai_agg', 'risk_rp_100', 'risk_rp_250']
 
 import copy
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import pandas as pd
 import matplotlib.colors as colors
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle, FancyArrowPatch
@@ -143,7 +145,8 @@ class CostBenefit():
         self.imp_meas_present = dict()
 
     def calc(self, hazard, entity, haz_future=None, ent_future=None,
-             future_year=None, risk_func=risk_aai_agg, imp_time_depen=None, save_imp=False):
+             future_year=None, risk_func=risk_aai_agg, imp_time_depen=None, save_imp=False,
+             max_workers=1, delta=False):
         """Compute cost-benefit ratio for every measure provided current
         and, optionally, future conditions. Present and future measures need
         to have the same name. The measures costs need to be discounted by the user.
@@ -170,6 +173,14 @@ class CostBenefit():
                 Default: None.
             save_imp (bool, optional): True if Impact of each measure is saved.
                 Default: False.
+            max_workers (int, optional): number of threads computing the
+                impacts of the measures (of present and future conditions)
+                concurrently. The hazards and exposures are shared, not copied,
+                between the threads. Default: 1
+            delta (bool, optional): compute the impact without measure with its
+                impact matrix and, for the measures which only change impact
+                functions, recompute only the impact of the affected exposures.
+                See Measure.calc_impact. Default: False
         """
         # Present year given in entity. Future year in ent_future if provided.
         self.present_year = entity.exposures.ref_year
@@ -183,32 +194,30 @@ class CostBenefit():
         if future_year is None and ent_future is None:
             future_year = entity.exposures.ref_year
 
+        # (hazard, exposures, measures, impact functions, when) to compute
+        conditions = list()
         if not haz_future and not ent_future:
             self.future_year = future_year
-            self._calc_impact_measures(hazard, entity.exposures,
-                                       entity.measures, entity.impact_funcs, 'future',
-                                       risk_func, save_imp)
+            conditions.append((hazard, entity.exposures, entity.measures,
+                               entity.impact_funcs, 'future'))
         else:
             if imp_time_depen is None:
                 imp_time_depen = 1
-            self._calc_impact_measures(hazard, entity.exposures,
-                                       entity.measures, entity.impact_funcs, 'present',
-                                       risk_func, save_imp)
+            conditions.append((hazard, entity.exposures, entity.measures,
+                               entity.impact_funcs, 'present'))
             if haz_future and ent_future:
                 self.future_year = ent_future.exposures.ref_year
-                self._calc_impact_measures(haz_future, ent_future.exposures,
-                                           ent_future.measures, ent_future.impact_funcs, 'future',
-                                           risk_func, save_imp)
+                conditions.append((haz_future, ent_future.exposures, ent_future.measures,
+                                   ent_future.impact_funcs, 'future'))
             elif haz_future:
                 self.future_year = future_year
-                self._calc_impact_measures(haz_future, entity.exposures,
-                                           entity.measures, entity.impact_funcs, 'future',
-                                           risk_func, save_imp)
+                conditions.append((haz_future, entity.exposures, entity.measures,
+                                   entity.impact_funcs, 'future'))
             else:
                 self.future_year = ent_future.exposures.ref_year
-                self._calc_impact_measures(hazard, ent_future.exposures,
-                                           ent_future.measures, ent_future.impact_funcs, 'future',
-                                           risk_func, save_imp)
+                conditions.append((hazard, ent_future.exposures, ent_future.measures,
+                                   ent_future.impact_funcs, 'future'))
+        self._calc_impact_conditions(conditions, risk_func, save_imp, max_workers, delta)
 
         self._calc_cost_benefit(entity.disc_rates, imp_time_depen)
         self._print_results()
@@ -349,6 +358,116 @@ class CostBenefit():
         if self.imp_meas_present:
             del self.imp_meas_present[meas_name]
 
+    def sweep(self, disc_rates, imp_time_depen=None, future_years=None):
+        """Compute the benefit and cost-benefit ratio of every measure for all
+        the combinations of discount rates, time dependencies and horizons,
+        from the risks computed by calc. The net present values are linear in
+        the yearly values, so that every combination reduces to two
+        discounted sums which are computed for the whole grid at once.
+
+        Parameters:
+            disc_rates (DiscRates or list(DiscRates)): discount rates curves.
+                They need to cover all the years from present_year to the
+                largest future year.
+            imp_time_depen (float or list(float), optional): parameters
+                representing the time evolution of impact. None is interpreted
+                as in calc. Default: None
+            future_years (int or list(int), optional): last years of the
+                benefits. The risks of the future conditions are reached that
+                year. Default: future_year
+
+        Returns:
+            pandas.DataFrame with columns: disc_rates (position of the discount
+            rates in the input list), imp_time_depen, future_year, measure,
+            benefit, cost_ben_ratio, risk_transf (discounted risk transfer)
+            and tot_climate_risk. One row per combination and measure.
+        """
+        if not self.imp_meas_future:
+            LOGGER.error('Compute first _calc_impact_measures')
+            raise ValueError
+        if not isinstance(disc_rates, (list, tuple)):
+            disc_rates = [disc_rates]
+        if not isinstance(imp_time_depen, (list, tuple, np.ndarray)):
+            imp_time_depen = [imp_time_depen]
+        if future_years is None:
+            future_years = [self.future_year]
+        future_years = np.array(future_years, int).reshape(-1)
+        if np.any(future_years <= self.present_year):
+            LOGGER.error('Wrong future years %s for present year %s.', future_years,
+                         self.present_year)
+            raise ValueError
+
+        # discount factor of each year: disc_fact[:, 0] = 1
+        years = np.arange(self.present_year, future_years.max() + 1)
+        disc_fact = np.ones((len(disc_rates), years.size))
+        for i_disc, disc in enumerate(disc_rates):
+            sel_disc = disc.select(years)
+            if sel_disc is None:
+                LOGGER.error('No information of discount rates for provided years:'
+                             ' %s - %s', years[0], years[-1])
+                raise ValueError
+            disc_fact[i_disc, 1:] = np.cumprod(1 / (1 + sel_disc.rates[:-1]))
+
+        # time dependency of each exponent, horizon and year (0 after horizon)
+        n_years = future_years - self.present_year + 1
+        in_hor = np.arange(years.size) < n_years[:, np.newaxis]
+        time_dep = np.zeros((len(imp_time_depen), n_years.size, years.size))
+        for i_time, time_exp in enumerate(imp_time_depen):
+            if time_exp is None and self.imp_meas_present:
+                time_exp = 1
+            if time_exp:
+                time_dep[i_time] = (np.arange(years.size) / (n_years[:, np.newaxis] - 1)) \
+                    ** time_exp * in_hor
+            else:
+                time_dep[i_time] = in_hor
+
+        # npv of constant unit value and of time dependency: (disc, time, year)
+        npv_one = np.broadcast_to((disc_fact @ in_hor.T)[:, np.newaxis, :],
+                                  (len(disc_rates), len(imp_time_depen), n_years.size))
+        npv_dep = np.einsum('dy,thy->dth', disc_fact, time_dep)
+
+        def npv_diff(pres_val, fut_val):
+            """npv of yearly values going from pres_val to fut_val"""
+            pres_val = np.asarray(pres_val)[:, np.newaxis, np.newaxis, np.newaxis]
+            fut_val = np.asarray(fut_val)[:, np.newaxis, np.newaxis, np.newaxis]
+            return pres_val * npv_one + (fut_val - pres_val) * npv_dep
+
+        meas_names = [name for name in self.imp_meas_future if name != NO_MEASURE]
+        fut_imp = self.imp_meas_future
+        fut_ben = [fut_imp[NO_MEASURE]['risk'] - fut_imp[name]['risk'] for name in meas_names]
+        fut_tr = [fut_imp[name]['risk_transf'] for name in meas_names]
+        if self.imp_meas_present:
+            pres_imp = self.imp_meas_present
+            pres_ben = [pres_imp[NO_MEASURE]['risk'] - pres_imp[name]['risk']
+                        for name in meas_names]
+            pres_tr = [pres_imp[name]['risk_transf'] for name in meas_names]
+            pres_risk = [pres_imp[NO_MEASURE]['risk']]
+        else:
+            # future values weighted by the time dependency only, as in calc
+            pres_ben = np.zeros(len(meas_names))
+            pres_tr = np.zeros(len(meas_names))
+            pres_risk = [0]
+        benefit = npv_diff(pres_ben, fut_ben)
+        risk_tr = npv_diff(pres_tr, fut_tr)
+        tot_risk = npv_diff(pres_risk, [fut_imp[NO_MEASURE]['risk']])[0]
+        cost = np.array([fut_imp[name]['cost'] for name in meas_names]).reshape(-1, 2)
+        with np.errstate(divide='ignore'):
+            cost_ben = (cost[:, 0, np.newaxis, np.newaxis, np.newaxis]
+                        + cost[:, 1, np.newaxis, np.newaxis, np.newaxis] * risk_tr) / benefit
+
+        idx_meas, idx_disc, idx_time, idx_year = np.unravel_index(np.arange(benefit.size),
+                                                                  benefit.shape)
+        return pd.DataFrame({
+            'disc_rates': idx_disc,
+            'imp_time_depen': np.array(imp_time_depen, object)[idx_time],
+            'future_year': future_years[idx_year],
+            'measure': np.array(meas_names, object)[idx_meas],
+            'benefit': benefit.reshape(-1),
+            'cost_ben_ratio': cost_ben.reshape(-1),
+            'risk_transf': risk_tr.reshape(-1),
+            'tot_climate_risk': np.tile(tot_risk.reshape(-1), len(meas_names)),
+        })
+
     def plot_cost_benefit(self, cb_list=None, axis=None, **kwargs):
         """Plot cost-benefit graph. Call after calc().
 
@@ -668,7 +787,8 @@ class CostBenefit():
         return axis
 
     def _calc_impact_measures(self, hazard, exposures, meas_set, imp_fun_set,
-                              when='future', risk_func=risk_aai_agg, save_imp=False):
+                              when='future', risk_func=risk_aai_agg, save_imp=False,
+                              max_workers=1, delta=False):
         """Compute impact of each measure and transform it to input risk
         measurement. Set reference year from exposures value.
 
@@ -683,38 +803,82 @@ class CostBenefit():
                 to a risk measurement.
             save_imp (bool, optional): activate if Impact of each measure is
                 saved. Default: False.
+            max_workers (int, optional): number of threads computing the
+                impacts of the measures. Default: 1
+            delta (bool, optional): recompute only the impact of the exposures
+                affected by each measure, if possible. Default: False
+        """
+        self._calc_impact_conditions([(hazard, exposures, meas_set, imp_fun_set, when)],
+                                     risk_func, save_imp, max_workers, delta)
+
+    def _calc_impact_conditions(self, conditions, risk_func=risk_aai_agg,
+                                save_imp=False, max_workers=1, delta=False):
+        """Compute impact of each measure under every condition (present
+        and/or future) and transform it to input risk measurement. The
+        measures of all the conditions are computed in a pool of max_workers
+        threads.
+
+        Parameters:
+            conditions (list(tuple)): (hazard, exposures, meas_set,
+                imp_fun_set, when) of each condition, see _calc_impact_measures
+            risk_func (function, optional): function used to transform impact
+                to a risk measurement.
+            save_imp (bool, optional): activate if Impact of each measure is
+                saved. Default: False.
+            max_workers (int, optional): number of threads computing the
+                impacts of the measures. Default: 1
+            delta (bool, optional): recompute only the impact of the exposures
+                affected by each measure, if possible. Default: False
         """
         impact_meas = dict()
+        meas_tasks = list()
+        for hazard, exposures, meas_set, imp_fun_set, when in conditions:
+            # compute impact without measures first: it assigns the centroids to
+            # the exposures, which are afterwards only read by the measures
+            LOGGER.debug('%s impact with no measure.', when)
+            imp_tmp = Impact()
+            imp_tmp.calc(exposures, imp_fun_set, hazard, save_mat=delta)
+            impact_meas[when] = dict()
+            impact_meas[when][NO_MEASURE] = dict()
+            impact_meas[when][NO_MEASURE]['cost'] = (0, 0)
+            impact_meas[when][NO_MEASURE]['risk'] = risk_func(imp_tmp)
+            impact_meas[when][NO_MEASURE]['risk_transf'] = 0.0
+            impact_meas[when][NO_MEASURE]['efc'] = imp_tmp.calc_freq_curve()
+            if save_imp:
+                impact_meas[when][NO_MEASURE]['impact'] = imp_tmp
 
-        # compute impact without measures
-        LOGGER.debug('%s impact with no measure.', when)
-        imp_tmp = Impact()
-        imp_tmp.calc(exposures, imp_fun_set, hazard)
-        impact_meas[NO_MEASURE] = dict()
-        impact_meas[NO_MEASURE]['cost'] = (0, 0)
-        impact_meas[NO_MEASURE]['risk'] = risk_func(imp_tmp)
-        impact_meas[NO_MEASURE]['risk_transf'] = 0.0
-        impact_meas[NO_MEASURE]['efc'] = imp_tmp.calc_freq_curve()
-        if save_imp:
-            impact_meas[NO_MEASURE]['impact'] = imp_tmp
+            for measure in meas_set.get_measure(hazard.tag.haz_type):
+                meas_tasks.append((when, measure, exposures, imp_fun_set, hazard,
+                                   imp_tmp if delta else None))
 
-        # compute impact for each measure
-        for measure in meas_set.get_measure(hazard.tag.haz_type):
+        def calc_measure(task):
+            when, measure, exposures, imp_fun_set, hazard, imp_base = task
             LOGGER.debug('%s impact of measure %s.', when, measure.name)
-            imp_tmp, risk_transf = measure.calc_impact(exposures, imp_fun_set, hazard)
-            impact_meas[measure.name] = dict()
-            impact_meas[measure.name]['cost'] = (measure.cost, measure.risk_transf_cost_factor)
-            impact_meas[measure.name]['risk'] = risk_func(imp_tmp)
-            impact_meas[measure.name]['risk_transf'] = risk_func(risk_transf)
-            impact_meas[measure.name]['efc'] = imp_tmp.calc_freq_curve()
+            return measure.calc_impact(exposures, imp_fun_set, hazard, imp_base)
+
+        # compute impact for each measure
+        if max_workers > 1 and len(meas_tasks) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                meas_imps = list(executor.map(calc_measure, meas_tasks))
+        else:
+            meas_imps = [calc_measure(task) for task in meas_tasks]
+
+        for (when, measure, _, _, _, _), (imp_tmp, risk_transf) in zip(meas_tasks, meas_imps):
+            impact_meas[when][measure.name] = dict()
+            impact_meas[when][measure.name]['cost'] = (measure.cost,
+                                                       measure.risk_transf_cost_factor)
+            impact_meas[when][measure.name]['risk'] = risk_func(imp_tmp)
+            impact_meas[when][measure.name]['risk_transf'] = risk_func(risk_transf)
+            impact_meas[when][measure.name]['efc'] = imp_tmp.calc_freq_curve()
             if save_imp:
-                impact_meas[measure.name]['impact'] = imp_tmp
+                impact_meas[when][measure.name]['impact'] = imp_tmp
 
         # if present reference provided save it
-        if when == 'future':
-            self.imp_meas_future = impact_meas
-        else:
-            self.imp_meas_present = impact_meas
+        for when, when_meas in impact_meas.items():
+            if when == 'future':
+                self.imp_meas_future = when_meas
+            else:
+                self.imp_meas_present = when_meas
 
     def _calc_cost_benefit(self, disc_rates, imp_time_depen=None):
         """Compute discounted impact from present year to future year
@@ -41,7 +41,9 @@ from climada.entity.tag import Tag
 from climada.entity.exposures.base import Exposures
 from climada.hazard.tag import Tag as TagHaz
 from climada.entity.exposures.base import INDICATOR_IF, INDICATOR_CENTR
+from climada.entity.exposures.store import ExposuresStore
 import climada.util.plot as u_plot
+import climada.util.dtypes as u_dtype
 from climada.util.config import CONFIG
 from climada.util.constants import DEF_CRS
 
@@ -117,7 +119,8 @@ class Impact():
         """Compute impact of an hazard to exposures.
 
         Parameters:
-            exposures (Exposures): exposures
+            exposures (Exposures or ExposuresStore): exposures. An
+                ExposuresStore is processed chunk by chunk
             impact_funcs (ImpactFuncSet): impact functions
             hazard (Hazard): hazard
             self_mat (bool): self impact matrix: events x exposures
@@ -157,28 +160,28 @@ class Impact():
             LOGGER.info('Exposures matching centroids found in %s', assign_haz)
 
         # 2. Initialize values
+        if isinstance(exposures, ExposuresStore):
+            exp_chunks = exposures.iter_chunks()
+            exp_size = exposures.size
+            self.coord_exp = np.stack([exposures.read_column('latitude'),
+                                       exposures.read_column('longitude')], axis=1)
+        else:
+            exp_chunks = [exposures]
+            exp_size = exposures.value.size
+            self.coord_exp = np.stack([exposures.latitude.values,
+                                       exposures.longitude.values], axis=1)
         self.unit = exposures.value_unit
         self.event_id = hazard.event_id
         self.event_name = hazard.event_name
         self.date = hazard.date
-        self.coord_exp = np.stack([exposures.latitude.values,
-                                   exposures.longitude.values], axis=1)
         self.frequency = hazard.frequency
+        # accumulated in float64, cast to the dtype profile when complete
         self.at_event = np.zeros(hazard.intensity.shape[0])
-        self.eai_exp = np.zeros(exposures.value.size)
+        self.eai_exp = np.zeros(exp_size)
         self.tag = {'exp': exposures.tag, 'if_set': impact_funcs.tag,
                     'haz': hazard.tag}
         self.crs = exposures.crs
 
-        # Select exposures with positive value and assigned centroid
-        exp_idx = np.where((exposures.value > 0) & (exposures[assign_haz] >= 0))[0]
-        if exp_idx.size == 0:
-            LOGGER.warning("No affected exposures.")
-
-        num_events = hazard.intensity.shape[0]
-        LOGGER.info('Calculating damage for %s assets (>0) and %s events.',
-                    exp_idx.size, num_events)
-
         # Get damage functions for this hazard
         if_haz = INDICATOR_IF + hazard.tag.haz_type
         haz_imp = impact_funcs.get_func(hazard.tag.haz_type)
@@ -192,41 +195,33 @@ class Impact():
 
         # Check if deductible and cover should be applied
         insure_flag = False
-        if ('deductible' in exposures) and ('cover' in exposures) \
-        and exposures.cover.max():
-            insure_flag = True
+        if ('deductible' in exposures) and ('cover' in exposures):
+            if isinstance(exposures, ExposuresStore):
+                insure_flag = bool(exposures.read_column('cover').max())
+            else:
+                insure_flag = bool(exposures.cover.max())
 
         if save_mat:
             # (data, (row_ind, col_ind))
             self.imp_mat = ([], ([], []))
 
-        # 3. Loop over exposures according to their impact function
+        # 3. Loop over exposures chunks (only one for in-memory exposures)
         tot_exp = 0
-        for imp_fun in haz_imp:
-            # get indices of all the exposures with this impact function
-            exp_iimp = np.where(exposures[if_haz].values[exp_idx] == imp_fun.id)[0]
-            tot_exp += exp_iimp.size
-            exp_step = int(CONFIG['global']['max_matrix_size'] / num_events)
-            if not exp_step:
-                LOGGER.error('Increase max_matrix_size configuration parameter'
-                             ' to > %s', str(num_events))
-                raise ValueError
-            # separte in chunks
-            chk = -1
-            for chk in range(int(exp_iimp.size / exp_step)):
-                self._exp_impact(
-                    exp_idx[exp_iimp[chk * exp_step:(chk + 1) * exp_step]],
-                    exposures, hazard, imp_fun, insure_flag)
-            self._exp_impact(exp_idx[exp_iimp[(chk + 1) * exp_step:]],
-                             exposures, hazard, imp_fun, insure_flag)
+        offset = 0
+        for exp_chunk in exp_chunks:
+            tot_exp += self._calc_chunk(exp_chunk, haz_imp, hazard, assign_haz,
+                                        if_haz, insure_flag, offset)
+            offset += exp_chunk.shape[0]
 
         if not tot_exp:
             LOGGER.warning('No impact functions match the exposures.')
         self.aai_agg = sum(self.at_event * hazard.frequency)
+        self.at_event = u_dtype.cast_array(self.at_event, 'float')
+        self.eai_exp = u_dtype.cast_array(self.eai_exp, 'float')
 
         if save_mat:
-            shape = (self.date.size, exposures.value.size)
-            self.imp_mat = sparse.csr_matrix(self.imp_mat, shape=shape)
+            shape = (self.date.size, exp_size)
+            self.imp_mat = u_dtype.cast_sparse(sparse.csr_matrix(self.imp_mat, shape=shape))
 
     def calc_risk_transfer(self, attachment, cover):
         """Compute traaditional risk transfer over impact. Returns new impact
@@ -836,7 +831,55 @@ class Impact():
                 imp_sort[:, cen_idx], freq_sort[:, cen_idx],
                 0, return_periods)
 
-    def _exp_impact(self, exp_iimp, exposures, hazard, imp_fun, insure_flag):
+    def _calc_chunk(self, exposures, haz_imp, hazard, assign_haz, if_haz,
+                    insure_flag, offset=0):
+        """Compute impact of exposures (or a chunk of exposures) looping over
+        their impact functions.
+
+        Parameters:
+            exposures (Exposures): exposures instance
+            haz_imp (list(ImpactFunc)): impact functions of the hazard
+            hazard (Hazard): hazard instance
+            assign_haz (str): column of the assigned centroids
+            if_haz (str): column of the impact functions ids
+            insure_flag (bool): consider deductible and cover of exposures
+            offset (int, optional): position of the first exposure of the
+                chunk in the whole exposures. Default: 0
+
+        Returns:
+            int (number of exposures with a matching impact function)
+        """
+        # Select exposures with positive value and assigned centroid
+        exp_idx = np.where((exposures.value > 0) & (exposures[assign_haz] >= 0))[0]
+        if exp_idx.size == 0:
+            LOGGER.warning("No affected exposures.")
+
+        num_events = hazard.intensity.shape[0]
+        LOGGER.info('Calculating damage for %s assets (>0) and %s events.',
+                    exp_idx.size, num_events)
+
+        tot_exp = 0
+        for imp_fun in haz_imp:
+            # get indices of all the exposures with this impact function
+            exp_iimp = np.where(exposures[if_haz].values[exp_idx] == imp_fun.id)[0]
+            tot_exp += exp_iimp.size
+            exp_step = int(CONFIG['global']['max_matrix_size'] / num_events)
+            if not exp_step:
+                LOGGER.error('Increase max_matrix_size configuration parameter'
+                             ' to > %s', str(num_events))
+                raise ValueError
+            # separte in chunks
+            chk = -1
+            for chk in range(int(exp_iimp.size / exp_step)):
+                self._exp_impact(
+                    exp_idx[exp_iimp[chk * exp_step:(chk + 1) * exp_step]],
+                    exposures, hazard, imp_fun, insure_flag, offset)
+            self._exp_impact(exp_idx[exp_iimp[(chk + 1) * exp_step:]],
+                             exposures, hazard, imp_fun, insure_flag, offset)
+        return tot_exp
+
+    def _exp_impact(self, exp_iimp, exposures, hazard, imp_fun, insure_flag,
+                    offset=0):
         """Compute impact for inpute exposure indexes and impact function.
 
         Parameters:
@@ -845,6 +888,8 @@ class Impact():
             hazard (Hazard): hazard instance
             imp_fun (ImpactFunc): impact function instance
             insure_flag (bool): consider deductible and cover of exposures
+            offset (int, optional): position of the first exposure of the
+                chunk in the whole exposures. Default: 0
         """
         if not exp_iimp.size:
             return
@@ -866,10 +911,10 @@ class Impact():
             impact = impact.toarray()
             impact -= exposures.deductible.values[exp_iimp] * paa
             impact = np.clip(impact, 0, exposures.cover.values[exp_iimp])
-            self.eai_exp[exp_iimp] += np.einsum('ji,j->i', impact, hazard.frequency)
+            self.eai_exp[offset + exp_iimp] += np.einsum('ji,j->i', impact, hazard.frequency)
             impact = sparse.coo_matrix(impact)
         else:
-            self.eai_exp[exp_iimp] += np.squeeze(np.asarray(np.sum(
+            self.eai_exp[offset + exp_iimp] += np.squeeze(np.asarray(np.sum(
                 impact.multiply(hazard.frequency.reshape(-1, 1)), axis=0)))
 
         self.at_event += np.squeeze(np.asarray(np.sum(impact, axis=1)))
@@ -878,7 +923,7 @@ class Impact():
             row_ind, col_ind = impact.nonzero()
             self.imp_mat[0].extend(list(impact.data))
             self.imp_mat[1][0].extend(list(row_ind))
-            self.imp_mat[1][1].extend(list(exp_iimp[col_ind]))
+            self.imp_mat[1][1].extend(list(offset + exp_iimp[col_ind]))
 
     def _build_exp(self):
         eai_exp = Exposures()
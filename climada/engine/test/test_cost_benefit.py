@@ -331,6 +331,46 @@ class TestSteps(unittest.TestCase):
 
         self.assertAlmostEqual(cost_ben.tot_climate_risk, 576865915288.2021, places=3)
 
+    def test_sweep_pass(self):
+        """Test sweep against _calc_cost_benefit of every combination"""
+        hazard = Hazard('TC')
+        hazard.read_mat(HAZ_TEST_MAT)
+        entity = Entity()
+        entity.read_mat(ENT_TEST_MAT)
+        entity.measures._data['TC'] = entity.measures._data.pop('XX')
+        for meas in entity.measures.get_measure('TC'):
+            meas.haz_type = 'TC'
+        entity.check()
+
+        haz_future = copy.deepcopy(hazard)
+        haz_future.intensity.data += 25
+        disc_double = copy.deepcopy(entity.disc_rates)
+        disc_double.rates *= 2
+
+        cost_ben = CostBenefit()
+        for when, haz in zip(['present', 'future'], [hazard, haz_future]):
+            cost_ben._calc_impact_measures(haz, entity.exposures, entity.measures,
+                                           entity.impact_funcs, when=when)
+        cost_ben.present_year = 2018
+        cost_ben.future_year = 2040
+
+        sweep = cost_ben.sweep([entity.disc_rates, disc_double], [None, 0.5, 2],
+                               [2030, 2040])
+        self.assertEqual(sweep.shape[0], 4 * 2 * 3 * 2)
+        for _, row in sweep.iterrows():
+            cb_ref = copy.deepcopy(cost_ben)
+            cb_ref.future_year = row.future_year
+            cb_ref._calc_cost_benefit([entity.disc_rates, disc_double][row.disc_rates],
+                                      1 if row.imp_time_depen is None else row.imp_time_depen)
+            self.assertAlmostEqual(row.benefit / cb_ref.benefit[row.measure], 1)
+            self.assertAlmostEqual(row.cost_ben_ratio / cb_ref.cost_ben_ratio[row.measure], 1)
+            self.assertAlmostEqual(row.tot_climate_risk / cb_ref.tot_climate_risk, 1)
+
+        with self.assertLogs('climada.engine.cost_benefit', level='ERROR') as cm:
+            with self.assertRaises(ValueError):
+                cost_ben.sweep(entity.disc_rates, future_years=[2018])
+        self.assertIn('Wrong future years', cm.output[0])
+
     def test_time_array_pres_pass(self):
         """Test _time_dependency_array"""
         cb = CostBenefit()
@@ -795,6 +835,44 @@ class TestCalc(unittest.TestCase):
 
         self.assertAlmostEqual(cost_ben.tot_climate_risk, 576865915288.2021, places=3)
 
+    def test_calc_change_parallel_pass(self):
+        """Test calc with future change computing the measures in threads"""
+        hazard = Hazard('TC')
+        hazard.read_mat(HAZ_TEST_MAT)
+        entity = Entity()
+        entity.read_excel(ENT_DEMO_TODAY)
+        entity.exposures.rename(columns={'if_': 'if_TC'}, inplace=True)
+        entity.check()
+        entity.exposures.ref_year = 2018
+
+        ent_future = Entity()
+        ent_future.read_excel(ENT_DEMO_FUTURE)
+        ent_future.check()
+        ent_future.exposures.ref_year = 2040
+
+        haz_future = copy.deepcopy(hazard)
+        haz_future.intensity.data += 25
+
+        cost_ben = CostBenefit()
+        cost_ben.calc(hazard, entity, haz_future, ent_future)
+        cost_ben_par = CostBenefit()
+        cost_ben_par.calc(hazard, entity, haz_future, ent_future, max_workers=4)
+
+        self.assertEqual(list(cost_ben_par.imp_meas_present.keys()),
+                         list(cost_ben.imp_meas_present.keys()))
+        self.assertEqual(list(cost_ben_par.imp_meas_future.keys()),
+                         list(cost_ben.imp_meas_future.keys()))
+        for meas_name, imp_meas in cost_ben.imp_meas_present.items():
+            self.assertAlmostEqual(cost_ben_par.imp_meas_present[meas_name]['risk'],
+                                   imp_meas['risk'], places=3)
+        for meas_name, imp_meas in cost_ben.imp_meas_future.items():
+            self.assertAlmostEqual(cost_ben_par.imp_meas_future[meas_name]['risk'],
+                                   imp_meas['risk'], places=3)
+        for meas_name, benefit in cost_ben.benefit.items():
+            self.assertAlmostEqual(cost_ben_par.benefit[meas_name], benefit, places=3)
+        self.assertAlmostEqual(cost_ben_par.tot_climate_risk, cost_ben.tot_climate_risk,
+                               places=3)
+
     def test_calc_no_change_pass(self):
         """Test calc without future change"""
         hazard = Hazard('TC')
@@ -28,6 +28,7 @@ from climada.hazard.tag import Tag as TagHaz
 from climada.entity.entity_def import Entity
 from climada.hazard.base import Hazard
 from climada.engine.impact import Impact
+from climada.util.config import CONFIG
 from climada.util.constants import ENT_DEMO_TODAY, DEF_CRS
 
 HAZ_DIR = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'hazard/test/data/')
@@ -216,6 +217,31 @@ class TestCalc(unittest.TestCase):
         self.assertAlmostEqual(6.512201157564421e+09, impact.aai_agg, 5)
         self.assertTrue(np.isclose(6.512201157564421e+09, impact.aai_agg))
 
+    def test_calc_compact_pass(self):
+        """Test impact with the compact dtype profile, accumulated in float64"""
+        ent = Entity()
+        ent.read_excel(ENT_DEMO_TODAY)
+        hazard = Hazard('TC')
+        hazard.read_mat(HAZ_TEST_MAT)
+        ent.exposures.assign_centroids(hazard)
+        impact = Impact()
+        impact.calc(ent.exposures, ent.impact_funcs, hazard)
+
+        imp_compact = Impact()
+        CONFIG['global']['dtype_profile'] = 'compact'
+        try:
+            imp_compact.calc(ent.exposures, ent.impact_funcs, hazard)
+        finally:
+            CONFIG['global']['dtype_profile'] = 'default'
+        self.assertEqual(imp_compact.at_event.dtype, np.float32)
+        self.assertEqual(imp_compact.eai_exp.dtype, np.float32)
+        # only rounded once when stored
+        np.testing.assert_array_equal(imp_compact.at_event,
+                                      impact.at_event.astype(np.float32))
+        np.testing.assert_array_equal(imp_compact.eai_exp,
+                                      impact.eai_exp.astype(np.float32))
+        self.assertEqual(imp_compact.aai_agg, impact.aai_agg)
+
     def test_calc_imp_mat_pass(self):
         """Test save imp_mat"""
         # Read default entity values
@@ -22,4 +22,5 @@ from .base import *
 from .black_marble import *
 from .gdp_asset import *
 from .litpop import *
+from .store import *
 
@@ -541,9 +541,8 @@ class Exposures(GeoDataFrame):
             Exposures
         """
         # FIXME: this will likely be unnecessary if removed from GeoDataFrame
-        data = self._data
-        if deep:
-            data = data.copy()
+        # a shallow copy gets its own block manager, sharing the data
+        data = self._data.copy(deep=deep)
         return Exposures(data).__finalize__(self)
 
     def write_raster(self, file_name, value_name='value', scheduler=None):
@@ -10,10 +10,13 @@ import subprocess
 
 import gdal
 import pandas as pd
+import rasterio
+import rasterio.windows
 from scipy import ndimage as nd
 import numpy as np
 
 from climada.util.constants import SYSTEM_DIR
+from climada.util.coordinates import read_raster_zoomed_window
 from climada.entity.exposures import litpop as LitPop
 logging.root.setLevel(logging.DEBUG)
 LOGGER = logging.getLogger(__name__)
@@ -29,23 +32,66 @@ BUFFER_VAL = -340282306073709652508363335590014353408
 
 
 
-def _gpw_bbox_cutter(gpw_data, bbox, resolution, arr1_shape=[17400, 43200]):
-    """Crops the imported GPW data to the bounding box to reduce memory foot
-        print after it has been resized to desired resolution.
+_GPW_ZOOM_NORM = dict()
+"""Normalization factors of zoomed GPW files, indexed by file name and zoom factor"""
 
-    Optional parameters:
-        gpw_data (array): Imported GPW data in gridded format
+def _zoom_weights(n_in, zoom_factor):
+    """Total weight of each source pixel along one axis in scipy.ndimage.zoom
+    with order=1, i.e. the sum of the zoomed data along this axis is
+    np.dot(data, weights)"""
+    n_out = int(round(n_in * zoom_factor))
+    scale = (n_in - 1) / (n_out - 1) if n_out > 1 else 1
+    coord = np.arange(n_out) * scale
+    coord = coord[coord <= n_in - 1]
+    coord_0 = np.floor(coord).astype(int)
+    weights = np.bincount(coord_0, weights=1 - (coord - coord_0), minlength=n_in)
+    weights += np.bincount(np.minimum(coord_0 + 1, n_in - 1), weights=coord - coord_0,
+                           minlength=n_in)
+    return weights
+
+def _gpw_zoom_norm_factor(fname, zoom_factor, strip_rows=256):
+    """Factor which keeps the total population of a GPW file stable when it
+        is zoomed. The file is read in strips of rows, the full zoomed array
+        is never computed.
+
+    Parameters:
+        fname (str): GPW file
+        zoom_factor (float): zoom factor applied to the GPW data
+        strip_rows (int, optional): number of rows read at once. Default: 256
+
+    Returns:
+        float
+    """
+    key = (fname, zoom_factor)
+    if key not in _GPW_ZOOM_NORM:
+        with rasterio.open(fname, 'r') as src:
+            weights_row = _zoom_weights(src.height, zoom_factor)
+            weights_col = _zoom_weights(src.width, zoom_factor)
+            total_population, zoomed_population = 0, 0
+            for row in range(0, src.height, strip_rows):
+                strip = src.read(1, window=rasterio.windows.Window(
+                    0, row, src.width, min(strip_rows, src.height - row)))
+                strip = strip.astype(np.float64)
+                strip[strip < 0] = 0
+                total_population += strip.sum()
+                zoomed_population += np.dot(weights_row[row:row + strip.shape[0]],
+                                            np.dot(strip, weights_col))
+        _GPW_ZOOM_NORM[key] = total_population / zoomed_population
+    return _GPW_ZOOM_NORM[key]
+
+def _gpw_bbox_window(bbox, resolution, arr1_shape=[17400, 43200]):
+    """Rows and columns of the resized GPW data within a bounding box.
+
+    Parameters:
         bbox (array 4x1): Bounding box to which the data is cropped.
         resolution (int): The resolution in arcsec to which the data has
             been resized.
+        arr1_shape (tuple): shape of the GPW data in its original resolution
 
     Returns:
-        gpw_data (array): Cropped GPW data
+        row_min, row_max, col_min, col_max (int): first and last + 1 row and
+            column of the bounding box
     """
-
-    """gpw data is 17400 rows x 43200 cols in dimension (from 85 N to 60 S in
-    latitude, full longitudinal range). Hence, the bounding box can easily be
-    converted to the according indices in the gpw data"""
     steps_p_res = 3600 / resolution
     zoom = 30 / resolution
     col_min, row_min, col_max, row_max =\
@@ -62,6 +108,28 @@ def _gpw_bbox_cutter(gpw_data, bbox, resolution, arr1_shape=[17400, 43200]):
         col_max = col_max + 1
     if row_max < (rows_gpw / zoom) - 1:
         row_max = row_max + 1
+    return row_min, row_max, col_min, col_max
+
+def _gpw_bbox_cutter(gpw_data, bbox, resolution, arr1_shape=[17400, 43200]):
+    """Crops the imported GPW data to the bounding box to reduce memory foot
+        print after it has been resized to desired resolution.
+
+    Optional parameters:
+        gpw_data (array): Imported GPW data in gridded format
+        bbox (array 4x1): Bounding box to which the data is cropped.
+        resolution (int): The resolution in arcsec to which the data has
+            been resized.
+
+    Returns:
+        gpw_data (array): Cropped GPW data
+    """
+
+    """gpw data is 17400 rows x 43200 cols in dimension (from 85 N to 60 S in
+    latitude, full longitudinal range). Hence, the bounding box can easily be
+    converted to the according indices in the gpw data"""
+    zoom = 30 / resolution
+    rows_gpw = arr1_shape[0]
+    row_min, row_max, col_min, col_max = _gpw_bbox_window(bbox, resolution, arr1_shape)
     gpw_data = gpw_data[:, col_min:col_max]
 
     if row_min >= 0 and row_min < (rows_gpw / zoom) and row_max >= 0 \
@@ -79,6 +147,38 @@ def _gpw_bbox_cutter(gpw_data, bbox, resolution, arr1_shape=[17400, 43200]):
         gpw_data = np.zeros((row_max - row_min, col_max - col_min))
     return gpw_data
 
+def _get_box_gpw_window(fname, cut_bbox, resolution):
+    """Reads the GPW data within a bounding box at the given resolution,
+        decoding only the required part of the file. Same result as resizing
+        the full GPW data and cutting it with _gpw_bbox_cutter.
+
+    Parameters:
+        fname (str): GPW file
+        cut_bbox (array 4x1): Bounding box to which the data is cropped.
+        resolution (int): The resolution in arcsec of the output.
+
+    Returns:
+        gpw_data (array): Cropped GPW data, or None if the bounding box
+            exceeds the latitudinal range of the data
+    """
+    with rasterio.open(fname, 'r') as src:
+        arr1_shape = (src.height, src.width)
+    if arr1_shape != (17400, 43200) and arr1_shape != (21600, 43200):
+        LOGGER.warning('GPW data dimensions mismatch. Actual dimensions: %s x %s',
+                       arr1_shape[0], arr1_shape[1])
+        LOGGER.warning('Expected dimensions: 17400x43200 or 21600x43200.')
+    zoom_factor = 30 / resolution
+    row_min, row_max, col_min, col_max = _gpw_bbox_window(cut_bbox, resolution, arr1_shape)
+    if row_min < 0 or row_min >= arr1_shape[0] / zoom_factor \
+       or row_max < 0 or row_max >= arr1_shape[0] / zoom_factor:
+        return None
+    gpw_data = read_raster_zoomed_window(fname, zoom_factor, (row_min, row_max),
+                                         (col_min, col_max))
+    if zoom_factor != 1:
+        # normalize interpolated gridded population count to keep total population stable:
+        gpw_data = gpw_data * _gpw_zoom_norm_factor(fname, zoom_factor)
+    return gpw_data
+
 def check_bounding_box(coord_list):
     """Check if a bounding box is valid.
     Parameters:
@@ -186,6 +286,17 @@ def get_box_gpw(**parameters):
                                       + 'http://sedac.ciesin.columbia.edu/'
                                       + 'data/collection/gpw-v4/sets/browse')
         LOGGER.debug('Importing %s', str(fname))
+        if cut_bbox is not None:
+            tile_temp = _get_box_gpw_window(fname, cut_bbox, resolution)
+            if tile_temp is not None:
+                tile_temp = pd.arrays.SparseArray(
+                    tile_temp.reshape((tile_temp.size,), order='F'),
+                    fill_value=0)
+                if return_coords == 1:
+                    lon = tuple((cut_bbox[0], 1 / (3600 / resolution)))
+                    lat = tuple((cut_bbox[1], 1 / (3600 / resolution)))
+                    return tile_temp, lon, lat
+                return tile_temp
         gpw_file = gdal.Open(fname)
         band1 = gpw_file.GetRasterBand(1)
         arr1 = band1.ReadAsArray()
@@ -15,6 +15,7 @@ PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
 You should have received a copy of the GNU Lesser General Public License along
 with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
 """
+import itertools
 import logging
 import time
 import os
@@ -25,6 +26,9 @@ from pandas_datareader import wb
 from scipy import ndimage as nd
 from scipy import stats
 import geopandas as gpd
+import rasterio
+import rasterio.features
+import rasterio.windows
 import shapefile
 from matplotlib import pyplot as plt
 from iso3166 import countries as iso_cntry
@@ -38,7 +42,8 @@ from climada.entity.exposures import gpw_import
 from climada.util import ureg
 from climada.util.finance import gdp, income_group, wealth2gdp, world_bank_wealth_account
 from climada.util.constants import SYSTEM_DIR, DEF_CRS
-from climada.util.coordinates import pts_to_raster_meta, get_resolution
+from climada.util.coordinates import pts_to_raster_meta, get_resolution, read_raster, \
+    write_raster, read_raster_zoomed_window
 
 logging.root.setLevel(logging.DEBUG)
 LOGGER = logging.getLogger(__name__)
@@ -81,6 +86,12 @@ DEF_RES_GPW_ARCSEC = 30
 DEF_HAZ_TYPE = ''
 """Default hazard type used in impact functions id, i.e. TC"""
 
+LITPOP_TILE_DIR = os.path.join(SYSTEM_DIR, 'litpop_tiles')
+"""Default folder of the cached tiles of the (unnormalised) LitPop base grid"""
+
+LITPOP_TILE_DEG = 10
+"""Size (in degrees) of the cached tiles of the LitPop base grid"""
+
 class LitPop(Exposures):
     """Defines exposure values from nightlight intensity (NASA), Gridded Population
         data (SEDAC); distributing produced capital (World Bank), GDP (World Bank)
@@ -145,6 +156,11 @@ class LitPop(Exposures):
             total asset value (default True)
             reference_year (int)
             adm1_scatter (boolean): produce scatter plot for admin1 validation?
+            tile_cache (boolean): read the LitPop base grid of each country from
+                the tiles cached on disk, generating the missing ones (default False)
+            tile_dir (str): folder of the cached tiles (default LITPOP_TILE_DIR)
+            pool (pathos.pool, optional): build the countries in parallel. Each
+                country only reads the data within its own bounding box.
         """
         # TODO: allow for user delivered path
 #        self.clear() # clear existing assets (reset)
@@ -157,6 +173,9 @@ class LitPop(Exposures):
         adm1_scatter = args.get('adm1_scatter', False)
         conserve_cntrytotal = args.get('conserve_cntrytotal', True)
         reference_year = args.get('reference_year', 2016)
+        tile_cache = args.get('tile_cache', False)
+        tile_dir = args.get('tile_dir', LITPOP_TILE_DIR)
+        pool = args.get('pool', None)
         # bm_year = min(BM_YEARS, key=lambda x:abs(x-reference_year))
 #        inherit_admin1_from_admin0 = args.get('inherit_admin1_from_admin0', 1)
         if res_arcsec == []:
@@ -205,11 +224,24 @@ class LitPop(Exposures):
             LOGGER.error('Country parameter data type not recognised. \
                          Operation aborted.')
             raise TypeError
-        all_coords = _litpop_box2coords(cut_bbox, resolution, 1)
         # Get LitPop
         LOGGER.info('Generating LitPop data at a resolution of %s arcsec.', str(resolution))
-        litpop_data = _get_litpop_box(cut_bbox, resolution, 0, reference_year,
-                                      exponents)
+        if tile_cache or pool:
+            # every country is built from the data within its own bounding box only
+            cntry_args = [resolution, reference_year, exponents,
+                          tile_dir if tile_cache else None]
+            if pool:
+                cntry_data = pool.map(_get_litpop_country, country_list,
+                                      *[itertools.repeat(arg, len(country_list))
+                                        for arg in cntry_args])
+            else:
+                cntry_data = [_get_litpop_country(cntry, *cntry_args)
+                              for cntry in country_list]
+        else:
+            cntry_data = None
+            all_coords = np.column_stack(_litpop_box2coords(cut_bbox, resolution, 0))
+            litpop_data = _get_litpop_box(cut_bbox, resolution, 0, reference_year,
+                                          exponents)
         shp_file = shapereader.natural_earth(resolution='10m',
                                              category='cultural',
                                              name='admin_0_countries')
@@ -230,19 +262,22 @@ class LitPop(Exposures):
 
         tag = Tag()
         lp_cntry = list()
-        for curr_country in country_list:
-            curr_shp = _get_country_shape(curr_country, 0)
-            mask = _mask_from_shape(curr_shp, resolution=resolution,
-                                    points2check=all_coords)
-            litpop_curr = litpop_data[mask.sp_index.indices]
-            lon, lat = zip(*np.array(all_coords)[mask.sp_index.indices])
+        for i_cntry, curr_country in enumerate(country_list):
+            if cntry_data is None:
+                curr_shp = _get_country_shape(curr_country, 0)
+                mask = _mask_from_shape(curr_shp, resolution=resolution,
+                                        points2check=all_coords)
+                litpop_curr = litpop_data[mask]
+                lon, lat = all_coords[mask].T
+            else:
+                litpop_curr, lon, lat = cntry_data[i_cntry]
             if fin_mode == 'none':
                 LOGGER.info('fin_mode=none --> no downscaling; admin1_calc is ignored')
             elif admin1_calc == 1:
                 litpop_curr = _calc_admin1(curr_country,
                                            country_info[curr_country],
                                            admin1_info[curr_country],
-                                           litpop_curr, list(zip(lon, lat)),
+                                           litpop_curr, np.column_stack((lon, lat)),
                                            resolution, adm1_scatter,
                                            conserve_cntrytotal=conserve_cntrytotal,
                                            check_plot=check_plot, masks_adm1=[], return_data=1)
@@ -409,6 +444,179 @@ def _get_litpop_box(cut_bbox, resolution, return_coords=0,
         return litpop_data, lon, lat
     return litpop_data
 
+def _get_litpop_country(country_iso3, resolution, reference_year=2016,
+                        exponents=[1, 1], tile_dir=None):
+    """
+    PURPOSE:
+        Compute the raw, unnormalised LitPop data of the pixels within a
+        country. Only the data within the country's bounding box is read.
+    INPUTS:
+        country_iso3 (str): ISO3 code of the country
+        resolution (scalar): resolution in arc-seconds
+        reference_year (int): reference year
+        exponents (list of two integers, default = [1, 1]) defining power with
+            which lit (nightlights) and pop (gpw) go into LitPop.
+        tile_dir (str, optional): if given, the data is read from the tiles of
+            the LitPop base grid cached in this folder (see get_litpop_tile).
+    OUTPUT:
+        litpop_data (pandas.arrays.SparseArray): LitPop data of the country
+        lon, lat (np.arrays): coordinates of the pixels of the country
+    """
+    cntry_shp = _get_country_shape(country_iso3, 0)
+    cntry_bbox = _get_country_shape(country_iso3, 1)[0]
+    all_coords = np.column_stack(_litpop_box2coords(cntry_bbox, resolution, 0))
+    if tile_dir is None:
+        litpop_data = _get_litpop_box(cntry_bbox, resolution, 0, reference_year,
+                                      exponents)
+    else:
+        litpop_data = _get_litpop_box_tiled(cntry_bbox, resolution, reference_year,
+                                            exponents, tile_dir)
+    mask = _mask_from_shape(cntry_shp, resolution=resolution, points2check=all_coords)
+    lon, lat = all_coords[mask].T
+    return litpop_data[mask], lon, lat
+
+def _litpop_tile_pixels(resolution):
+    """Number of pixels along each side of the tiles of the LitPop base grid"""
+    n_pix = LITPOP_TILE_DEG * 3600 / resolution
+    if n_pix != int(n_pix):
+        LOGGER.error('Resolution of %s arcsec not compatible with tiles of %s degrees.',
+                     resolution, LITPOP_TILE_DEG)
+        raise ValueError
+    return int(n_pix)
+
+def _litpop_tile_bbox(tile, resolution):
+    """Bounding box (ESRI type) of a tile (row and column in the global grid of tiles),
+    shrunk by a quarter pixel so that _litpop_coords_in_glb_grid selects exactly the
+    pixels of the tile"""
+    eps = 0.25 / (3600 / resolution)
+    lon_min = -180 + tile[1] * LITPOP_TILE_DEG
+    lat_max = 90 - tile[0] * LITPOP_TILE_DEG
+    return np.array((lon_min + eps, lat_max - LITPOP_TILE_DEG + eps,
+                     lon_min + LITPOP_TILE_DEG - eps, lat_max - eps))
+
+def _litpop_tile_path(tile, resolution, reference_year, exponents, tile_dir):
+    """Path of a cached tile of the LitPop base grid"""
+    return os.path.join(tile_dir, 'LitPop_%gas_%i_exp_%g_%g_tile_%i_%i.tif'
+                        % (resolution, reference_year, exponents[0], exponents[1],
+                           tile[0], tile[1]))
+
+def generate_litpop_tiles(tiles, resolution, reference_year=2016, exponents=[1, 1],
+                          tile_dir=LITPOP_TILE_DIR):
+    """Compute tiles of the raw, unnormalised LitPop base grid and write them to
+    GeoTiff files in tile_dir.
+
+    The LitPop data is computed once for the bounding box of all the given tiles,
+    so that the nightlight and population files are read only once.
+
+    Parameters:
+        tiles (list of tuples): row and column of the tiles in the global grid of
+            tiles of LITPOP_TILE_DEG degrees, starting at (90N, 180W)
+        resolution (scalar): resolution in arc-seconds
+        reference_year (int, optional): reference year. Default: 2016
+        exponents (list of two integers, optional): exponents of lit and pop.
+            Default: [1, 1]
+        tile_dir (str, optional): output folder. Default: LITPOP_TILE_DIR
+    """
+    if not tiles:
+        return
+    n_pix = _litpop_tile_pixels(resolution)
+    rows, cols = [np.array(ar) for ar in zip(*tiles)]
+    bbox_min = _litpop_tile_bbox((rows.max(), cols.min()), resolution)
+    bbox_max = _litpop_tile_bbox((rows.min(), cols.max()), resolution)
+    cut_bbox = np.array((bbox_min[0], bbox_min[1], bbox_max[2], bbox_max[3]))
+    LOGGER.info('Generating %s LitPop tiles at a resolution of %s arcsec.',
+                len(tiles), resolution)
+    shape = ((rows.max() - rows.min() + 1) * n_pix, (cols.max() - cols.min() + 1) * n_pix)
+    litpop_data = _get_litpop_box(cut_bbox, resolution, 0, reference_year, exponents)
+    if litpop_data.size != shape[0] * shape[1]:
+        LOGGER.error('LitPop data of size %s does not match the tiles of shape %s.',
+                     litpop_data.size, shape)
+        raise ValueError
+    # LitPop data is ordered column by column
+    litpop_data = litpop_data.to_numpy().reshape(shape, order='F')
+
+    os.makedirs(tile_dir, exist_ok=True)
+    deg_per_pix = 1 / (3600 / resolution)
+    for tile in tiles:
+        row_off = (tile[0] - rows.min()) * n_pix
+        col_off = (tile[1] - cols.min()) * n_pix
+        meta = {
+            'crs': DEF_CRS,
+            'height': n_pix,
+            'width': n_pix,
+            'transform': rasterio.Affine(deg_per_pix, 0, -180 + tile[1] * LITPOP_TILE_DEG,
+                                         0, -deg_per_pix, 90 - tile[0] * LITPOP_TILE_DEG),
+            'compress': 'deflate',
+            'tiled': True,
+        }
+        path = _litpop_tile_path(tile, resolution, reference_year, exponents, tile_dir)
+        # write to a temporary file first, tiles might be generated concurrently
+        path_tmp = '%s.%i.tmp' % (path, os.getpid())
+        write_raster(path_tmp, litpop_data[row_off:row_off + n_pix, col_off:col_off + n_pix],
+                     meta, dtype=np.float64)
+        os.replace(path_tmp, path)
+
+def get_litpop_tile(tile, resolution, reference_year=2016, exponents=[1, 1],
+                    tile_dir=LITPOP_TILE_DIR):
+    """Read a tile of the raw, unnormalised LitPop base grid from the cache,
+    generating it if it doesn't exist yet.
+
+    Parameters:
+        tile (tuple): row and column of the tile in the global grid of tiles of
+            LITPOP_TILE_DEG degrees, starting at (90N, 180W)
+        resolution (scalar): resolution in arc-seconds
+        reference_year (int, optional): reference year. Default: 2016
+        exponents (list of two integers, optional): exponents of lit and pop.
+            Default: [1, 1]
+        tile_dir (str, optional): folder of the cached tiles. Default: LITPOP_TILE_DIR
+
+    Returns:
+        np.array (2d, north to south and west to east)
+    """
+    path = _litpop_tile_path(tile, resolution, reference_year, exponents, tile_dir)
+    if not os.path.isfile(path):
+        generate_litpop_tiles([tile], resolution, reference_year, exponents, tile_dir)
+    meta, data = read_raster(path)
+    return data.reshape((meta['height'], meta['width']))
+
+def _get_litpop_box_tiled(cut_bbox, resolution, reference_year=2016, exponents=[1, 1],
+                          tile_dir=LITPOP_TILE_DIR):
+    """
+    PURPOSE:
+        Same as _get_litpop_box, but the LitPop data is assembled from the
+        tiles cached in tile_dir. Missing tiles are generated together.
+    INPUTS:
+        cut_bbox (1x4 array-like): Bounding box (ESRI type) of interest.
+        resolution (scalar): resolution in arc-seconds
+        reference_year (int): reference year
+        exponents (list of two integers, default = [1, 1])
+        tile_dir (str): folder of the cached tiles
+    OUTPUT:
+        litpop_data (pandas.arrays.SparseArray): raw, unnormalised LitPop data
+            in the order of _litpop_box2coords
+    """
+    n_pix = _litpop_tile_pixels(resolution)
+    min_col, min_row, max_col, max_row = _litpop_coords_in_glb_grid(cut_bbox, resolution)
+    max_tile_row = min(max_row // n_pix, 180 // LITPOP_TILE_DEG - 1)
+    max_tile_col = min(max_col // n_pix, 360 // LITPOP_TILE_DEG - 1)
+    tiles = [(row, col) for row in range(min_row // n_pix, max_tile_row + 1)
+             for col in range(min_col // n_pix, max_tile_col + 1)]
+    missing = [tile for tile in tiles if not os.path.isfile(
+        _litpop_tile_path(tile, resolution, reference_year, exponents, tile_dir))]
+    generate_litpop_tiles(missing, resolution, reference_year, exponents, tile_dir)
+
+    litpop_data = np.zeros((max_row - min_row + 1, max_col - min_col + 1))
+    for tile in tiles:
+        tile_data = get_litpop_tile(tile, resolution, reference_year, exponents, tile_dir)
+        row_start, col_start = tile[0] * n_pix, tile[1] * n_pix
+        rows = slice(max(min_row, row_start), min(max_row + 1, row_start + n_pix))
+        cols = slice(max(min_col, col_start), min(max_col + 1, col_start + n_pix))
+        litpop_data[rows.start - min_row:rows.stop - min_row,
+                    cols.start - min_col:cols.stop - min_col] = \
+            tile_data[rows.start - row_start:rows.stop - row_start,
+                      cols.start - col_start:cols.stop - col_start]
+    return pd.arrays.SparseArray(litpop_data.ravel(order='F'), fill_value=0)
+
 def _LitPop_multiply(nightlights, gpw, exponents=[1, 1]):
     """
     PURPOSE:
@@ -746,31 +954,33 @@ def _shape_cutter(shape, **opt_args):
     return lon, lat, enclave_paths
 
 def _mask_from_path(path, resolution=30, return_points=1, return_mask=0):
-    curr_bbox = np.array((min([x[0] for x in path.vertices]),
-                          min([x[1] for x in path.vertices]),
-                          max([x[0] for x in path.vertices]),
-                          max([x[1] for x in path.vertices])))
-    curr_points2check = _litpop_box2coords(curr_bbox, resolution, 1)
-    del curr_bbox
-    if curr_points2check == []:
+    curr_bbox = np.concatenate([path.vertices.min(axis=0), path.vertices.max(axis=0)])
+    lon, lat = _litpop_box2coords(curr_bbox, resolution, 0)
+    if lon.size == 0:
         return None
-    temp_mask = pd.arrays.SparseArray(path.contains_points(curr_points2check),
-                               fill_value=0)
-    points_in = [curr_points2check[val] for idx, val
-                 in enumerate(temp_mask.sp_index.indices)]
+    temp_mask = path.contains_points(np.column_stack((lon, lat)))
+    lon, lat = lon[temp_mask], lat[temp_mask]
+    temp_mask = pd.arrays.SparseArray(temp_mask, fill_value=0)
     if return_points == 1:
+        points_in = list(zip(lon, lat))
         if return_mask == 1:
             return points_in, temp_mask
         return points_in
 
-    lon, lat = [x[0] for x in points_in], [x[1] for x in points_in]
     if return_mask == 1:
-        return lon, lat, temp_mask
-    return lon, lat
+        return list(lon), list(lat), temp_mask
+    return list(lon), list(lat)
 
-def _mask_from_shape(check_shape, **opt_args):
-    """creates a mask from a shape assigning value 1 to points inside and 0
-        otherwise.
+def _mask_from_shape(check_shape, resolution=30, points2check=None, check_enclaves=True):
+    """Indices of the points of the LitPop grid inside a shape.
+
+    The shape is burnt onto the LitPop grid of the given resolution, i.e. a
+    point is inside if the center of its pixel is inside the shape.
+
+    Changed behavior: points in holes (enclaves) of the shape are now outside
+    by default. Previous versions detected the enclaves but never removed
+    their points, so that they were counted inside. The plotting and output
+    format options of previous versions are not supported anymore.
 
     Parameters
     ----------
@@ -778,130 +988,56 @@ def _mask_from_shape(check_shape, **opt_args):
         shape file to check
     resolution : scalar, optional
         resolution of the points to be checked in arcsec.
-        Required if the points need to be created first.
         Default: 30.
+    points2check : array-like, optional
+        Points of the LitPop grid (array of shape (n, 2) or list of tuples
+        (lon, lat)) for which should be checked whether they are inside the
+        shape. If no points are delivered, the points are created for the
+        bounding box of the shape.
     check_enclaves : boolean, optional
-        If activated, enclaves get detected and cut out from shapes. Default: 1.
-    check_plot : boolean, optional
-        If activated, a plot with the shap and the mask is shown. Default: 0.
-    shape_format : str, tuple, optional
-        colour of the shape if it is plotted.
-        Takes any colour format which is recognised by matplotlib.
-    enclave_format : str, tuple, optional
-        colour of the enclaves if it they are plotted.
-        Takes any colour format which is recognised by matplotlib.
-    return_mask : boolean, optional
-        If activated, the mask is also returned
-    points2check : list, optional
-        A list of points in tuple formaat (lon, lat) for which should be
-        checked whether they are inside the shape.
-        If no points are delivered, the points are created for the bounding box
-        of the shape.
-    point_format : boolean, optional
-        If activated the points get returned as a list in tuple format
-        (lon, lat), otherwise, lon and lat get returned separately.
+        If activated, the points in holes of the shape are excluded.
+        Otherwise, only the outer rings of the shape are considered.
+        Default: True.
 
     Returns
     -------
-    lon : list
-        list of longitudinal coordinate data of points inside shape
-        (returned if points_format = 0)
-    lat : list
-        list of latitudianl coordinate data of points inside shape
-        (returned if points_format = 0)
-    incl_coords : list
-        list of tuples of formate (lon, lat) of points
-        inside shape (returned if points_format=1)
-    enclave_paths : list
-        list of detected enclave paths
-    mask : pandas.arrays.SparseArray
-        SparseArray with one where point is
-        inside shape and zero otherwise. (only returned if return_mask=1)
+    mask : np.array
+        indices of the points inside the shape
     """
-    from matplotlib import path
-    resolution = opt_args.get('resolution', 30)
-    check_enclaves = opt_args.get('check_enclaves', 1)
-    points2check = opt_args.get('points2check', [])
     if (not hasattr(check_shape, 'points')) or (not hasattr(check_shape, 'parts')):
         LOGGER.error('Not a valid shape. Please make sure, the shapefile is \
                      of type from package "shapefile".')
-    sub_shapes = len(check_shape.parts)
-    all_coords_shape = [(x, y) for x, y in check_shape.points]
-    # LOGGER.debug('Extracting subshapes and detecting enclaves...')
-    sub_shape_path = []
-    enclave_paths = []
-    add2enclave = 0
-    if sub_shapes > 1:
-        for i in range(0, sub_shapes):
-            if i == (sub_shapes - 1):
-                end_idx = len(check_shape.points) - 1
-            else:
-                end_idx = check_shape.parts[i + 1] - 1
-            if (i > 0) & (check_enclaves == 1):
-                temp_path = path.Path(all_coords_shape[check_shape.parts[i]:end_idx])
-                for val in sub_shape_path:
-                    if val.contains_point(temp_path.vertices[0]) and \
-                            len(temp_path.vertices) > 2 and \
-                            val.contains_point(temp_path.vertices[1]) and\
-                            val.contains_point(temp_path.vertices[2]):
-                        # Only check if the first three vertices of the new shape
-                        # is in any of the old shapes for speed
-                        add2enclave = 1
-                        break
-                if add2enclave == 1:
-                    enclave_paths.append(temp_path)
-                    temp_path = []
-                    add2enclave = 0
-                else:
-                    sub_shape_path.append(temp_path)
-                    temp_path = []
-            else:
-                sub_shape_path.append(path.Path(all_coords_shape[check_shape.parts[i]:end_idx]))
-        if check_enclaves == 1:
-            LOGGER.debug('Detected subshapes: %s', str(sub_shapes))
-            LOGGER.debug('of which detected enclaves: %s', str(len(enclave_paths)))
-        else:
-            LOGGER.info('Detected subshapes: %s. Enclave checking disabled.',
-                        str(sub_shapes))
+        raise ValueError
+    shape_pts = np.array(check_shape.points)
+    total_bbox = np.concatenate([shape_pts.min(axis=0), shape_pts.max(axis=0)])
+    if points2check is None or len(points2check) == 0:
+        lon, lat = _litpop_box2coords(total_bbox, resolution, 0)
     else:
-        sub_shape_path.append(path.Path(all_coords_shape))
-    del all_coords_shape
-    incl_coords = []
-    for _, val in enumerate(sub_shape_path):
-        add_points = _mask_from_path(val, resolution)
-        if add_points is not None:
-            [incl_coords.append(point) for point in add_points]
-        del add_points
-    # stdout.write('\n')
-    if check_enclaves == 1 and not enclave_paths:
-        excl_coords = []
-        LOGGER.debug('Removing enclaves...')
-        for _, val in enumerate(enclave_paths):
-            temp_excl_points = _mask_from_path(val, resolution)
-            if temp_excl_points is not None:
-                [excl_coords.append(point) for point in temp_excl_points]
-            del temp_excl_points
-        excl_coords = set(tuple(row) for row in excl_coords)
-        incl_coords = [point for point in incl_coords if point not in
-                       excl_coords]
-    LOGGER.debug('Successfully isolated coordinates from shape')
-    total_bbox = np.array((min([x[0] for x in check_shape.points]),
-                           min([x[1] for x in check_shape.points]),
-                           max([x[0] for x in check_shape.points]),
-                           max([x[1] for x in check_shape.points])))
-    if points2check == []:
-        all_coords = _litpop_box2coords(total_bbox, resolution, 1)
-    else:
-        all_coords = points2check
-        del points2check
-    incl_coords = set(incl_coords)
-    mask = np.array([(coord in incl_coords) for coord in all_coords])
-    mask = pd.arrays.SparseArray(mask, fill_value=0, dtype='bool_')
-#    plt.figure()
-#    l1, l2 = zip(*[x for n, x in enumerate(all_coords) if mask.values[n]==1])
-#    plt.scatter(l1, l2)
-#    _plot_shape_to_plot(check_shape)
-    return mask
+        lon, lat = np.asarray(points2check, dtype=float).reshape(-1, 2).T
+
+    # only burn the shape within the extent of the points close to it
+    deg_per_pix = 1 / (3600 / resolution)
+    idx = np.flatnonzero((lon >= total_bbox[0] - deg_per_pix)
+                         & (lon <= total_bbox[2] + deg_per_pix)
+                         & (lat >= total_bbox[1] - deg_per_pix)
+                         & (lat <= total_bbox[3] + deg_per_pix))
+    if idx.size == 0:
+        return idx
+    col = np.floor((lon[idx] + 180) / deg_per_pix).astype(int)
+    row = np.floor((90 - lat[idx]) / deg_per_pix).astype(int)
+    min_col, min_row = col.min(), row.min()
+    transform = rasterio.Affine(deg_per_pix, 0, -180 + min_col * deg_per_pix,
+                                0, -deg_per_pix, 90 - min_row * deg_per_pix)
+    geom = check_shape.__geo_interface__
+    if not check_enclaves:
+        polygons = [geom['coordinates']] if geom['type'] == 'Polygon' \
+            else geom['coordinates']
+        geom = {'type': 'MultiPolygon', 'coordinates': [poly[:1] for poly in polygons]}
+    burnt = rasterio.features.rasterize(
+        [(geom, 1)],
+        out_shape=(row.max() - min_row + 1, col.max() - min_col + 1),
+        transform=transform, fill=0, dtype=np.uint8)
+    return idx[burnt[row - min_row, col - min_col] == 1]
 
 def _get_country_info(iso3):
     """Get country ISO alpha_3, country id (defined as country appearance
@@ -1228,8 +1364,8 @@ def _calc_admin1(curr_country, country_info, admin1_info, litpop_data,
             It contains Shape files among others.
         litpop_data (pandas.arrays.SparseArray): The raw litpop_data to which the
             admin1 based value should be assinged.
-        coords (list): a list containing all the coordinates of the country in
-            the format (lon, lat)
+        coords (np.array): all the coordinates of the country in the format
+            (lon, lat), shape (n, 2)
         resolution (scalar): the desired resolution in arc-seconds.
         adm1_scatter (boolean): whether a scatter plot and correlation comparing admin0 and
             admin1 results should be produced.
@@ -1269,16 +1405,11 @@ def _calc_admin1(curr_country, country_info, admin1_info, litpop_data,
                 else:
                     mult = 0
                 if return_data:
-                    if not masks_adm1:
-                        litpop_data = pd.arrays.SparseArray(
-                            [val * mult if mask_adm1[idx] == 1 else val
-                             for idx, val in enumerate(litpop_data.to_numpy())],
-                            fill_value=0)
-                    else:
-                        litpop_data = pd.arrays.SparseArray(
-                            [val * mult if masks_adm1[idx3][idx] == 1 else val
-                             for idx, val in enumerate(litpop_data.to_numpy())],
-                            fill_value=0)
+                    if masks_adm1:
+                        mask_adm1 = masks_adm1[idx3]
+                    litpop_data = litpop_data.to_numpy()
+                    litpop_data[mask_adm1] *= mult
+                    litpop_data = pd.arrays.SparseArray(litpop_data, fill_value=0)
         else:
             temp_adm1 = {'mask': [], 'adm0_LitPop_share': [],
                          'adm1_LitPop_share': [], 'LitPop_sum': []}
@@ -1310,9 +1441,9 @@ def _calc_admin1(curr_country, country_info, admin1_info, litpop_data,
                             / temp_adm1['LitPop_sum'][idx2])
                     temp_mask = temp_adm1['mask'][idx2]
                     if return_data:
-                        litpop_data = pd.arrays.SparseArray(
-                            [val1 * mult if temp_mask[idx] == 1 else val1
-                             for idx, val1 in enumerate(litpop_data.to_numpy())])
+                        litpop_data = litpop_data.to_numpy()
+                        litpop_data[temp_mask] *= mult
+                        litpop_data = pd.arrays.SparseArray(litpop_data)
 
                 else:
                     LOGGER.warning('No admin1 data found for %s.',
@@ -1489,6 +1620,40 @@ def read_bm_file(bm_path, filename):
         LOGGER.error('Failed: Importing %s', str(curr_file))
         raise
 
+def _read_bm_window(bm_path, filename, curr_file, bbox, resolution):
+    """Reads the part of a single NASA BlackMarble GeoTiff within a bounding
+        box at the given resolution. Same result as read_bm_file followed by
+        zooming and _bm_bbox_cutter, without reading the full tile.
+
+    Parameters
+    ----------
+    bm_path : str
+        absolute path where files are stored.
+    filename : str
+        filename of the file to be read.
+    curr_file : int
+        index of the file among the eight BlackMarble tiles
+    bbox : array 4x1
+        Bounding box to which the data is cropped.
+    resolution : int
+        The resolution in arcsec with which the data is being imported.
+
+    Returns
+    -------
+    bm_data : pandas.DataFrame
+        Cropped BM data
+    """
+    window = _bm_tile_window(curr_file, bbox, resolution)
+    if window is None:
+        LOGGER.warning('This tile does not contain any relevant data. \
+                       Skipping file.')
+        return pd.DataFrame()
+    row_min, row_max, col_min, col_max = window
+    LOGGER.debug('Importing %s.', os.path.join(bm_path, filename))
+    bm_data = read_raster_zoomed_window(os.path.join(bm_path, filename), 15 / resolution,
+                                  (row_min, row_max + 1), (col_min, col_max + 1))
+    return to_sparse_dataframe(bm_data)
+
 def get_bm(required_files=np.ones(np.count_nonzero(BM_FILENAMES),),
            **parameters):
     """Potential TODO: put cutting before zooming (faster), but with expanding
@@ -1564,40 +1729,30 @@ def get_bm(required_files=np.ones(np.count_nonzero(BM_FILENAMES),),
                 continue
             else:
                 file_count = file_count + 1
-                arr1[j], curr_file = read_bm_file(
-                    bm_path,
-                    BM_FILENAMES[num_i * 2 + j] % min(BM_YEARS,
-                                                      key=lambda x: abs(x - reference_year)))
-                if zoom_factor != 1:
-#                    LOGGER.debug('Resizing image according to chosen '\
-#                                + 'resolution')
-                    arr1[j] = to_sparse_dataframe(nd.zoom(arr1[j], zoom_factor, order=1))
-                else:
-                    arr1[j] = to_sparse_dataframe(arr1[j])
+                bm_file = BM_FILENAMES[num_i * 2 + j] % min(BM_YEARS,
+                                                            key=lambda x: abs(x - reference_year))
                 if cut_bbox is not None:
-                    arr1[j] = _bm_bbox_cutter(arr1[j], (num_i * 2) + j, cut_bbox, resolution)
+                    # only the pixels within the bounding box are decoded
+                    arr1[j] = _read_bm_window(bm_path, bm_file, (num_i * 2) + j, cut_bbox,
+                                              resolution)
+                else:
+                    arr1[j], _ = read_bm_file(bm_path, bm_file)
+                    if zoom_factor != 1:
+                        arr1[j] = to_sparse_dataframe(nd.zoom(arr1[j], zoom_factor, order=1))
+                    else:
+                        arr1[j] = to_sparse_dataframe(arr1[j])
+                # Now get the coordinates
+                with rasterio.open(os.path.join(bm_path, bm_file), 'r') as src:
+                    tile_bounds = src.bounds
                 if file_count == 1:
-                    # Now get the coordinates
-                    geo_t = curr_file.GetGeoTransform()
-                    rastsize_x, rastsize_y = curr_file.RasterXSize,\
-                        curr_file.RasterYSize
-                    minlon = geo_t[0]
-                    minlat = geo_t[3] + rastsize_x * geo_t[4] + rastsize_y * geo_t[5]
-                    maxlon = geo_t[0] + rastsize_x * geo_t[1] + rastsize_y * geo_t[2]
-                    maxlat = geo_t[3]
+                    minlon, minlat = tile_bounds.left, tile_bounds.bottom
+                    maxlon, maxlat = tile_bounds.right, tile_bounds.top
                 else:
-                    geo_t = curr_file.GetGeoTransform()
-                    # Now get the coordinates
-                    rastsize_x, rastsize_y = curr_file.RasterXSize,\
-                        curr_file.RasterYSize
-                    minlon = min(minlon, geo_t[0])
                     # Only add if they extend the current bbox
-                    minlat = min(minlat, geo_t[3] + rastsize_x * geo_t[4]
-                                 + rastsize_y * geo_t[5])
-                    maxlon = max(maxlon, geo_t[0] + rastsize_x * geo_t[1]
-                                 + rastsize_y * geo_t[2])
-                    maxlat = max(maxlat, geo_t[3])
-                del curr_file
+                    minlon = min(minlon, tile_bounds.left)
+                    minlat = min(minlat, tile_bounds.bottom)
+                    maxlon = max(maxlon, tile_bounds.right)
+                    maxlat = max(maxlat, tile_bounds.top)
         if (arr1[0] is None) & (arr1[1] is None):
             continue
         elif (not arr1[0] is None) & (arr1[1] is None):
@@ -1649,8 +1804,36 @@ def _bm_bbox_cutter(bm_data, curr_file, bbox, resolution):
     Returns:
         bm_data (pandas.arrays.SparseArray): Cropped BM data
     """
-    fixed_source_resolution = resolution
-    deg_per_pix = 1 / (3600 / fixed_source_resolution)
+    deg_per_pix = 1 / (3600 / resolution)
+    window = _bm_tile_window(curr_file, bbox, resolution)
+    if window is None:
+        LOGGER.warning('This tile does not contain any relevant data. \
+                       Skipping file.')
+        return pd.DataFrame()
+    row_min, row_max, col_min, col_max = window
+
+    if isinstance(bm_data, pd.DataFrame):
+        bm_data = to_sparse_dataframe(bm_data.loc[row_min:row_max, col_min:col_max].values)
+    else:
+        row_max = min(row_max + 1, (90 - (deg_per_pix / 2)) * (1 / deg_per_pix))
+        col_max = min(col_max + 1, (90 - (deg_per_pix / 2)) * (1 / deg_per_pix))
+        bm_data = bm_data[row_min:row_max, col_min:col_max]
+    return bm_data
+
+def _bm_tile_window(curr_file, bbox, resolution):
+    """Rows and columns of a zoomed BlackMarble tile within a bounding box.
+
+    Parameters:
+        curr_file (integer): the file which is currenlty being imported (out
+            of all the eignt BM files) in zero indexing.
+        bbox (array 4x1): Bounding box to which the data should be cropped.
+        resolution (int): The resolution in arcsec with which the data is
+            being imported.
+
+    Returns:
+        row_min, row_max, col_min, col_max (int): first and last row and column
+            (inclusive), or None if the tile does not intersect the bounding box
+    """
     minlat, maxlat, minlon, maxlon = bbox[1], bbox[3], bbox[0], bbox[2]
     minlat_tile, maxlat_tile, minlon_tile, maxlon_tile =\
         (-90) + (curr_file // 2 == curr_file / 2) * (90),\
@@ -1658,9 +1841,7 @@ def _bm_bbox_cutter(bm_data, curr_file, bbox, resolution):
         (-180) + (curr_file // 2) * 90, (-90) + (curr_file // 2) * 90
     if minlat > maxlat_tile or maxlat < minlat_tile\
             or minlon > maxlon_tile or maxlon < minlon_tile:
-        LOGGER.warning('This tile does not contain any relevant data. \
-                       Skipping file.')
-        return pd.DataFrame()
+        return None
     bbox_conv = np.array((minlon, minlat, maxlon, maxlat))
     col_min, row_min, col_max, row_max = \
         _litpop_coords_in_glb_grid(bbox_conv, resolution)
@@ -1675,16 +1856,9 @@ def _bm_bbox_cutter(bm_data, curr_file, bbox, resolution):
         (curr_file // 2 != curr_file / 2) * (90) * (3600 / resolution)
     col_min = max(col_min, mincol_tile) - (curr_file // 2) * (90) * (3600 / resolution)
     col_max = min(col_max, maxcol_tile) - (curr_file // 2) * (90) * (3600 / resolution)
-
-    if isinstance(bm_data, pd.DataFrame):
-        bm_data = to_sparse_dataframe(bm_data.loc[row_min:row_max, col_min:col_max].values)
-    else:
-        row_max = min(row_max + 1, ((maxlat_tile - minlat_tile)
-                                    - (deg_per_pix / 2)) * (1 / deg_per_pix))
-        col_max = min(col_max + 1, ((maxlon_tile - minlon_tile)
-                                    - (deg_per_pix / 2)) * (1 / deg_per_pix))
-        bm_data = bm_data[row_min:row_max, col_min:col_max]
-    return bm_data
+    # labels within the (possibly fractional) limits, as selected by DataFrame.loc
+    return (int(np.ceil(row_min)), int(np.floor(row_max)),
+            int(np.ceil(col_min)), int(np.floor(col_max)))
 
 def _get_box_blackmarble(cut_bbox, **args):
     """Reads data from NASA GeoTiff files and cuts out the data along a chosen
@@ -1818,7 +1992,7 @@ def admin1_validation(country, methods, exponents, **args):
         cntry_val.append(gdp_val)
     _get_gdp2asset_factor(country_info, reference_year, shp_file, fin_mode=fin_mode)
     curr_shp = _get_country_shape(country_list[0], 0)
-    all_coords = _litpop_box2coords(cut_bbox, resolution, 1)
+    all_coords = np.column_stack(_litpop_box2coords(cut_bbox, resolution, 0))
     mask = _mask_from_shape(curr_shp, resolution=resolution,
                             points2check=all_coords)
 
@@ -1832,21 +2006,21 @@ def admin1_validation(country, methods, exponents, **args):
     del nightlights
 
     nightlights0 = pd.arrays.SparseArray(bm_temp, fill_value=0)
-    nightlights0 = nightlights0[mask.sp_index.indices]
+    nightlights0 = nightlights0[mask]
     nightlights1 = pd.arrays.SparseArray(bm_temp + 1, fill_value=1)
     del bm_temp
-    nightlights1 = nightlights1[mask.sp_index.indices]
+    nightlights1 = nightlights1[mask]
 
     gpw = gpw_import.get_box_gpw(cut_bbox=cut_bbox, resolution=resolution,
                                  return_coords=0, reference_year=reference_year)
-    gpw = gpw[mask.sp_index.indices]
+    gpw = gpw[mask]
 
-    lon, lat = zip(*np.array(all_coords)[mask.sp_index.indices])
+    cntry_coords = all_coords[mask]
     LOGGER.debug('Caclulating admin1 masks...')
     masks_adm1 = dict()
     for idx, adm1_shp in enumerate(admin1_info[country_list[0]]):
         masks_adm1[idx] = _mask_from_shape(adm1_shp[0], resolution=resolution,
-                                           points2check=list(zip(lon, lat)))
+                                           points2check=cntry_coords)
     n_scores = 4
     rho = np.zeros(len(methods) * n_scores)
     adm0 = dict()
@@ -1860,7 +2034,7 @@ def admin1_validation(country, methods, exponents, **args):
             _data = _LitPop_multiply(nightlights1, gpw, exponents=exponents[i])
         _, rho[i * n_scores:(i * n_scores) + n_scores], adm0[methods[i]], adm1[methods[i]] = \
             _calc_admin1(country_list[0], country_info[country_list[0]],
-                         admin1_info[country_list[0]], _data, list(zip(lon, lat)),
+                         admin1_info[country_list[0]], _data, cntry_coords,
                          resolution, True, conserve_cntrytotal=0,
                          check_plot=check_plot, masks_adm1=masks_adm1, return_data=0)
     return rho, adm0, adm1
@@ -1887,9 +2061,9 @@ def exposure_set_admin1(exposure, res_arcsec):
             LOGGER.debug('Extracting admin1 for %s.', adm1_shp[1]['name'])
             mask_adm1 = _mask_from_shape(
                 adm1_shp[0], resolution=res_arcsec,
-                points2check=list(zip(exposure.longitude, exposure.latitude)))
-            exposure.admin1_ID[mask_adm1] = adm1_shp[1][3]
-            exposure.admin1[mask_adm1] = adm1_shp[1]['name']
+                points2check=np.column_stack((exposure.longitude, exposure.latitude)))
+            exposure.loc[exposure.index[mask_adm1], 'admin1_ID'] = adm1_shp[1][3]
+            exposure.loc[exposure.index[mask_adm1], 'admin1'] = adm1_shp[1]['name']
     return exposure
 
 
@@ -0,0 +1,210 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Define ExposuresStore class.
+"""
+
+__all__ = ['ExposuresStore']
+
+import logging
+import os
+import numpy as np
+import pandas as pd
+
+from climada.entity.exposures.base import Exposures, INDICATOR_CENTR
+
+LOGGER = logging.getLogger(__name__)
+
+DEF_CHUNK_SIZE = 1000000
+"""Default number of exposures read at once from an ExposuresStore"""
+
+COLUMN_KEY = 'columns/%s'
+"""Key of the HDF5 table containing a column of an ExposuresStore"""
+
+META_KEY = 'metadata'
+"""Key of the HDF5 node containing the metadata of an ExposuresStore"""
+
+class ExposuresStore():
+    """Exposures kept on disk in an HDF5 file, one table per column, which are
+    read in chunks of rows. The geometry is not stored, it is computed from
+    latitude and longitude on demand.
+
+    Calling sequence example:
+    store = ExposuresStore('exposures.h5')
+    for exp_chunk in exposures_chunks:
+        store.append(exp_chunk)
+    store.assign_centroids(hazard)
+    imp = Impact()
+    imp.calc(store, impact_funcs, hazard)
+
+    Attributes:
+        file_name (str): HDF5 file containing the exposures
+        chunk_size (int): number of exposures read at once
+        columns (list(str)): names of the stored columns
+        size (int): number of exposures
+        tag (Tag): metada - information about the source data
+        ref_year (int): metada - reference year
+        value_unit (str): metada - unit of the exposures values
+        crs (dict or crs): CRS of the exposures
+        meta (dict): metada - corresponding raster properties (if any)
+    """
+    def __init__(self, file_name, chunk_size=DEF_CHUNK_SIZE):
+        """Open a store. If the file exists, its metadata and column names are
+        read, the data is not.
+
+        Parameters:
+            file_name (str): (path and) file name of the HDF5 file
+            chunk_size (int, optional): number of exposures read at once.
+                Default: DEF_CHUNK_SIZE
+        """
+        self.file_name = file_name
+        self.chunk_size = chunk_size
+        self.columns = list()
+        self.size = 0
+        if os.path.isfile(file_name):
+            with pd.HDFStore(file_name, mode='r') as store:
+                if '/' + META_KEY in store.keys():
+                    for key, val in store.get_storer(META_KEY).attrs.metadata.items():
+                        setattr(self, key, val)
+                    self.columns = [key.split('/')[-1] for key in store.keys()
+                                    if key.startswith('/' + COLUMN_KEY % '')]
+                    self.size = store.get_storer(COLUMN_KEY % self.columns[0]).nrows
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __len__(self):
+        return self.size
+
+    def append(self, exposures, min_itemsize=None):
+        """Append the rows of an Exposures to the store. The first appended
+        exposures define the columns and metadata of the store. The geometry
+        column is not stored.
+
+        Parameters:
+            exposures (Exposures): exposures to append
+            min_itemsize (dict, optional): minimum length of the string columns,
+                passed to pandas.HDFStore.append
+        """
+        columns = [col for col in exposures.columns if col != 'geometry']
+        with pd.HDFStore(self.file_name) as store:
+            if not self.columns:
+                exposures.check()
+                var_meta = {}
+                for var in Exposures._metadata:
+                    if var[0] != '_':
+                        var_meta[var] = getattr(exposures, var, None)
+                var_meta['crs'] = exposures.crs
+                store.put(META_KEY, pd.DataFrame())
+                store.get_storer(META_KEY).attrs.metadata = var_meta
+                for key, val in var_meta.items():
+                    setattr(self, key, val)
+                self.columns = columns
+            elif set(columns) != set(self.columns):
+                LOGGER.error('Columns %s do not match the stored columns %s.',
+                             columns, self.columns)
+                raise ValueError
+            for col in self.columns:
+                col_min_itemsize = None
+                if min_itemsize and col in min_itemsize:
+                    col_min_itemsize = {col: min_itemsize[col]}
+                store.append(COLUMN_KEY % col,
+                             pd.DataFrame({col: np.asarray(exposures[col])}),
+                             index=False, min_itemsize=col_min_itemsize)
+        self.size += exposures.shape[0]
+
+    def read_column(self, column, start=None, stop=None):
+        """Read the values of one column.
+
+        Parameters:
+            column (str): column name
+            start (int, optional): first row to read. Default: 0
+            stop (int, optional): last row + 1 to read. Default: all rows
+
+        Returns:
+            np.array
+        """
+        if column not in self.columns:
+            LOGGER.error('Column %s not found in %s.', column, self.file_name)
+            raise KeyError(column)
+        with pd.HDFStore(self.file_name, mode='r') as store:
+            return store.select(COLUMN_KEY % column, start=start, stop=stop)[column].values
+
+    def read(self, start=None, stop=None, columns=None, geometry=False):
+        """Read rows of the store as Exposures.
+
+        Parameters:
+            start (int, optional): first row to read. Default: 0
+            stop (int, optional): last row + 1 to read. Default: all rows
+            columns (list(str), optional): columns to read. Default: all columns
+            geometry (bool, optional): set the geometry from latitude and
+                longitude. Default: False
+
+        Returns:
+            Exposures (with the row positions in the store as index)
+        """
+        if columns is None:
+            columns = self.columns
+        start = 0 if start is None else start
+        stop = self.size if stop is None else min(stop, self.size)
+        with pd.HDFStore(self.file_name, mode='r') as store:
+            data = {col: store.select(COLUMN_KEY % col, start=start, stop=stop)[col].values
+                    for col in columns}
+        exp = Exposures(pd.DataFrame(data, index=np.arange(start, stop)))
+        for var in Exposures._metadata:
+            if var[0] != '_' and hasattr(self, var):
+                setattr(exp, var, getattr(self, var))
+        exp.crs = self.crs
+        if geometry:
+            exp.set_geometry_points()
+        return exp
+
+    def iter_chunks(self, columns=None, geometry=False):
+        """Iterate over the store in chunks of chunk_size rows.
+
+        Parameters:
+            columns (list(str), optional): columns to read. Default: all columns
+            geometry (bool, optional): set the geometry from latitude and
+                longitude. Default: False
+
+        Returns:
+            generator of Exposures (with the row positions in the store as index)
+        """
+        for start in range(0, self.size, self.chunk_size):
+            yield self.read(start, start + self.chunk_size, columns, geometry)
+
+    def assign_centroids(self, hazard, **kwargs):
+        """Assign for each exposure coordinate closest hazard coordinate, chunk
+        by chunk, and store them in the column centr_ + hazard type. See
+        Exposures.assign_centroids.
+
+        Parameters:
+            hazard (Hazard): hazard to match (with raster or vector centroids)
+            kwargs (optional): arguments of Exposures.assign_centroids
+        """
+        col = INDICATOR_CENTR + hazard.tag.haz_type
+        if col in self.columns:
+            with pd.HDFStore(self.file_name) as store:
+                store.remove(COLUMN_KEY % col)
+        for exp_chunk in self.iter_chunks(columns=['latitude', 'longitude']):
+            exp_chunk.assign_centroids(hazard, **kwargs)
+            with pd.HDFStore(self.file_name) as store:
+                store.append(COLUMN_KEY % col,
+                             pd.DataFrame({col: exp_chunk[col].values}), index=False)
+        if col not in self.columns:
+            self.columns.append(col)
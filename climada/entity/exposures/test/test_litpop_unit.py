@@ -16,9 +16,13 @@ with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
 
 Unit Tests on LitPop exposures.
 """
+import os
+import tempfile
 import numpy as np
+from scipy import ndimage as nd
 import unittest
 from climada.entity.exposures import litpop as lp
+from climada.entity.exposures import gpw_import
 
 def _rnd(number, dec=6):
     return np.around(number, decimals=dec)
@@ -105,9 +109,32 @@ class TestLitPopFunctions(unittest.TestCase):
         curr_country = 'SWZ'
         curr_shp = lp._get_country_shape(curr_country, 0)
         mask = lp._mask_from_shape(curr_shp, resolution=60)
-        self.assertEqual(mask.sp_index.indices.size, 5591)
-        self.assertTrue(mask.sp_values.max())
-        self.assertIn(140 and 7663, mask.sp_index.indices)
+        self.assertEqual(mask.size, 5591)
+        self.assertIn(140 and 7663, mask)
+
+    def test_mask_from_shape_enclave(self):
+        """test function _mask_from_shape for a shape with a hole and two parts"""
+        shp = lp.shapefile.Shape(shapeType=5, points=[
+            (0, 0), (0, 10), (10, 10), (10, 0), (0, 0),
+            (2, 2), (4, 2), (4, 4), (2, 4), (2, 2),
+            (12, 0), (12, 3), (15, 3), (15, 0), (12, 0)], parts=[0, 5, 10])
+        lon, lat = lp._litpop_box2coords((0, 0, 15, 10), 3600)
+        mask = lp._mask_from_shape(shp, resolution=3600,
+                                   points2check=np.column_stack((lon, lat)))
+        inside = (((lon < 10) & ~((lon > 2) & (lon < 4) & (lat > 2) & (lat < 4)))
+                  | ((lon > 12) & (lat < 3)))
+        np.testing.assert_array_equal(mask, np.flatnonzero(inside))
+        # holes are included without enclave checking
+        mask = lp._mask_from_shape(shp, resolution=3600, check_enclaves=False,
+                                   points2check=np.column_stack((lon, lat)))
+        np.testing.assert_array_equal(
+            mask, np.flatnonzero((lon < 10) | ((lon > 12) & (lat < 3))))
+        # points created from the bounding box of the shape
+        mask = lp._mask_from_shape(shp, resolution=3600)
+        self.assertEqual(mask.size, inside.sum())
+        # points far from the shape
+        mask = lp._mask_from_shape(shp, resolution=3600, points2check=[(50.5, 50.5)])
+        self.assertEqual(mask.size, 0)
 
     def test_litpop_box2coords(self):
         """test function _litpop_box2coords for Taiwan"""
@@ -119,6 +146,51 @@ class TestLitPopFunctions(unittest.TestCase):
         self.assertIn(_rnd(117.91666666666666) and _rnd(22.08333333333333),
                       _rnd(min(all_coords)))
 
+    def test_litpop_tile_bbox(self):
+        """test function _litpop_tile_bbox: selects exactly the pixels of a tile"""
+        for resolution in [30, 300, 3600]:
+            n_pix = lp._litpop_tile_pixels(resolution)
+            for tile in [(0, 0), (4, 17), (17, 35)]:
+                bbox = lp._litpop_tile_bbox(tile, resolution)
+                grid = lp._litpop_coords_in_glb_grid(bbox, resolution)
+                self.assertEqual(list(grid), [tile[1] * n_pix, tile[0] * n_pix,
+                                              (tile[1] + 1) * n_pix - 1,
+                                              (tile[0] + 1) * n_pix - 1])
+        with self.assertRaises(ValueError):
+            lp._litpop_tile_pixels(700)
+
+    def test_litpop_box_tiled(self):
+        """test function _get_litpop_box_tiled from cached tiles"""
+        resolution, ref_year, exponents = 3600, 2016, [1, 1]
+        n_pix = lp._litpop_tile_pixels(resolution)
+        with tempfile.TemporaryDirectory() as tile_dir:
+            # fill the tiles with a function of the pixel's coordinates
+            for tile in [(4, 18), (4, 19), (5, 18), (5, 19)]:
+                lon, lat = lp._litpop_box2coords(lp._litpop_tile_bbox(tile, resolution),
+                                                 resolution)
+                data = (1000 * lon + lat).reshape((n_pix, n_pix), order='F')
+                path = lp._litpop_tile_path(tile, resolution, ref_year, exponents, tile_dir)
+                lp.write_raster(path, data, {
+                    'crs': lp.DEF_CRS, 'height': n_pix, 'width': n_pix,
+                    'transform': lp.rasterio.Affine(1, 0, -180 + tile[1] * 10,
+                                                    0, -1, 90 - tile[0] * 10),
+                }, dtype=np.float64)
+            self.assertEqual(len(os.listdir(tile_dir)), 4)
+            cut_bbox = (3.2, 35.5, 13.7, 47.1)
+            litpop_data = lp._get_litpop_box_tiled(cut_bbox, resolution, ref_year,
+                                                   exponents, tile_dir)
+            lon, lat = lp._litpop_box2coords(cut_bbox, resolution)
+            self.assertEqual(litpop_data.size, lon.size)
+            np.testing.assert_allclose(litpop_data.to_numpy(), 1000 * lon + lat)
+
+    def test_zoom_weights(self):
+        """test function gpw_import._zoom_weights: sum of zoomed data"""
+        data = np.random.RandomState(0).rand(301, 457)
+        for zoom_factor in [1, 0.5, 0.1, 2]:
+            weights = [gpw_import._zoom_weights(n_in, zoom_factor) for n_in in data.shape]
+            self.assertAlmostEqual(np.dot(weights[0], np.dot(data, weights[1])),
+                                   nd.zoom(data, zoom_factor, order=1).sum(), places=6)
+
 # Execute Tests
 if __name__ == "__main__":
     TESTS = unittest.TestLoader().loadTestsFromTestCase(TestLitPopFunctions)
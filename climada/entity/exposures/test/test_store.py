@@ -0,0 +1,108 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Test ExposuresStore class.
+"""
+import os
+import unittest
+import numpy as np
+
+from climada.entity.entity_def import Entity
+from climada.entity.exposures.base import INDICATOR_CENTR
+from climada.entity.exposures.store import ExposuresStore
+from climada.engine.impact import Impact
+from climada.hazard.base import Hazard
+from climada.util.constants import ENT_DEMO_TODAY, HAZ_DEMO_MAT
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+class TestStore(unittest.TestCase):
+    """Test ExposuresStore"""
+
+    def setUp(self):
+        self.file_name = os.path.join(DATA_DIR, 'test_store.h5')
+        if os.path.isfile(self.file_name):
+            os.remove(self.file_name)
+        ent = Entity()
+        ent.read_excel(ENT_DEMO_TODAY)
+        ent.check()
+        self.ent = ent
+
+    def tearDown(self):
+        if os.path.isfile(self.file_name):
+            os.remove(self.file_name)
+
+    def _fill_store(self, chunk_size):
+        store = ExposuresStore(self.file_name, chunk_size)
+        exp = self.ent.exposures
+        for start in range(0, exp.shape[0], 13):
+            store.append(exp.iloc[start:start + 13])
+        return store
+
+    def test_append_read_pass(self):
+        """Appended chunks are read back identically"""
+        exp = self.ent.exposures
+        store = self._fill_store(10)
+        self.assertEqual(len(store), exp.shape[0])
+        self.assertNotIn('geometry', store)
+        self.assertEqual(store.ref_year, exp.ref_year)
+        self.assertEqual(store.value_unit, exp.value_unit)
+
+        store_read = ExposuresStore(self.file_name, 10)
+        self.assertEqual(store_read.size, exp.shape[0])
+        self.assertEqual(set(store_read.columns), set(store.columns))
+        self.assertEqual(store_read.tag.file_name, exp.tag.file_name)
+        self.assertTrue(np.array_equal(store_read.read_column('value'),
+                                       exp.value.values))
+
+        chunks = list(store_read.iter_chunks(geometry=True))
+        self.assertEqual(len(chunks), int(np.ceil(exp.shape[0] / 10)))
+        self.assertTrue(np.array_equal(chunks[1].index, np.arange(10, 20)))
+        self.assertTrue(np.array_equal(chunks[1].latitude.values,
+                                       exp.latitude.values[10:20]))
+        self.assertEqual(chunks[1].geometry[10].y, exp.latitude.values[10])
+
+        with self.assertRaises(ValueError):
+            store.append(exp[['value', 'latitude', 'longitude']])
+
+    def test_assign_impact_pass(self):
+        """Impact computed chunk by chunk equals the in-memory one"""
+        hazard = Hazard('TC')
+        hazard.read_mat(HAZ_DEMO_MAT)
+        exp = self.ent.exposures
+        exp.assign_centroids(hazard)
+        store = self._fill_store(7)
+        store.assign_centroids(hazard)
+        self.assertTrue(np.array_equal(store.read_column(INDICATOR_CENTR + 'TC'),
+                                       exp[INDICATOR_CENTR + 'TC'].values))
+
+        imp = Impact()
+        imp.calc(exp, self.ent.impact_funcs, hazard, save_mat=True)
+        imp_store = Impact()
+        imp_store.calc(store, self.ent.impact_funcs, hazard, save_mat=True)
+        self.assertTrue(np.allclose(imp_store.eai_exp, imp.eai_exp))
+        self.assertTrue(np.allclose(imp_store.at_event, imp.at_event))
+        self.assertTrue(np.isclose(imp_store.aai_agg, imp.aai_agg))
+        self.assertTrue(np.isclose(imp_store.tot_value, imp.tot_value))
+        self.assertTrue(np.allclose(imp_store.coord_exp, imp.coord_exp))
+        self.assertEqual((imp_store.imp_mat != imp.imp_mat).nnz, 0)
+
+# Execute Tests
+if __name__ == "__main__":
+    TESTS = unittest.TestLoader().loadTestsFromTestCase(TestStore)
+    unittest.TextTestRunner(verbosity=2).run(TESTS)
@@ -20,3 +20,4 @@ init measures
 """
 from .base import *
 from .measure_set import *
+from .file_cache import *
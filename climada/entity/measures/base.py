@@ -25,8 +25,10 @@ import copy
 import logging
 import numpy as np
 import pandas as pd
+from scipy import sparse
 
 from climada.entity.exposures.base import Exposures, INDICATOR_IF, INDICATOR_CENTR
+from climada.entity.measures.file_cache import load_hazard, load_exposures
 import climada.util.checker as check
 
 LOGGER = logging.getLogger(__name__)
@@ -107,18 +109,35 @@ class Measure():
         check.size(2, self.mdd_impact, 'Measure.mdd_impact')
         check.size(2, self.paa_impact, 'Measure.paa_impact')
 
-    def calc_impact(self, exposures, imp_fun_set, hazard):
+    def calc_impact(self, exposures, imp_fun_set, hazard, imp_base=None):
         """Apply measure and compute impact and risk transfer of measure
         implemented over inputs.
 
+        If the impact without measure is provided and the measure only changes
+        impact functions (imp_fun_map, hazard_inten_imp, mdd_impact,
+        paa_impact, optionally in exp_region_id), only the impact of the
+        exposures affected by the measure is computed and the impact without
+        measure is updated by difference. The impact matrix of the result is
+        then not set and its exposures keep the order of the input exposures,
+        also when exp_region_id is set.
+
         Parameters:
             exposures (Exposures): exposures instance
             imp_fun_set (ImpactFuncSet): impact functions instance
             hazard (Hazard): hazard instance
+            imp_base (Impact, optional): impact of exposures, imp_fun_set and
+                hazard without measure, computed with save_mat=True
 
         Returns:
             Impact (resulting impact), Impact (insurance layer)
         """
+        if imp_base is not None:
+            exp_idx = self._affected_exposures(exposures, imp_fun_set)
+            if exp_idx is not None:
+                return self._calc_impact_delta(exposures, imp_fun_set, hazard,
+                                               imp_base, exp_idx)
+            LOGGER.debug('Measure %s changes hazard or exposures: impact fully '
+                         'recomputed.', self.name)
         new_exp, new_ifs, new_haz = self.apply(exposures, imp_fun_set, hazard)
         return self._calc_impact(new_exp, new_ifs, new_haz)
 
@@ -161,11 +180,79 @@ class Measure():
         """
         from climada.engine.impact import Impact
         imp = Impact()
-        imp.calc(new_exp, new_ifs, new_haz)
+        imp.calc(_assigned_exposures(new_exp, new_haz), new_ifs, new_haz)
+        return imp.calc_risk_transfer(self.risk_transf_attach, self.risk_transf_cover)
+
+    def _affected_exposures(self, exposures, imp_fun_set):
+        """Positions of the exposures whose impact is changed by the measure.
+
+        Parameters:
+            exposures (Exposures): exposures instance
+            imp_fun_set (ImpactFuncSet): impact functions instance
+
+        Returns:
+            np.array, or None if the measure changes the hazard or the
+            exposures (then all the impacts might change)
+        """
+        if self.hazard_set != NULL_STR or self.hazard_freq_cutoff != 0 or \
+        not isinstance(self.exposures_set, str) or self.exposures_set != NULL_STR:
+            return None
+
+        if_col = INDICATOR_IF + self.haz_type
+        if if_col not in exposures.columns:
+            if_col = INDICATOR_IF
+        exp_if = exposures[if_col].values
+        chg_exp = np.zeros(exp_if.size, dtype=bool)
+        if self.imp_fun_map != NULL_STR:
+            chg_exp |= exp_if == int(self.imp_fun_map[0:self.imp_fun_map.find('to')])
+        if self.hazard_inten_imp != (1, 0) or self.mdd_impact != (1, 0) \
+        or self.paa_impact != (1, 0):
+            # all the impact functions of the hazard are changed
+            chg_exp |= np.isin(exp_if, imp_fun_set.get_ids(self.haz_type))
+        if self.exp_region_id:
+            chg_exp &= np.isin(exposures.region_id.values, self.exp_region_id)
+        return np.argwhere(chg_exp).reshape(-1)
+
+    def _calc_impact_delta(self, exposures, imp_fun_set, hazard, imp_base, exp_idx):
+        """Compute impact and risk transfer of measure recomputing only the
+        impact of the affected exposures.
+
+        Parameters:
+            exposures (Exposures): exposures instance
+            imp_fun_set (ImpactFuncSet): impact functions instance
+            hazard (Hazard): hazard instance
+            imp_base (Impact): impact without measure, with impact matrix
+            exp_idx (np.array): positions of the exposures changed by the measure
+
+        Returns:
+            Impact, Impact
+        """
+        if imp_base.imp_mat.shape != (hazard.intensity.shape[0], exposures.shape[0]):
+            LOGGER.error('The impact without measure needs an impact matrix of '
+                         'shape %s: compute it with save_mat=True.',
+                         (hazard.intensity.shape[0], exposures.shape[0]))
+            raise ValueError
+
+        LOGGER.debug('Recomputing impact of %s exposures.', exp_idx.size)
+        imp = copy.copy(imp_base)
+        imp.imp_mat = sparse.csr_matrix(np.empty((0, 0)))
+        if exp_idx.size:
+            from climada.engine.impact import Impact
+            sub_exp = Exposures(exposures.iloc[exp_idx], crs=exposures.crs)
+            new_exp, new_ifs, new_haz = self.apply(sub_exp, imp_fun_set, hazard)
+            imp_sub = Impact()
+            imp_sub.calc(new_exp, new_ifs, new_haz)
+
+            imp.at_event = imp_base.at_event + imp_sub.at_event - \
+                np.asarray(imp_base.imp_mat[:, exp_idx].sum(axis=1)).reshape(-1)
+            imp.eai_exp = imp_base.eai_exp.copy()
+            imp.eai_exp[exp_idx] = imp_sub.eai_exp
+            imp.aai_agg = sum(imp.at_event * imp.frequency)
         return imp.calc_risk_transfer(self.risk_transf_attach, self.risk_transf_cover)
 
     def _change_all_hazard(self, hazard):
-        """Change hazard to provided hazard_set.
+        """Change hazard to provided hazard_set. The file is read once and
+        cached, see file_cache.
 
         Parameters:
             hazard (Hazard): hazard instance
@@ -177,14 +264,11 @@ class Measure():
             return hazard
 
         LOGGER.debug('Setting new hazard %s', self.hazard_set)
-        from climada.hazard.base import Hazard
-        new_haz = Hazard(hazard.tag.haz_type)
-        new_haz.read_hdf5(self.hazard_set)
-        new_haz.check()
-        return new_haz
+        return load_hazard(self.hazard_set, hazard.tag.haz_type)
 
     def _change_all_exposures(self, exposures):
-        """Change exposures to provided exposures_set.
+        """Change exposures to provided exposures_set. A file is read once and
+        cached, see file_cache.
 
         Parameters:
             exposures (Exposures): exposures instance
@@ -197,12 +281,10 @@ class Measure():
 
         if isinstance(self.exposures_set, str):
             LOGGER.debug('Setting new exposures %s', self.exposures_set)
-            new_exp = Exposures()
-            new_exp.read_hdf5(self.exposures_set)
-            new_exp.check()
+            new_exp = load_exposures(self.exposures_set)
         elif isinstance(self.exposures_set, Exposures):
             LOGGER.debug('Setting new exposures. ')
-            new_exp = copy.deepcopy(self.exposures_set)
+            new_exp = self.exposures_set.copy(deep=False)
             new_exp.check()
         else:
             LOGGER.error('Wrong input exposures.')
@@ -226,18 +308,14 @@ class Measure():
             return exposures
 
         LOGGER.debug('Setting new exposures impact functions%s', self.imp_fun_map)
-        new_exp = copy.deepcopy(exposures)
         from_id = int(self.imp_fun_map[0:self.imp_fun_map.find('to')])
         to_id = int(self.imp_fun_map[self.imp_fun_map.find('to') + 2:])
-        try:
-            exp_change = np.argwhere(new_exp[INDICATOR_IF + self.haz_type].values == from_id).\
-                reshape(-1)
-            new_exp[INDICATOR_IF + self.haz_type].values[exp_change] = to_id
-        except KeyError:
-            exp_change = np.argwhere(new_exp[INDICATOR_IF].values == from_id).\
-                reshape(-1)
-            new_exp[INDICATOR_IF].values[exp_change] = to_id
-        return new_exp
+        if_col = INDICATOR_IF + self.haz_type
+        if if_col not in exposures.columns:
+            if_col = INDICATOR_IF
+        new_if = exposures[if_col].values.copy()
+        new_if[new_if == from_id] = to_id
+        return _replace_column(exposures, if_col, new_if)
 
     def _change_imp_func(self, imp_set):
         """Apply measure to impact functions of the same hazard type.
@@ -252,7 +330,14 @@ class Measure():
         and self.paa_impact == (1, 0):
             return imp_set
 
-        new_imp_set = copy.deepcopy(imp_set)
+        # copy only the impact functions of the hazard type, which are changed
+        new_imp_set = copy.copy(imp_set)
+        new_imp_set._data = {haz_type: dict(funcs)
+                             for haz_type, funcs in imp_set.get_func().items()}
+        if self.haz_type in new_imp_set._data:
+            new_imp_set._data[self.haz_type] = {
+                fun_id: copy.copy(imp_fun)
+                for fun_id, imp_fun in new_imp_set._data[self.haz_type].items()}
         for imp_fun in new_imp_set.get_func(self.haz_type):
             LOGGER.debug('Transforming impact functions.')
             imp_fun.intensity = np.maximum(
@@ -292,11 +377,13 @@ class Measure():
             )
             exp_imp = exposures[in_reg]
             exp_imp = Exposures(exp_imp, crs=exposures.crs)
-        imp.calc(exp_imp, if_set, hazard)
+        imp.calc(_assigned_exposures(exp_imp, hazard), if_set, hazard)
 
         LOGGER.debug('Cutting events whose damage have a frequency > %s.',
                      self.hazard_freq_cutoff)
-        new_haz = copy.deepcopy(hazard)
+        # only the intensity is changed: share all the other attributes
+        new_haz = copy.copy(hazard)
+        new_haz.intensity = hazard.intensity.copy()
         sort_idxs = np.argsort(imp.at_event)[::-1]
         exceed_freq = np.cumsum(imp.frequency[sort_idxs])
         cutoff = exceed_freq > self.hazard_freq_cutoff
@@ -327,9 +414,6 @@ class Measure():
         if not self.exp_region_id:
             return new_exp, new_ifs, new_haz
 
-        if exposures is new_exp:
-            new_exp = copy.deepcopy(exposures)
-
         chg_reg = np.logical_or.reduce(
             [exposures.region_id.values == reg for reg in self.exp_region_id]
         )
@@ -344,10 +428,10 @@ class Measure():
                 new_ifs.get_func()[self.haz_type][key].id = key + IF_ID_FACT
                 new_ifs.get_func()[self.haz_type][key + IF_ID_FACT] = \
                     new_ifs.get_func()[self.haz_type][key]
-            try:
-                new_exp[INDICATOR_IF + self.haz_type] += IF_ID_FACT
-            except KeyError:
-                new_exp[INDICATOR_IF] += IF_ID_FACT
+            if_col = INDICATOR_IF + self.haz_type
+            if if_col not in new_exp.columns:
+                if_col = INDICATOR_IF
+            new_exp = _replace_column(new_exp, if_col, new_exp[if_col].values + IF_ID_FACT)
             # collect old impact functions as well (used by exposures)
             new_ifs.get_func()[self.haz_type].update(imp_set.get_func()[self.haz_type])
 
@@ -368,12 +452,51 @@ class Measure():
             elif INDICATOR_CENTR in exposures.columns:
                 centr = exposures[INDICATOR_CENTR].values[chg_reg]
             else:
-                exposures.assign_centroids(hazard)
-                centr = exposures[INDICATOR_CENTR + self.haz_type].values[chg_reg]
+                centr = _assigned_exposures(exposures, hazard)[
+                    INDICATOR_CENTR + self.haz_type].values[chg_reg]
 
             centr = np.delete(np.arange(hazard.intensity.shape[1]), np.unique(centr))
             new_haz_inten = new_haz.intensity.tolil()
             new_haz_inten[:, centr] = hazard.intensity[:, centr]
+            # new_haz might be shared with the file cache
+            new_haz = copy.copy(new_haz)
             new_haz.intensity = new_haz_inten.tocsr()
 
         return new_exp, new_ifs, new_haz
+
+def _assigned_exposures(exposures, hazard):
+    """Exposures with the centroids of hazard assigned, without modifying
+    exposures: if they are not assigned yet, a shallow copy is assigned. The
+    measures can then be computed in parallel on the same exposures.
+
+    Parameters:
+        exposures (Exposures): exposures instance
+        hazard (Hazard): hazard instance
+
+    Returns:
+        Exposures
+    """
+    if INDICATOR_CENTR + hazard.tag.haz_type in exposures.columns:
+        return exposures
+    new_exp = exposures.copy(deep=False)
+    new_exp.assign_centroids(hazard)
+    return new_exp
+
+def _replace_column(exposures, column, values):
+    """Shallow copy of exposures with one column replaced. The other columns
+    are not duplicated.
+
+    Parameters:
+        exposures (Exposures): exposures instance
+        column (str): name of the column to replace
+        values (np.array): new values of the column
+
+    Returns:
+        Exposures
+    """
+    new_exp = exposures.copy(deep=False)
+    # deleting the column never writes into the data shared with exposures,
+    # assigning it in place could
+    del new_exp[column]
+    new_exp[column] = values
+    return new_exp
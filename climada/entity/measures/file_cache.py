@@ -0,0 +1,188 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Process-level cache of the hazards and exposures read from the files given in
+Measure.hazard_set and Measure.exposures_set.
+
+The entries are keyed by file path and modification time, so that a modified
+file is read again. The least recently used entries are dropped when the total
+size of the cached arrays exceeds "file_cache_size" bytes of the "measures"
+section of the configuration file (0 disables the cache). The cached objects
+are shared: they must not be modified in place.
+"""
+
+__all__ = ['clear_file_cache', 'file_cache_info']
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from scipy import sparse
+
+from climada.entity.exposures.base import Exposures
+from climada.util.config import CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+DEF_FILE_CACHE_SIZE = 4.0e9
+"""Default maximum size in bytes of the cached hazards and exposures"""
+
+_CACHE = OrderedDict()
+"""(kind, absolute path, mtime, size, args) -> (object, bytes), least recently
+used first"""
+
+_LOCK = threading.RLock()
+"""Lock of _CACHE and _KEY_LOCKS"""
+
+_KEY_LOCKS = dict()
+"""key -> lock held while the file of the key is read, so that a file is read
+once while different files are read in parallel"""
+
+def _max_bytes():
+    """Get the memory budget of the cache from the configuration."""
+    return CONFIG.get('measures', {}).get('file_cache_size', DEF_FILE_CACHE_SIZE)
+
+def _nbytes(obj):
+    """Approximate memory of the arrays of a Hazard (with its centroids) or
+    an Exposures."""
+    if isinstance(obj, Exposures):
+        return int(obj.memory_usage(index=True).sum())
+    nbytes = 0
+    for var in list(vars(obj).values()) + list(vars(getattr(obj, 'centroids', obj)).values()):
+        if isinstance(var, np.ndarray):
+            nbytes += var.nbytes
+        elif isinstance(var, sparse.csr_matrix):
+            nbytes += var.data.nbytes + var.indices.nbytes + var.indptr.nbytes
+    return nbytes
+
+def _load(kind, file_name, reader, *args):
+    """Get object read by reader(file_name, *args) from the cache, or read and
+    cache it.
+
+    Parameters:
+        kind (str): 'hazard' or 'exposures'
+        file_name (str): file read
+        reader (function): function reading the file
+        args (optional): further arguments of reader, part of the key
+
+    Returns:
+        Hazard or Exposures
+    """
+    abs_name = os.path.abspath(file_name)
+    stat = os.stat(abs_name)
+    key = (kind, abs_name, stat.st_mtime_ns, stat.st_size) + args
+    with _LOCK:
+        if key in _CACHE:
+            LOGGER.debug('Using cached %s %s.', kind, file_name)
+            _CACHE.move_to_end(key)
+            return _CACHE[key][0]
+        key_lock = _KEY_LOCKS.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _LOCK:
+            # read meanwhile by another thread
+            if key in _CACHE:
+                _CACHE.move_to_end(key)
+                return _CACHE[key][0]
+        try:
+            obj = reader(file_name, *args)
+        except BaseException:
+            with _LOCK:
+                _KEY_LOCKS.pop(key, None)
+            raise
+        with _LOCK:
+            _KEY_LOCKS.pop(key, None)
+            # drop older versions of the file
+            for old_key in [old_key for old_key in _CACHE
+                            if old_key[:2] == key[:2] and old_key[2:4] != key[2:4]]:
+                del _CACHE[old_key]
+            obj_bytes = _nbytes(obj)
+            max_bytes = _max_bytes()
+            if obj_bytes > max_bytes:
+                LOGGER.debug('%s %s not cached: %s bytes over budget.', kind,
+                             file_name, obj_bytes)
+                return obj
+            tot_bytes = sum(val[1] for val in _CACHE.values())
+            while _CACHE and tot_bytes + obj_bytes > max_bytes:
+                _, (_, old_bytes) = _CACHE.popitem(last=False)
+                tot_bytes -= old_bytes
+            _CACHE[key] = (obj, obj_bytes)
+            return obj
+
+def _read_hazard(file_name, haz_type):
+    from climada.hazard.base import Hazard
+    haz = Hazard(haz_type)
+    haz.read_hdf5(file_name)
+    haz.check()
+    return haz
+
+def _read_exposures(file_name):
+    exp = Exposures()
+    exp.read_hdf5(file_name)
+    exp.check()
+    return exp
+
+def load_hazard(file_name, haz_type):
+    """Read a checked Hazard from an HDF5 file, or get it from the cache.
+
+    Parameters:
+        file_name (str): HDF5 file name
+        haz_type (str): hazard type
+
+    Returns:
+        Hazard (shared, not to be modified in place)
+    """
+    return _load('hazard', file_name, _read_hazard, haz_type)
+
+def load_exposures(file_name):
+    """Read a checked Exposures from an HDF5 file, or get it from the cache.
+    A shallow copy is returned, so that columns can be added or replaced.
+
+    Parameters:
+        file_name (str): HDF5 file name
+
+    Returns:
+        Exposures (with values shared with the cache)
+    """
+    return _load('exposures', file_name, _read_exposures).copy(deep=False)
+
+def clear_file_cache(file_name=None):
+    """Remove the cached hazards and exposures read from a file, or all of
+    them.
+
+    Parameters:
+        file_name (str, optional): file whose entries are removed. Default: all
+    """
+    with _LOCK:
+        if file_name is None:
+            _CACHE.clear()
+            return
+        abs_name = os.path.abspath(file_name)
+        for key in [key for key in _CACHE if key[1] == abs_name]:
+            del _CACHE[key]
+
+def file_cache_info():
+    """Get the files currently cached, least recently used first.
+
+    Returns:
+        list((str, str, int)): kind ('hazard' or 'exposures'), file name and
+            approximated size in bytes of every entry
+    """
+    with _LOCK:
+        return [(key[0], key[1], val[1]) for key, val in _CACHE.items()]
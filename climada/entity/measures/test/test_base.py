@@ -22,6 +22,7 @@ import os
 import unittest
 import copy
 import numpy as np
+from scipy import sparse
 
 from climada.hazard.base import Hazard
 from climada.entity.entity_def import Entity
@@ -30,6 +31,7 @@ from climada.entity.impact_funcs.impact_func_set import ImpactFuncSet
 from climada.entity.impact_funcs.base import ImpactFunc
 from climada.entity.measures.measure_set import MeasureSet
 from climada.entity.measures.base import Measure, IF_ID_FACT
+from climada.engine.impact import Impact
 from climada.util.constants import EXP_DEMO_H5, HAZ_DEMO_H5
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
@@ -89,9 +91,15 @@ class TestApply(unittest.TestCase):
         imp_set = ImpactFuncSet()
         imp_set.read_mat(ENT_TEST_MAT)
 
+        haz_nnz = haz.intensity.nnz
         new_haz = act_1._cutoff_hazard_damage(exp, imp_set, haz)
 
         self.assertFalse(id(new_haz) == id(haz))
+        # only the intensity is copied
+        self.assertEqual(haz.intensity.nnz, haz_nnz)
+        self.assertLess(new_haz.intensity.nnz, haz_nnz)
+        self.assertIs(new_haz.fraction, haz.fraction)
+        self.assertIs(new_haz.centroids, haz.centroids)
 
         pos_no_null = np.array([6249, 7697, 9134, 13500, 13199, 5944, 9052, 9050, 2429,
                                 5139, 9053, 7102, 4096, 1070, 5948, 1076, 5947, 7432,
@@ -391,9 +399,12 @@ class TestApply(unittest.TestCase):
         for meas in entity.measures.get_measure('TC'):
             meas.haz_type = 'TC'
         entity.check()
+        exp_columns = entity.exposures.columns.tolist()
 
         imp, risk_transf = entity.measures.get_measure('TC', 'Mangroves').calc_impact(
                 entity.exposures, entity.impact_funcs, hazard)
+        # the input exposures are not modified
+        self.assertEqual(entity.exposures.columns.tolist(), exp_columns)
 
         self.assertAlmostEqual(imp.aai_agg, 4.850407096284983e+09)
         self.assertAlmostEqual(imp.at_event[0], 0)
@@ -415,6 +426,49 @@ class TestApply(unittest.TestCase):
         self.assertEqual(imp.tag['if_set'].file_name, entity.impact_funcs.tag.file_name)
         self.assertEqual(risk_transf.aai_agg, 0)
 
+    def test_calc_impact_delta_pass(self):
+        """Test calc_impact method from impact without measure"""
+
+        hazard = Hazard('TC')
+        hazard.read_mat(HAZ_TEST_MAT)
+
+        entity = Entity()
+        entity.read_mat(ENT_TEST_MAT)
+        entity.exposures.rename(columns={'if_': 'if_TC'}, inplace=True)
+        entity.measures._data['TC'] = entity.measures._data.pop('XX')
+        for meas in entity.measures.get_measure('TC'):
+            meas.haz_type = 'TC'
+        entity.check()
+        entity.exposures['region_id'] = np.arange(entity.exposures.shape[0]) % 2 + 1
+
+        meas_reg = copy.deepcopy(entity.measures.get_measure('TC', 'Mangroves'))
+        meas_reg.name = 'Mangroves region'
+        meas_reg.exp_region_id = [2]
+        entity.measures.append(meas_reg)
+
+        imp_base = Impact()
+        imp_base.calc(entity.exposures, entity.impact_funcs, hazard, save_mat=True)
+        for meas in entity.measures.get_measure('TC'):
+            imp, risk_transf = meas.calc_impact(entity.exposures, entity.impact_funcs,
+                                                hazard)
+            imp_delta, risk_delta = meas.calc_impact(entity.exposures, entity.impact_funcs,
+                                                     hazard, imp_base)
+            self.assertAlmostEqual(imp_delta.aai_agg, imp.aai_agg, places=3)
+            self.assertTrue(np.allclose(imp_delta.at_event, imp.at_event, atol=1e-2))
+            # exposures are not reordered by a region selection in delta mode
+            self.assertTrue(np.allclose(np.sort(imp_delta.eai_exp), np.sort(imp.eai_exp)))
+            self.assertTrue(np.array_equal(imp_delta.coord_exp, imp_base.coord_exp))
+            self.assertAlmostEqual(risk_delta.aai_agg, risk_transf.aai_agg, places=3)
+        self.assertEqual(
+            meas_reg._affected_exposures(entity.exposures, entity.impact_funcs).size,
+            np.sum(entity.exposures.region_id.values == 2))
+
+        imp_base.imp_mat = sparse.csr_matrix(np.empty((0, 0)))
+        with self.assertLogs('climada.entity.measures.base', level='ERROR') as cm:
+            with self.assertRaises(ValueError):
+                meas_reg.calc_impact(entity.exposures, entity.impact_funcs, hazard,
+                                     imp_base)
+        self.assertIn('save_mat=True', cm.output[0])
 
     def test_calc_impact_transf_pass(self):
         """Test calc_impact method: apply all measures and insurance"""
@@ -0,0 +1,154 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Test file_cache module.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from climada.hazard.base import Hazard
+from climada.entity.measures.base import Measure
+from climada.entity.measures import file_cache
+from climada.entity.measures.file_cache import load_hazard, load_exposures, \
+clear_file_cache, file_cache_info
+from climada.util.config import CONFIG
+from climada.util.constants import EXP_DEMO_H5, HAZ_DEMO_H5
+
+class TestFileCache(unittest.TestCase):
+    """Test cache of hazards and exposures files."""
+
+    def setUp(self):
+        clear_file_cache()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        clear_file_cache()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_load_hazard_pass(self):
+        """Test hazard read once and reread when modified"""
+        haz_file = os.path.join(self.tmp_dir, 'haz.h5')
+        shutil.copy(HAZ_DEMO_H5, haz_file)
+
+        meas = Measure()
+        meas.hazard_set = haz_file
+        haz_1 = meas._change_all_hazard(Hazard('TC'))
+        haz_2 = meas._change_all_hazard(Hazard('TC'))
+        self.assertIs(haz_1, haz_2)
+        self.assertEqual(len(file_cache_info()), 1)
+        self.assertEqual(file_cache_info()[0][:2], ('hazard', os.path.abspath(haz_file)))
+        self.assertGreater(file_cache_info()[0][2], haz_1.intensity.data.nbytes)
+
+        # modified file: old entry replaced
+        os.utime(haz_file, ns=(0, 0))
+        haz_3 = load_hazard(haz_file, 'TC')
+        self.assertIsNot(haz_3, haz_1)
+        self.assertEqual(len(file_cache_info()), 1)
+        self.assertTrue(np.array_equal(haz_3.intensity.data, haz_1.intensity.data))
+
+        clear_file_cache(haz_file)
+        self.assertEqual(file_cache_info(), [])
+
+    def test_load_exposures_pass(self):
+        """Test exposures shared with the cache"""
+        exp_1 = load_exposures(EXP_DEMO_H5)
+        exp_1['if_XX'] = np.zeros(exp_1.shape[0], int)
+        exp_2 = load_exposures(EXP_DEMO_H5)
+        self.assertIsNot(exp_1, exp_2)
+        self.assertNotIn('if_XX', exp_2.columns)
+        self.assertTrue(np.array_equal(exp_1.value.values, exp_2.value.values))
+        self.assertEqual(exp_2.ref_year, exp_1.ref_year)
+        self.assertEqual(exp_2.tag.file_name, exp_1.tag.file_name)
+        self.assertEqual(len(file_cache_info()), 1)
+
+    def test_parallel_read_pass(self):
+        """Test different files read in parallel and one file read once"""
+        class Data():
+            """Object read from a file"""
+            def __init__(self, file_name):
+                self.file_name = file_name
+                self.values = np.zeros(10)
+
+        barrier = threading.Barrier(2, timeout=10)
+        n_reads = []
+        def reader(file_name):
+            n_reads.append(file_name)
+            # both files are read at the same time, or the barrier times out
+            barrier.wait()
+            return Data(file_name)
+
+        file_names = [os.path.join(self.tmp_dir, name) for name in ['a.h5', 'b.h5']]
+        for file_name in file_names:
+            with open(file_name, 'w') as file:
+                file.write(file_name)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            objs = list(executor.map(lambda name: file_cache._load('test', name, reader),
+                                     file_names))
+        self.assertEqual([obj.file_name for obj in objs], file_names)
+        self.assertEqual(len(file_cache_info()), 2)
+        self.assertEqual(file_cache._KEY_LOCKS, {})
+
+        # same file requested by several threads: read once
+        clear_file_cache()
+        barrier = threading.Barrier(1)
+        n_reads.clear()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            objs = list(executor.map(lambda name: file_cache._load('test', name, reader),
+                                     file_names[:1] * 4))
+        self.assertEqual(n_reads, file_names[:1])
+        self.assertTrue(all(obj is objs[0] for obj in objs))
+
+    def test_budget_pass(self):
+        """Test least recently used entries dropped over budget"""
+        haz_file = os.path.join(self.tmp_dir, 'haz.h5')
+        shutil.copy(HAZ_DEMO_H5, haz_file)
+        load_hazard(HAZ_DEMO_H5, 'TC')
+        load_hazard(haz_file, 'TC')
+        haz_bytes = file_cache_info()[0][2]
+
+        CONFIG.setdefault('measures', {})
+        prev_size = CONFIG['measures'].get('file_cache_size')
+        try:
+            CONFIG['measures']['file_cache_size'] = 1.5 * haz_bytes
+            load_hazard(HAZ_DEMO_H5, 'TC')
+            load_exposures(EXP_DEMO_H5)
+            cached = [info[1] for info in file_cache_info()]
+            self.assertNotIn(os.path.abspath(haz_file), cached)
+            self.assertEqual(cached[-1], os.path.abspath(EXP_DEMO_H5))
+            self.assertLessEqual(sum(info[2] for info in file_cache_info()),
+                                 1.5 * haz_bytes)
+            CONFIG['measures']['file_cache_size'] = 0
+            clear_file_cache()
+            load_hazard(HAZ_DEMO_H5, 'TC')
+            self.assertEqual(file_cache_info(), [])
+        finally:
+            if prev_size is None:
+                CONFIG['measures'].pop('file_cache_size')
+            else:
+                CONFIG['measures']['file_cache_size'] = prev_size
+        self.assertEqual(file_cache._max_bytes(), file_cache.DEF_FILE_CACHE_SIZE)
+
+# Execute Tests
+if __name__ == "__main__":
+    TESTS = unittest.TestLoader().loadTestsFromTestCase(TestFileCache)
+    unittest.TextTestRunner(verbosity=2).run(TESTS)
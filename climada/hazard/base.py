@@ -41,6 +41,7 @@ from climada.hazard.centroids.centr import Centroids
 import climada.util.plot as u_plot
 import climada.util.checker as check
 import climada.util.dates_times as u_dt
+import climada.util.dtypes as u_dtype
 from climada.util.config import CONFIG
 import climada.util.hdf5_handler as hdf5
 import climada.util.coordinates as co
@@ -988,10 +989,11 @@ class Hazard():
                 if todense:
                     hf_data.create_dataset(var_name, data=var_val.toarray())
                 else:
+                    data, indices, indptr = u_dtype.cast_sparse_arrays(var_val)
                     hf_csr = hf_data.create_group(var_name)
-                    hf_csr.create_dataset('data', data=var_val.data)
-                    hf_csr.create_dataset('indices', data=var_val.indices)
-                    hf_csr.create_dataset('indptr', data=var_val.indptr)
+                    hf_csr.create_dataset('data', data=data)
+                    hf_csr.create_dataset('indices', data=indices)
+                    hf_csr.create_dataset('indptr', data=indptr)
                     hf_csr.attrs['shape'] = var_val.shape
             elif isinstance(var_val, str):
                 hf_str = hf_data.create_dataset(var_name, (1,), dtype=str_dt)
@@ -1038,6 +1040,7 @@ class Hazard():
             else:
                 setattr(self, var_name, hf_data.get(var_name))
         hf_data.close()
+        self._cast_dtype()
 
     def concatenate(self, haz_src, append=False):
         """Concatenate events of several hazards
@@ -1074,6 +1077,14 @@ class Hazard():
 
         self.sanitize_event_ids()
 
+    def _cast_dtype(self):
+        """Cast intensity, fraction, event_id and date to the dtype profile of
+        the configuration. See climada.util.dtypes."""
+        self.intensity = u_dtype.cast_sparse(self.intensity)
+        self.fraction = u_dtype.cast_sparse(self.fraction)
+        self.event_id = u_dtype.cast_array(self.event_id, 'int')
+        self.date = u_dtype.cast_array(self.date, 'int')
+
     def _set_coords_centroids(self):
         """If centroids are raster, set lat and lon coordinates"""
         if self.centroids.meta and not self.centroids.coord.size:
@@ -21,7 +21,11 @@ Define Centroids class.
 
 import ast
 import copy
+import hashlib
 import logging
+import os
+import shutil
+import tempfile
 import numpy as np
 from scipy import sparse
 import h5py
@@ -34,17 +38,21 @@ from shapely.geometry.point import Point
 import climada.util.plot as u_plot
 from climada.util.constants import (DEF_CRS,
                                     ONE_LAT_KM,
-                                    NATEARTH_CENTROIDS)
+                                    NATEARTH_CENTROIDS,
+                                    SYSTEM_DIR)
 import climada.util.hdf5_handler as hdf5
+import climada.util.dtypes as u_dtype
 from climada.util.coordinates import (coord_on_land,
                                       dist_to_coast,
                                       dist_to_coast_nasa,
                                       equal_crs,
                                       get_country_code,
                                       get_resolution,
+                                      latlon_to_geosph_vector,
                                       pts_to_raster_meta,
                                       raster_to_meshgrid,
                                       read_raster,
+                                      read_raster_sparse,
                                       read_vector)
 from climada.util.coordinates import NE_CRS
 
@@ -77,6 +85,10 @@ DEF_VAR_EXCEL = {
 LOGGER = logging.getLogger(__name__)
 
 
+CENTR_CACHE_DIR = os.path.join(SYSTEM_DIR, 'centroids_cache')
+"""Directory of the on-disk cache of derived centroids layers (distance to
+coast, on land, region id, pixel area), one file per set of coordinates"""
+
 class Centroids():
     """Contains raster or vector centroids. Raster data can be set with
     set_raster_file() or set_meta(). Vector data can be set with set_lat_lon()
@@ -112,6 +124,8 @@ class Centroids():
         self.on_land = np.array([])
         self.region_id = np.array([])
         self.elevation = np.array([])
+        self._layer_key = dict()
+        self._geosph = None
 
     def check(self):
         """Check that either raster meta attribute is set or points lat, lon
@@ -278,7 +292,7 @@ class Centroids():
 
     def set_raster_file(self, file_name, band=[1], src_crs=None, window=False,
                         geometry=False, dst_crs=False, transform=None, width=None,
-                        height=None, resampling=Resampling.nearest):
+                        height=None, resampling=Resampling.nearest, max_workers=1):
         """Read raster of bands and set 0 values to the masked ones. Each
         band is an event. Select region using window or geometry. Reproject
         input by proving dst_crs and/or (transform, width, height).
@@ -287,6 +301,7 @@ class Centroids():
             file_pth (str): path of the file
             band (int, optional): band number to read. Default: 1
             src_crs (crs, optional): source CRS. Provide it if error without it.
+                Only used for reprojection, as in read_raster.
             window (rasterio.windows.Window, optional): window to read
             geometry (shapely.geometry, optional): consider pixels only in shape
             dst_crs (crs, optional): reproject to given crs
@@ -295,28 +310,34 @@ class Centroids():
             height (float): number of lats for transform
             resampling (rasterio.warp,.Resampling optional): resampling
                 function used for reprojection to dst_crs
+            max_workers (int, optional): number of threads used to decode the raster
+                tiles if neither geometry nor reprojection are used. Default: 1
 
         Raises:
             ValueError
 
         Returns:
-            np.array
+            sparse.csr_matrix
         """
+        if geometry or dst_crs or transform:
+            tmp_meta, inten = read_raster(file_name, band, src_crs, window, geometry,
+                                          dst_crs, transform, width, height, resampling)
+            inten = sparse.csr_matrix(inten)
+        else:
+            # read tile by tile without reprojection
+            tmp_meta, inten = read_raster_sparse(file_name, band, window,
+                                                 max_workers=max_workers)
         if not self.meta:
-            self.meta, inten = read_raster(file_name, band, src_crs, window,
-                                           geometry, dst_crs, transform, width,
-                                           height, resampling)
-            return sparse.csr_matrix(inten)
+            self.meta = tmp_meta
+            return inten
 
-        tmp_meta, inten = read_raster(file_name, band, src_crs, window, geometry,
-                                      dst_crs, transform, width, height, resampling)
         if (tmp_meta['crs'] != self.meta['crs']) \
            or (tmp_meta['transform'] != self.meta['transform']) \
            or (tmp_meta['height'] != self.meta['height']) \
            or (tmp_meta['width'] != self.meta['width']):
             LOGGER.error('Raster data is inconsistent with contained raster.')
             raise ValueError
-        return sparse.csr_matrix(inten)
+        return inten
 
     def set_vector_file(self, file_name, inten_name=['intensity'], dst_crs=None):
         """Read vector file format supported by fiona. Each intensity name is
@@ -485,18 +506,21 @@ class Centroids():
             close_idx = self.geometry.distance(Point(x_lon, y_lat)).values.argmin()
         return self.lon[close_idx], self.lat[close_idx], close_idx
 
-    def set_region_id(self, scheduler=None):
+    def set_region_id(self, scheduler=None, indexed=False):
         """Set region_id as country ISO numeric code attribute for every pixel
         or point
 
         Parameters:
             scheduler (str): used for dask map_partitions. “threads”,
                 “synchronous” or “processes”
+            indexed (bool): If True, use the multi-resolution country code index
+                which gives the same result, but is much faster for large numbers
+                of centroids. Default: False.
         """
-        ne_geom = self._ne_crs_geom(scheduler)
-        LOGGER.debug('Setting region_id %s points.', str(self.lat.size))
-        self.region_id = get_country_code(ne_geom.geometry[:].y.values,
-                                          ne_geom.geometry[:].x.values)
+        lat, lon = self._ne_crs_xy(scheduler)
+        LOGGER.debug('Setting region_id %s points.', str(lat.size))
+        self.region_id = u_dtype.cast_array(get_country_code(lat, lon, indexed=indexed),
+                                            'region_id')
 
     def set_area_pixel(self, min_resol=1.0e-8, scheduler=None):
         """Set area_pixel attribute for every pixel or point. area in m*m
@@ -574,7 +598,7 @@ class Centroids():
             LOGGER.error('Pixel area of points can not be computed.')
             raise ValueError
 
-    def set_dist_coast(self, signed=False, precomputed=False, scheduler=None):
+    def set_dist_coast(self, signed=False, precomputed=False, scheduler=None, gridded=False):
         """Set dist_coast attribute for every pixel or point. Distance to
         coast is computed in meters.
 
@@ -584,26 +608,196 @@ class Centroids():
             precomputed (bool): If True, use precomputed distances (from NASA). Default: False.
             scheduler (str): used for dask map_partitions. “threads”,
                 “synchronous” or “processes”
+            gridded (bool): If True, interpolate the locally generated Natural Earth land
+                raster and compute exact distances only close to the coast. Ignored if
+                `precomputed` is True. Default: False.
         """
         if precomputed:
             if not self.lat.size or not self.lon.size:
                 self.set_meta_to_lat_lon()
             self.dist_coast = dist_to_coast_nasa(self.lat, self.lon, highres=True, signed=signed)
+        elif gridded:
+            lat, lon = self._ne_crs_xy(scheduler)
+            LOGGER.debug('Computing distance to coast for %s centroids.', str(lat.size))
+            self.dist_coast = dist_to_coast(lat, lon, signed=signed, gridded=True)
         else:
             ne_geom = self._ne_crs_geom(scheduler)
             LOGGER.debug('Computing distance to coast for %s centroids.', str(self.lat.size))
             self.dist_coast = dist_to_coast(ne_geom, signed=signed)
 
-    def set_on_land(self, scheduler=None):
+    def set_on_land(self, scheduler=None, gridded=False):
         """Set on_land attribute for every pixel or point
 
         Parameters:
             scheduler (str): used for dask map_partitions. “threads”,
                 “synchronous” or “processes”
+            gridded (bool): If True, look up the locally generated Natural Earth land raster
+                and check the land geometry only close to the coast. Default: False.
         """
-        ne_geom = self._ne_crs_geom(scheduler)
-        LOGGER.debug('Setting on_land %s points.', str(self.lat.size))
-        self.on_land = coord_on_land(ne_geom.geometry[:].y.values, ne_geom.geometry[:].x.values)
+        lat, lon = self._ne_crs_xy(scheduler)
+        LOGGER.debug('Setting on_land %s points.', str(lat.size))
+        self.on_land = coord_on_land(lat, lon, gridded=gridded)
+
+    def coord_hash(self):
+        """Hash of the coordinates (raster meta or lat, lon) and CRS. Used as key
+        of the on-disk cache of derived layers.
+
+        Returns:
+            str
+        """
+        sha = hashlib.sha1()
+        if self.meta:
+            sha.update(str((self.meta['width'], self.meta['height'],
+                            tuple(self.meta['transform'])[:6])).encode())
+        else:
+            sha.update(np.ascontiguousarray(self.lat, dtype=float).tobytes())
+            sha.update(np.ascontiguousarray(self.lon, dtype=float).tobytes())
+        sha.update(str(self.crs).encode())
+        return sha.hexdigest()
+
+    def get_dist_coast(self, signed=False, precomputed=False, scheduler=None,
+                       gridded=False, cache=True):
+        """Get dist_coast attribute, computed with set_dist_coast only if not
+        got yet for the same coordinates and arguments and not in the
+        on-disk cache.
+
+        Parameters:
+            signed, precomputed, scheduler, gridded: see set_dist_coast
+            cache (bool, optional): read from and write to the on-disk cache
+                in CENTR_CACHE_DIR. Default: True
+
+        Returns:
+            np.array
+        """
+        return self._get_layer('dist_coast', self.set_dist_coast, cache,
+                               {'signed': signed, 'precomputed': precomputed,
+                                'gridded': gridded}, scheduler=scheduler)
+
+    def get_on_land(self, scheduler=None, gridded=False, cache=True):
+        """Get on_land attribute, computed with set_on_land only if not got
+        yet for the same coordinates and arguments and not in the on-disk
+        cache.
+
+        Parameters:
+            scheduler, gridded: see set_on_land
+            cache (bool, optional): read from and write to the on-disk cache
+                in CENTR_CACHE_DIR. Default: True
+
+        Returns:
+            np.array
+        """
+        return self._get_layer('on_land', self.set_on_land, cache,
+                               {'gridded': gridded}, scheduler=scheduler)
+
+    def get_region_id(self, scheduler=None, indexed=False, cache=True):
+        """Get region_id attribute, computed with set_region_id only if not
+        got yet for the same coordinates and arguments and not in the
+        on-disk cache.
+
+        Parameters:
+            scheduler, indexed: see set_region_id
+            cache (bool, optional): read from and write to the on-disk cache
+                in CENTR_CACHE_DIR. Default: True
+
+        Returns:
+            np.array
+        """
+        # indexed gives the same result, it does not change the cache key
+        return self._get_layer('region_id', self.set_region_id, cache, {},
+                               scheduler=scheduler, indexed=indexed)
+
+    def get_area_pixel(self, min_resol=1.0e-8, scheduler=None, cache=True):
+        """Get area_pixel attribute, computed with set_area_pixel only if not
+        got yet for the same coordinates and arguments and not in the
+        on-disk cache.
+
+        Parameters:
+            min_resol, scheduler: see set_area_pixel
+            cache (bool, optional): read from and write to the on-disk cache
+                in CENTR_CACHE_DIR. Default: True
+
+        Returns:
+            np.array
+        """
+        return self._get_layer('area_pixel', self.set_area_pixel, cache,
+                               {'min_resol': min_resol}, scheduler=scheduler)
+
+    def get_geosph_vector(self, cache=True):
+        """Get the unit vectors of the centroids on the geosphere and the
+        orthonormal bases of their tangent spaces in lat-lon coordinate system,
+        see climada.util.coordinates.latlon_to_geosph_vector. They are kept in
+        memory together with a hash of lat and lon, so that
+        dist_approx(..., geosph2=...) reuses them for every track and they are
+        recomputed if the coordinates change, also in place.
+
+        Parameters:
+            cache (bool, optional): keep the vectors in memory for later calls.
+                If False, vectors kept from earlier calls are freed.
+                Default: True
+
+        Returns:
+            np.array (size x 3), np.array (size x 2 x 3)
+        """
+        if not self.lat.size or not self.lon.size:
+            self.set_meta_to_lat_lon()
+        sha = hashlib.sha1()
+        sha.update(np.ascontiguousarray(self.lat, dtype=float).tobytes())
+        sha.update(np.ascontiguousarray(self.lon, dtype=float).tobytes())
+        latlon_hash = sha.hexdigest()
+        if self._geosph is not None and self._geosph[0] == latlon_hash:
+            geosph = self._geosph[1:]
+        else:
+            LOGGER.debug('Computing geospherical vectors of %s centroids.', self.size)
+            geosph = latlon_to_geosph_vector(self.lat, self.lon, basis=True)
+        self._geosph = (latlon_hash,) + geosph if cache else None
+        return geosph
+
+    def _get_layer(self, var_name, setter, cache, key_args, **kwargs):
+        """Get a derived layer: the attribute if it was set by this method for
+        the current coordinates and key_args, else the cached one, else
+        compute it with the setter (and cache it). An attribute which was not
+        set by this method (e.g. read with read_hdf5 or assigned) is used as it
+        is if it has the right size.
+
+        Parameters:
+            var_name (str): attribute name
+            setter (function): method setting the attribute
+            cache (bool): use the on-disk cache
+            key_args (dict): setter arguments changing the result
+            kwargs (optional): other setter arguments
+
+        Returns:
+            np.array
+        """
+        var_val = getattr(self, var_name)
+        layer_key = self._layer_key.get(var_name)
+        if var_val.size and var_val.size == self.size \
+        and (layer_key is None or layer_key[2] is not var_val):
+            return var_val
+        coord_hash = self.coord_hash()
+        key = '_'.join([var_name] + ['%s=%s' % (arg, val)
+                                     for arg, val in sorted(key_args.items())])
+        # a layer set here is reused only for the same coordinates and arguments
+        if var_val.size and var_val.size == self.size \
+        and layer_key[:2] == (coord_hash, key):
+            return var_val
+        file_name = os.path.join(CENTR_CACHE_DIR, coord_hash + '.hdf5')
+        if cache and os.path.isfile(file_name):
+            try:
+                with h5py.File(file_name, 'r') as data:
+                    if key in data:
+                        LOGGER.debug('Reading cached %s from %s.', var_name, file_name)
+                        setattr(self, var_name, np.array(data.get(key)))
+                        self._layer_key[var_name] = (coord_hash, key, getattr(self, var_name))
+                        return getattr(self, var_name)
+            except OSError as err:
+                LOGGER.warning('Cached %s could not be read from %s: %s', var_name,
+                               file_name, err)
+        setter(**key_args, **kwargs)
+        self._layer_key[var_name] = (coord_hash, key, getattr(self, var_name))
+        if cache:
+            _write_layer_cache(file_name, key, getattr(self, var_name))
+        return getattr(self, var_name)
 
     def remove_duplicate_points(self, scheduler=None):
         """Return Centroids with removed duplicated points
@@ -789,6 +983,7 @@ class Centroids():
         for centr_name in data.keys():
             if centr_name not in ('crs', 'lat', 'lon', 'meta'):
                 setattr(self, centr_name, np.array(data.get(centr_name)))
+        self.region_id = u_dtype.cast_array(self.region_id, 'region_id')
         if isinstance(file_data, str):
             data.close()
 
@@ -878,6 +1073,33 @@ class Centroids():
         self.set_geometry_points(scheduler)
         return self.geometry.to_crs(NE_CRS)
 
+    def _ne_crs_xy(self, scheduler=None):
+        """Return latitude and longitude in the CRS of Natural Earth
+
+        Parameters:
+            scheduler (str): used for dask map_partitions. “threads”,
+                “synchronous” or “processes”
+
+        Returns:
+            np.array, np.array
+        """
+        if not self.lat.size or not self.lon.size:
+            self.set_meta_to_lat_lon()
+        if equal_crs(self.crs, NE_CRS):
+            return self.lat, self.lon
+        ne_geom = self._ne_crs_geom(scheduler)
+        return ne_geom.geometry[:].y.values, ne_geom.geometry[:].x.values
+
+    def __copy__(self):
+        """Shallow copy: the arrays are shared, as with the default copy. The
+        meta dictionary and the keys of the derived layers are copied."""
+        cls = self.__class__
+        result = cls.__new__(cls)
+        result.__dict__.update(self.__dict__)
+        result.meta = dict(self.meta)
+        result._layer_key = dict(self._layer_key)
+        return result
+
     def __deepcopy__(self, memo):
         """Avoid error deep copy in gpd.GeoSeries by setting only the crs"""
         cls = self.__class__
@@ -891,7 +1113,7 @@ class Centroids():
         return result
 
 
-def generate_nat_earth_centroids(res_as=360, path=None, dist_coast=False):
+def generate_nat_earth_centroids(res_as=360, path=None, dist_coast=False, indexed=False):
     """For reproducibility, this is the function that generates the centroids
         files in `NATEARTH_CENTROIDS`. These files are provided with CLIMADA
         so that this function should never be called!
@@ -902,6 +1124,9 @@ def generate_nat_earth_centroids(res_as=360, path=None, dist_coast=False):
             the default location.
         dist_coast (bool): If true, read distance from a NASA dataset
             (see util.coordinates.dist_to_coast_nasa)
+        indexed (bool): If True, determine the region ids using the
+            multi-resolution country code index (see
+            util.coordinates.get_country_code). Default: False
     """
     if path is None and res_as not in [150, 360]:
         raise ValueError("Only 150 and 360 arc-seconds are supported!")
@@ -910,7 +1135,7 @@ def generate_nat_earth_centroids(res_as=360, path=None, dist_coast=False):
     lat_dim = np.arange(-90 + res_deg, 90, res_deg)
     lon_dim = np.arange(-180 + res_deg, 180 + res_deg, res_deg)
     lon, lat = [ar.ravel() for ar in np.meshgrid(lon_dim, lat_dim)]
-    natids = np.uint16(get_country_code(lat, lon, gridded=False))
+    natids = np.uint16(get_country_code(lat, lon, gridded=False, indexed=indexed))
 
     cen = Centroids()
     cen.set_lat_lon(lat, lon)
@@ -926,3 +1151,34 @@ def generate_nat_earth_centroids(res_as=360, path=None, dist_coast=False):
         cen.set_dist_coast(precomputed=True, signed=False)
         cen.dist_coast = np.float16(cen.dist_coast)
     cen.write_hdf5(path)
+
+def _write_layer_cache(file_name, key, value):
+    """Add a layer to the on-disk cache file of a grid. The file is copied to a
+    temporary file next to it, which is renamed once complete, so that other
+    processes never read a partially written file. If the cache can't be
+    written, the layer is not cached.
+
+    Parameters:
+        file_name (str): cache file of the grid
+        key (str): name of the layer in the file
+        value (np.array): layer
+    """
+    tmp_file = None
+    try:
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        tmp_fd, tmp_file = tempfile.mkstemp(suffix='.hdf5', dir=os.path.dirname(file_name))
+        os.close(tmp_fd)
+        mode = 'w'
+        if os.path.isfile(file_name):
+            shutil.copyfile(file_name, tmp_file)
+            mode = 'a'
+        with h5py.File(tmp_file, mode) as data:
+            if key in data:
+                return
+            data.create_dataset(key, data=value, compression="gzip")
+        os.replace(tmp_file, file_name)
+    except OSError as err:
+        LOGGER.warning('%s could not be cached in %s: %s', key, file_name, err)
+    finally:
+        if tmp_file is not None and os.path.isfile(tmp_file):
+            os.remove(tmp_file)
@@ -19,16 +19,20 @@ with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
 Test CentroidsVector and CentroidsRaster classes.
 """
 import os
+import shutil
+import tempfile
 from cartopy.io import shapereader
 from fiona.crs import from_epsg
 import geopandas as gpd
 import unittest
 import numpy as np
+import h5py
 from rasterio.windows import Window
 from shapely.geometry.point import Point
 from shapely.geometry.polygon import Polygon
 
 from climada.hazard.centroids.centr import Centroids
+import climada.hazard.centroids.centr as centr_module
 from climada.util.constants import HAZ_DEMO_FL, DEF_CRS
 from climada.util.coordinates import NE_EPSG, equal_crs
 
@@ -286,6 +290,104 @@ class TestVector(unittest.TestCase):
         self.assertTrue(np.allclose(poly.centroid[:].y.values, centr.lat))
         self.assertTrue(np.allclose(poly.centroid[:].x.values, centr.lon))
 
+    def test_get_layer_cache_pass(self):
+        """Test get_area_pixel memoised and cached on disk"""
+        cache_dir = centr_module.CENTR_CACHE_DIR
+        centr_module.CENTR_CACHE_DIR = tempfile.mkdtemp()
+        try:
+            centr = Centroids()
+            centr.set_lat_lon(np.array([10.0, 10.5, 11.0]), np.array([20.0, 20.5, 21.0]))
+            area = centr.get_area_pixel()
+            self.assertEqual(area.size, 3)
+            self.assertIs(centr.get_area_pixel(), area)
+
+            file_name = os.path.join(centr_module.CENTR_CACHE_DIR,
+                                     centr.coord_hash() + '.hdf5')
+            with h5py.File(file_name, 'a') as data:
+                data['area_pixel_min_resol=1e-08'][:] *= 2
+
+            # other arguments: not reused
+            area_resol = centr.get_area_pixel(min_resol=1.0e-6)
+            self.assertIsNot(area_resol, area)
+            with h5py.File(file_name, 'r') as data:
+                self.assertIn('area_pixel_min_resol=1e-06', data)
+            centr.area_pixel = np.array([])
+            self.assertTrue(np.allclose(centr.get_area_pixel(), 2 * area))
+
+            # assigned attribute of the right size: kept
+            centr.area_pixel = np.zeros(3)
+            self.assertTrue(np.allclose(centr.get_area_pixel(min_resol=1.0e-6), 0))
+            centr.area_pixel = np.array([])
+
+            centr_bis = Centroids()
+            centr_bis.set_lat_lon(np.array([10.0, 10.5, 11.0]), np.array([20.0, 20.5, 21.0]))
+            self.assertEqual(centr_bis.coord_hash(), centr.coord_hash())
+            self.assertTrue(np.allclose(centr_bis.get_area_pixel(), 2 * area))
+            self.assertTrue(np.allclose(centr_bis.get_area_pixel(cache=False), 2 * area))
+
+            # coordinates modified in place: other key
+            centr_bis.lat[2] = 12.0
+            self.assertNotEqual(centr_bis.coord_hash(), centr.coord_hash())
+            centr_bis.lat[2] = 11.0
+
+            centr_bis.set_lat_lon(np.array([10.0, 10.5]), np.array([20.0, 20.5]))
+            self.assertNotEqual(centr_bis.coord_hash(), centr.coord_hash())
+            self.assertTrue(np.allclose(centr_bis.get_area_pixel(cache=False), area[:2]))
+
+            # region_id read from a file is not recomputed
+            centr.region_id = np.array([1, 2, 3])
+            centr_file = os.path.join(centr_module.CENTR_CACHE_DIR, 'centr.h5')
+            centr.write_hdf5(centr_file)
+            centr_read = Centroids()
+            centr_read.read_hdf5(centr_file)
+            np.testing.assert_array_equal(centr_read.get_region_id(), [1, 2, 3])
+
+            # unreadable cache file: computed and not cached
+            centr_ter = Centroids()
+            centr_ter.set_lat_lon(np.array([0.0, 0.5]), np.array([20.0, 20.5]))
+            file_name = os.path.join(centr_module.CENTR_CACHE_DIR,
+                                     centr_ter.coord_hash() + '.hdf5')
+            with open(file_name, 'w') as file:
+                file.write('partial')
+            with self.assertLogs('climada.hazard.centroids.centr', level='WARNING'):
+                area_ter = centr_ter.get_area_pixel()
+            self.assertEqual(area_ter.size, 2)
+            with open(file_name) as file:
+                self.assertEqual(file.read(), 'partial')
+            self.assertEqual(sorted(os.listdir(centr_module.CENTR_CACHE_DIR)),
+                             sorted([centr.coord_hash() + '.hdf5', 'centr.h5',
+                                     os.path.basename(file_name)]))
+        finally:
+            shutil.rmtree(centr_module.CENTR_CACHE_DIR)
+            centr_module.CENTR_CACHE_DIR = cache_dir
+
+    def test_get_geosph_vector_pass(self):
+        """Test geospherical vectors computed once per coordinates"""
+        centr = Centroids()
+        centr.set_lat_lon(np.array([10.0, 10.5, -60.0]), np.array([20.0, 20.5, 179.0]))
+        vec, vbasis = centr.get_geosph_vector()
+        self.assertEqual(vec.shape, (3, 3))
+        self.assertEqual(vbasis.shape, (3, 2, 3))
+        self.assertTrue(np.allclose(np.linalg.norm(vec, axis=-1), 1))
+        self.assertIs(centr.get_geosph_vector()[0], vec)
+        centr.check()
+
+        centr.set_lat_lon(np.array([10.0, 10.5]), np.array([20.0, 20.5]))
+        vec_bis, _ = centr.get_geosph_vector()
+        self.assertEqual(vec_bis.shape, (2, 3))
+        self.assertTrue(np.allclose(vec_bis, vec[:2]))
+
+        # in-place changes of the coordinates are detected
+        centr.lon[1] = -20.5
+        vec_ter, _ = centr.get_geosph_vector()
+        self.assertIsNot(vec_ter, vec_bis)
+        self.assertTrue(np.allclose(vec_ter[0], vec_bis[0]))
+        self.assertTrue(np.allclose(vec_ter[1, 1], -vec_bis[1, 1]))
+
+        vec_ter, _ = centr.get_geosph_vector(cache=False)
+        self.assertIsNone(centr._geosph)
+        self.assertIsNot(centr.get_geosph_vector()[0], vec_ter)
+
     def test_area_approx(self):
         """Test set_area_approx"""
         centr = Centroids()
@@ -377,6 +479,13 @@ class TestRaster(unittest.TestCase):
         self.assertEqual(centr_ras.meta['width'], 50)
         self.assertEqual(inten_ras.shape, (1, 60 * 50))
 
+        # without reprojection, src_crs doesn't change the crs of the file
+        centr_src = Centroids()
+        centr_src.set_raster_file(HAZ_DEMO_FL, window=Window(0, 0, 50, 60),
+                                  src_crs={'init': 'epsg:3857'})
+        self.assertEqual(centr_src.meta['crs'], centr_ras.meta['crs'])
+        self.assertEqual(centr_src.meta['transform'], centr_ras.meta['transform'])
+
     def test_ne_crs_geom_pass(self):
         """Test _ne_crs_geom"""
         centr_ras = Centroids()
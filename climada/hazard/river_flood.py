@@ -37,7 +37,7 @@ from climada.util.coordinates import get_region_gridpoints,\
                                      region2isos, country_iso2natid
 from climada.hazard.base import Hazard
 from climada.hazard.centroids import Centroids
-from climada.util.coordinates import get_land_geometry, read_raster
+from climada.util.coordinates import get_land_geometry, read_raster, read_raster_sparse
 
 NATID_INFO = pd.read_csv(RIVER_FLOOD_REGIONS_CSV)
 
@@ -182,8 +182,8 @@ class RiverFlood(Hazard):
             # else:
             if centroids.meta:
                 centroids.set_meta_to_lat_lon()
-            metafrc, fraction = read_raster(frc_path, band=bands.tolist())
-            metaint, intensity = read_raster(dph_path, band=bands.tolist())
+            metafrc, fraction = read_raster_sparse(frc_path, band=bands.tolist())
+            metaint, intensity = read_raster_sparse(dph_path, band=bands.tolist())
             x_i = ((centroids.lon - metafrc['transform'][2]) /
                    metafrc['transform'][0]).astype(int)
             y_i = ((centroids.lat - metafrc['transform'][5]) /
@@ -191,8 +191,8 @@ class RiverFlood(Hazard):
             fraction = fraction[:, y_i * metafrc['width'] + x_i]
             intensity = intensity[:, y_i * metaint['width'] + x_i]
             self.centroids = centroids
-            self.intensity = sp.sparse.csr_matrix(intensity)
-            self.fraction = sp.sparse.csr_matrix(fraction)
+            self.intensity = intensity
+            self.fraction = fraction
 
         self.units = 'm'
         self.tag.file_name = dph_path + ';' + frc_path
@@ -297,8 +297,7 @@ class RiverFlood(Hazard):
         Raises:
             MemoryError
         """
-        self.centroids.set_area_pixel()
-        area_centr = self.centroids.area_pixel
+        area_centr = self.centroids.get_area_pixel()
         event_years = np.array([date.fromordinal(self.date[i]).year
                                 for i in range(len(self.date))])
         years = np.unique(event_years)
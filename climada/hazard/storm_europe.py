@@ -225,8 +225,8 @@ class StormEurope(Hazard):
                                np.tile(lons, len(lats))])
         cent = Centroids()
         cent.set_lat_lon(lats, lons)
-        cent.set_area_pixel()
-        cent.set_on_land()
+        cent.get_area_pixel()
+        cent.get_on_land()
 
         return cent
 
@@ -429,10 +429,10 @@ class StormEurope(Hazard):
         """
         # bool vector selecting the targeted centroids
         if reg_id is not None:
-            if self.centroids.region_id.size == 0:
-                self.centroids.set_region_id()
             if not isinstance(reg_id, list):
                 reg_id = [reg_id]
+            if self.centroids.region_id.size == 0:
+                self.centroids.get_region_id()
             sel_cen = np.isin(self.centroids.region_id, reg_id)
 
         else:  # shifting truncates valid centroids
@@ -0,0 +1,621 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Define TCColumns: columnar storage of tropical cyclone tracks.
+"""
+
+__all__ = ['TCColumns']
+
+import copy
+import os
+import logging
+import h5py
+import numpy as np
+import pandas as pd
+import xarray as xr
+from scipy.linalg import solve_banded
+
+import climada.util.coordinates as coord_util
+
+LOGGER = logging.getLogger(__name__)
+
+COORD_VARS = ['time', 'lat', 'lon']
+"""Variables of the tracks stored as coordinates of the xr.Dataset"""
+
+NS_PER_HOUR = 3600 * 10**9
+"""Nanoseconds in one hour"""
+
+H5_CHUNK = 2**16
+"""Number of values per chunk of the datasets written by TCColumns.write_hdf5"""
+
+class TCColumns():
+    """Tropical cyclone tracks stored as columns: the values of every track
+    variable of all the tracks are concatenated in one array, and the nodes of
+    track i are the positions offsets[i] to offsets[i + 1] of every array.
+
+    Attributes:
+        variables (dict(str: np.array)): concatenated values of every track
+            variable (time, lat, lon, time_step, max_sustained_wind, ...)
+        offsets (np.array): position of the first node of every track, plus
+            the total number of nodes at the end
+        attrs (pd.DataFrame): attributes of the tracks (name, sid,
+            orig_event_flag, ...), one row per track
+        var_attrs (dict(str: dict)): attributes of the track variables, as
+            the ones of the first track
+    """
+    def __init__(self):
+        """Empty initialization."""
+        self.variables = dict()
+        self.offsets = np.zeros(1, int)
+        self.attrs = pd.DataFrame()
+        self.var_attrs = dict()
+
+    def set_from_datasets(self, tracks):
+        """Fill columns from tracks, which are not modified. All the tracks
+        need to have the same variables.
+
+        Parameters:
+            tracks (list(xarray.Dataset)): tracks, as in TCTracks.data
+        """
+        self.__init__()
+        if not tracks:
+            return
+        var_names = list(tracks[0].coords) + list(tracks[0].data_vars)
+        for track in tracks:
+            if set(track.coords) | set(track.data_vars) != set(var_names):
+                LOGGER.error('Track %s variables %s differ from %s.', track.sid,
+                             list(track.coords) + list(track.data_vars), var_names)
+                raise ValueError
+        self.variables = {name: np.concatenate([track[name].values for track in tracks])
+                          for name in var_names}
+        self.offsets = np.zeros(len(tracks) + 1, int)
+        self.offsets[1:] = np.cumsum([track.time.size for track in tracks])
+        self.attrs = pd.DataFrame([track.attrs for track in tracks])
+        self.var_attrs = {name: dict(tracks[0][name].attrs) for name in var_names}
+
+    def to_datasets(self):
+        """Tracks as list of xarray.Dataset, with copies of the values.
+
+        Returns:
+            list(xarray.Dataset)
+        """
+        return [self.get_dataset(idx, copy=True) for idx in range(self.size)]
+
+    def get_dataset(self, idx, copy=False):
+        """One track as xarray.Dataset.
+
+        Parameters:
+            idx (int): position of the track
+            copy (bool, optional): copy the values instead of returning views
+                of the columns. Default: False
+
+        Returns:
+            xarray.Dataset
+        """
+        sel = slice(self.offsets[idx], self.offsets[idx + 1])
+        values = {name: values[sel].copy() if copy else values[sel]
+                  for name, values in self.variables.items()}
+        track = xr.Dataset()
+        track.coords['time'] = ('time', values['time'], self.var_attrs.get('time', {}))
+        for name, val in values.items():
+            var = ('time', val, self.var_attrs.get(name, {}))
+            if name in COORD_VARS[1:]:
+                track.coords[name] = var
+            elif name != 'time':
+                track[name] = var
+        for key, val in self.attrs.iloc[idx].items():
+            track.attrs[key] = val.item() if isinstance(val, np.generic) else val
+        return track
+
+    @property
+    def size(self):
+        """Number of tracks"""
+        return self.offsets.size - 1
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def track_sizes(self):
+        """Number of nodes of every track"""
+        return np.diff(self.offsets)
+
+    @property
+    def track_idx(self):
+        """Position of the track of every node"""
+        return np.repeat(np.arange(self.size), self.track_sizes)
+
+    def select(self, sel):
+        """Select tracks.
+
+        Parameters:
+            sel (np.array): boolean mask or positions of the selected tracks
+
+        Returns:
+            TCColumns
+        """
+        sel = np.arange(self.size)[sel]
+        out = TCColumns()
+        out.offsets, node_idx = _select_nodes(self.offsets, sel)
+        out.variables = {name: values[node_idx] for name, values in self.variables.items()}
+        out.attrs = self.attrs.iloc[sel].reset_index(drop=True)
+        out.var_attrs = copy.deepcopy(self.var_attrs)
+        return out
+
+    def append(self, columns):
+        """Append the tracks of other columns, which are copied. The variables
+        need to be the same.
+
+        Parameters:
+            columns (TCColumns): tracks to append
+        """
+        if not columns.size:
+            return
+        if not self.size:
+            self.variables = {name: values.copy()
+                              for name, values in columns.variables.items()}
+            self.offsets = columns.offsets.copy()
+            self.attrs = columns.attrs.copy()
+            self.var_attrs = copy.deepcopy(columns.var_attrs)
+            return
+        if set(self.variables) != set(columns.variables):
+            LOGGER.error('Track variables %s differ from %s.',
+                         list(columns.variables), list(self.variables))
+            raise ValueError
+        self.variables = {name: np.concatenate([values, columns.variables[name]])
+                          for name, values in self.variables.items()}
+        self.offsets = np.concatenate([self.offsets, self.offsets[-1] + columns.offsets[1:]])
+        self.attrs = pd.concat([self.attrs, columns.attrs], ignore_index=True, sort=False)
+
+    def write_hdf5(self, file_name, append=False):
+        """Write all the tracks to one HDF5 file: the variables of all the
+        nodes in group 'variables', the attributes of the tracks in group
+        'attrs' (one dataset per column), the offsets and the first time of
+        every track. The datasets are chunked and compressed, and can be
+        extended by later writes in append mode.
+
+        Parameters:
+            file_name (str): file name to write, with h5 format
+            append (bool, optional): add the tracks after the ones of an
+                existing file, which needs to have the same variables and
+                attributes. Default: False
+        """
+        if append and os.path.isfile(file_name):
+            with h5py.File(file_name, 'r') as hf_data:
+                append = hf_data['offsets'].size > 1
+        else:
+            append = False
+        if append and not self.size:
+            return
+        LOGGER.info('%s %s tracks to %s', 'Appending' if append else 'Writing',
+                    self.size, file_name)
+        time = self.variables['time'].astype('datetime64[ns]').view(np.int64) \
+            if self.size else np.zeros(0, np.int64)
+        with h5py.File(file_name, 'a' if append else 'w') as hf_data:
+            if append:
+                for group, names in [('variables', list(self.variables)),
+                                     ('attrs', list(self.attrs.columns))]:
+                    if set(hf_data[group]) != set(names):
+                        LOGGER.error('Track %s %s differ from %s of file %s.', group,
+                                     names, list(hf_data[group]), file_name)
+                        raise ValueError
+                offsets = hf_data['offsets'][-1] + self.offsets[1:]
+            else:
+                hf_data.create_group('variables')
+                hf_data.create_group('attrs')
+                offsets = self.offsets
+            _h5_append(hf_data, 'offsets', offsets)
+            _h5_append(hf_data, 'first_time', time[self.offsets[:-1]])
+            for name, values in self.variables.items():
+                _h5_append(hf_data['variables'], name, values)
+            for name, values in self.attrs.items():
+                _h5_append(hf_data['attrs'], name, values.values)
+
+    def read_hdf5(self, file_name, storm_id=None, year_range=None, basin=None):
+        """Read tracks written by write_hdf5. Only the tracks matching the
+        given requirements are read, and only the parts of the file
+        containing their nodes.
+
+        Parameters:
+            file_name (str): file name to read, with h5 format
+            storm_id (str or list(str), optional): sid of the tracks to read.
+                Default: all
+            year_range (tuple, optional): first and last year of the first
+                time of the tracks to read. Default: all
+            basin (str, optional): basin attribute of the tracks to read.
+                Default: all
+        """
+        LOGGER.info('Reading %s', file_name)
+        self.__init__()
+        with h5py.File(file_name, 'r') as hf_data:
+            offsets = hf_data['offsets'][:]
+            match = np.ones(offsets.size - 1, bool)
+            if storm_id is not None:
+                if not isinstance(storm_id, list):
+                    storm_id = [storm_id]
+                match &= np.isin(_h5_values(hf_data['attrs']['sid']), storm_id)
+            if year_range is not None:
+                years = hf_data['first_time'][:].view('datetime64[ns]') \
+                    .astype('datetime64[Y]').astype(int) + 1970
+                match &= (years >= year_range[0]) & (years <= year_range[1])
+            if basin is not None:
+                match &= _h5_values(hf_data['attrs']['basin']) == basin
+            if not np.any(match):
+                LOGGER.info('No tracks matching the requirements in %s.', file_name)
+                return
+
+            sel = np.flatnonzero(match)
+            self.offsets, node_idx = _select_nodes(offsets, sel)
+            self.variables = {name: _h5_values(dset, node_idx)
+                              for name, dset in hf_data['variables'].items()}
+            self.attrs = pd.DataFrame({name: _h5_values(dset, sel)
+                                       for name, dset in hf_data['attrs'].items()})
+
+    def get_bounds(self, deg_buffer=0.1):
+        """Get bounds as (lon_min, lat_min, lon_max, lat_max) tuple.
+
+        Parameters:
+            deg_buffer (float): A buffer to add around the bounding box
+
+        Returns:
+            tuple (lon_min, lat_min, lon_max, lat_max)
+        """
+        return coord_util.latlon_bounds(self.variables['lat'], self.variables['lon'],
+                                        buffer=deg_buffer)
+
+    def equal_timestep(self, time_step_h=1, land_geom=None):
+        """Interpolate all the tracks to time steps of time_step_h hours at
+        once. The result is the one of TCTracks._one_interp_data, i.e. of
+        xarray's resample(time=...).interpolate(): the new times go from the
+        first to the last time of every track floored to multiples of the
+        time step since the start of the first day; the track variables are
+        linearly interpolated, lat and lon with linear, quadratic or cubic
+        splines depending on the number of nodes. Tracks with less than two
+        nodes are not interpolated.
+
+        Parameters:
+            time_step_h (float, optional): time step in hours. Default: 1
+            land_geom (shapely.geometry.multipolygon.MultiPolygon, optional):
+                if provided, compute on_land and dist_since_lf at each node
+
+        Returns:
+            TCColumns
+        """
+        step = int(round(time_step_h * NS_PER_HOUR))
+        sizes = self.track_sizes
+        interp = sizes >= 2
+        for sid in self.attrs.sid.values[~interp]:
+            LOGGER.warning('Track interpolation not done. Not enough elements for %s', sid)
+
+        # new times: one track interpolated or copied per track
+        time = self.variables['time'].astype('datetime64[ns]').view(np.int64)
+        time_ini = time[self.offsets[:-1]]
+        time_end = time[self.offsets[1:] - 1]
+        day_ini = time_ini - time_ini % (24 * NS_PER_HOUR)
+        new_ini = day_ini + (time_ini - day_ini) // step * step
+        new_end = day_ini + (time_end - day_ini) // step * step
+        new_sizes = np.where(interp, (new_end - new_ini) // step + 1, sizes)
+        out = TCColumns()
+        out.offsets = np.zeros(self.size + 1, int)
+        out.offsets[1:] = np.cumsum(new_sizes)
+        new_track = np.repeat(np.arange(self.size), new_sizes)
+        new_pos = np.arange(out.offsets[-1]) - out.offsets[:-1][new_track]
+        node_track = self.track_idx
+        new_time = new_ini[new_track] + new_pos * step
+
+        # times relative to the first time of each track, as xarray
+        x_old = (time - time_ini[node_track]).astype(np.float64)
+        x_new = (new_time - time_ini[new_track]).astype(np.float64)
+        lo_idx, hi_idx, in_range = _bracket_segments(x_old, self.offsets, x_new,
+                                                     out.offsets)
+        # lat and lon of tracks with at least 3 nodes: splines of all the tracks at once
+        spline = interp & (sizes >= 3)
+        spl_old, spl_new = spline[node_track], spline[new_track]
+        spl_offsets = np.concatenate([[0], np.cumsum(sizes[spline])])
+        spl_brackets = _bracket_segments(
+            x_old[spl_old], spl_offsets, x_new[spl_new],
+            np.concatenate([[0], np.cumsum(new_sizes[spline])]))
+
+        # nodes of tracks which are not interpolated are copied
+        copy_new = ~interp[new_track]
+        copy_old = np.repeat(self.offsets[:-1] - out.offsets[:-1], new_sizes)[copy_new] + \
+            np.arange(out.offsets[-1])[copy_new]
+        new_time[copy_new] = time[copy_old]
+
+        out.variables['time'] = new_time.view('datetime64[ns]')
+        for name, values in self.variables.items():
+            if name == 'time' or values.dtype.kind not in 'uifc':
+                # non-numerical variables are dropped by xarray's interpolation
+                continue
+            if name == 'lon':
+                values = values.copy()
+                cross = np.zeros(self.size, bool)
+                cross[interp] = np.logical_and(
+                    np.maximum.reduceat(values, self.offsets[:-1])[interp] > 170,
+                    np.minimum.reduceat(values, self.offsets[:-1])[interp] < -170)
+                values[cross[node_track] & (values < 0)] += 360
+            new_values = _interp_linear(x_old, values, x_new, lo_idx, hi_idx, in_range)
+            if name in COORD_VARS:
+                new_values[spl_new] = _interp_spline(x_old[spl_old], values[spl_old],
+                                                     spl_offsets, x_new[spl_new],
+                                                     *spl_brackets)
+            if name == 'lon':
+                new_values[new_values > 180] -= 360
+            if name == 'time_step':
+                new_values[:] = time_step_h
+            new_values[copy_new] = self.variables[name][copy_old]
+            out.variables[name] = new_values
+
+        out.attrs = self.attrs.copy()
+        out.var_attrs = {name: copy.deepcopy(self.var_attrs[name])
+                         for name in out.variables if name in self.var_attrs}
+        if 'max_sustained_wind' in out.variables:
+            cat = out.attrs.category.values.copy()
+            cat[interp] = out.get_category()[interp]
+            out.attrs['category'] = cat
+        if land_geom:
+            out.set_land_params(land_geom)
+        return out
+
+    def get_category(self):
+        """Saffir-Simpson category of every track, as tc_tracks.set_category.
+
+        Returns:
+            np.array
+        """
+        from climada.hazard.tc_tracks import SAFFIR_SIM_CAT, _change_max_wind_unit
+        # nan only if all the winds of the track are nan
+        max_wind = np.fmax.reduceat(self.variables['max_sustained_wind'].astype(float),
+                                    self.offsets[:-1])
+        units = self.attrs.max_sustained_wind_unit.values
+        for unit in np.unique(units[units != 'kn']):
+            max_wind[units == unit] *= _change_max_wind_unit(np.array([1.0]), unit, 'kn')
+        cat = np.searchsorted(SAFFIR_SIM_CAT, max_wind, side='right') - 1
+        cat[cat == len(SAFFIR_SIM_CAT) - 1] = -1
+        return cat
+
+    def set_land_params(self, land_geom=None, gridded=False):
+        """Compute on_land and dist_since_lf of every node. See
+        tc_tracks.track_land_params.
+
+        Parameters:
+            land_geom (shapely.geometry.multipolygon.MultiPolygon, optional): land
+                geometry. Default: Natural Earth land around the tracks
+            gridded (bool, optional): if no `land_geom` is given, look up the land
+                raster, see `climada.util.coordinates.coord_on_land`. Default: False
+        """
+        from climada.hazard.tc_tracks import _dist_since_lf_nodes
+        self.variables['on_land'] = coord_util.coord_on_land(
+            self.variables['lat'], self.variables['lon'], land_geom, gridded=gridded)
+        self.variables['dist_since_lf'] = _dist_since_lf_nodes(
+            self.variables['lat'], self.variables['lon'], self.variables['on_land'],
+            self.offsets)
+
+def _select_nodes(offsets, sel):
+    """Offsets and positions of the nodes of selected tracks.
+
+    Parameters:
+        offsets (np.array): offsets of all the tracks
+        sel (np.array): positions of the selected tracks
+
+    Returns:
+        np.array (offsets of the selection), np.array (node positions)
+    """
+    sizes = np.diff(offsets)[sel]
+    new_offsets = np.zeros(sizes.size + 1, int)
+    new_offsets[1:] = np.cumsum(sizes)
+    node_idx = np.arange(new_offsets[-1]) + \
+        np.repeat(offsets[:-1][sel] - new_offsets[:-1], sizes)
+    return new_offsets, node_idx
+
+def _h5_append(group, name, values):
+    """Write values at the end of a dataset of an HDF5 group, created
+    extendable if it doesn't exist. Dates are stored as nanoseconds and
+    strings with variable length.
+
+    Parameters:
+        group (h5py.Group): group containing the dataset
+        name (str): dataset name
+        values (np.array): values to write
+    """
+    if name in group:
+        kind = group[name].attrs.get('kind')
+    elif values.dtype.kind == 'M':
+        kind = 'datetime64[ns]'
+    elif values.dtype.kind in 'OSU':
+        kind = 'str'
+    else:
+        kind = None
+    if kind == 'datetime64[ns]':
+        values = values.astype(kind).view(np.int64)
+    elif kind == 'str':
+        values = values.astype(str).astype(object)
+    if name not in group:
+        dset = group.create_dataset(
+            name, (0,), maxshape=(None,), chunks=(H5_CHUNK,), compression='gzip',
+            dtype=h5py.special_dtype(vlen=str) if kind == 'str' else values.dtype)
+        if kind:
+            dset.attrs['kind'] = kind
+    dset = group[name]
+    dset.resize((dset.shape[0] + values.size,))
+    dset[dset.shape[0] - values.size:] = values
+
+def _h5_values(dset, idx=None):
+    """Values of a dataset written by _h5_append, at all or at some sorted
+    positions. Only the chunks containing the positions are read.
+
+    Parameters:
+        dset (h5py.Dataset): dataset to read
+        idx (np.array, optional): increasing positions to read. Default: all
+
+    Returns:
+        np.array
+    """
+    if idx is None:
+        values = dset[:]
+    elif not idx.size:
+        values = np.zeros(0, dset.dtype)
+    else:
+        values = np.empty(idx.size, dset.dtype)
+        blocks = np.unique(idx // H5_CHUNK)
+        breaks = np.flatnonzero(np.diff(blocks) > 1)
+        # read runs of consecutive chunks
+        for ini, end in zip(blocks[np.concatenate([[0], breaks + 1])] * H5_CHUNK,
+                            (blocks[np.concatenate([breaks, [-1]])] + 1) * H5_CHUNK):
+            pos = slice(*np.searchsorted(idx, [ini, end]))
+            values[pos] = dset[ini:min(end, dset.shape[0])][idx[pos] - ini]
+    kind = dset.attrs.get('kind')
+    if kind == 'datetime64[ns]':
+        values = values.view(kind)
+    elif kind == 'str':
+        values = np.array([val.decode() if isinstance(val, bytes) else val
+                           for val in values], dtype=object)
+    return values
+
+def _bracket_segments(x_old, old_offsets, x_new, new_offsets):
+    """For every new point, nodes of its segment which bracket it: the last
+    node at or before it and the next one, as numpy.interp.
+
+    Parameters:
+        x_old (np.array): sorted coordinates of every segment, concatenated
+        old_offsets (np.array): first position of every segment in x_old, plus
+            x_old size
+        x_new (np.array): coordinates of the new points, concatenated
+        new_offsets (np.array): first position of every segment in x_new, plus
+            x_new size
+
+    Returns:
+        np.array (lower node), np.array (upper node), np.array(bool) (new
+        point within the segment range)
+    """
+    old_seg = np.repeat(np.arange(old_offsets.size - 1), np.diff(old_offsets))
+    new_seg = np.repeat(np.arange(new_offsets.size - 1), np.diff(new_offsets))
+    # sort old and new points by segment and coordinate, old points first in ties
+    is_new = np.concatenate([np.zeros(x_old.size, int), np.ones(x_new.size, int)])
+    order = np.lexsort((is_new, np.concatenate([x_old, x_new]),
+                        np.concatenate([old_seg, new_seg])))
+    new_sorted = is_new[order] == 1
+    n_old_before = np.cumsum(1 - is_new[order])
+    lo_idx = np.empty(x_new.size, int)
+    lo_idx[order[new_sorted] - x_old.size] = n_old_before[new_sorted] - 1
+
+    seg_ini = old_offsets[:-1][new_seg]
+    seg_end = old_offsets[1:][new_seg] - 1
+    in_range = (x_new >= x_old[seg_ini]) & (x_new <= x_old[seg_end])
+    lo_idx = np.clip(lo_idx, seg_ini, seg_end)
+    hi_idx = np.minimum(lo_idx + 1, seg_end)
+    return lo_idx, hi_idx, in_range
+
+def _interp_spline(x_old, y_old, old_offsets, x_new, lo_idx, hi_idx, in_range):
+    """Interpolation of every segment with a quadratic (3 nodes) or a
+    not-a-knot cubic spline (more nodes), as scipy.interpolate.interp1d with
+    kind 'quadratic' or 'cubic', nan outside the range. The slopes at the
+    nodes of all the segments are the solution of one tridiagonal system (the
+    one of scipy.interpolate.CubicSpline, block by block).
+
+    Parameters:
+        x_old (np.array): sorted coordinates of every segment, concatenated
+        y_old (np.array): values of the nodes
+        old_offsets (np.array): first position of every segment in x_old, plus
+            x_old size. Every segment has at least 3 nodes.
+        x_new (np.array): coordinates of the new points
+        lo_idx, hi_idx, in_range (np.array): output of _bracket_segments
+
+    Returns:
+        np.array
+    """
+    y_old = y_old.astype(np.float64)
+    if not x_new.size:
+        return np.zeros(0)
+    first, last = old_offsets[:-1], old_offsets[1:] - 1
+    sizes = last - first + 1
+    dx = np.diff(x_old)
+    # segments with invalid nodes give nan, without spreading to the others
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bad = np.logical_not(np.isfinite(np.diff(y_old) / dx))
+        bad[last[:-1]] = False
+        bad_node = np.repeat(np.add.reduceat(bad, first) > 0, sizes)
+        x_old = np.where(bad_node, np.arange(x_old.size), x_old)
+        y_old = np.where(bad_node, 0, y_old)
+        dx = np.diff(x_old)
+        slope = np.diff(y_old) / dx
+
+    # banded matrix: upper diagonal in row 0, diagonal in row 1, lower in row 2
+    mat = np.zeros((3, x_old.size))
+    rhs = np.zeros(x_old.size)
+    inner = np.ones(x_old.size, bool)
+    inner[first] = inner[last] = False
+    inner = np.flatnonzero(inner)
+    mat[0, inner + 1] = dx[inner - 1]
+    mat[1, inner] = 2 * (dx[inner - 1] + dx[inner])
+    mat[2, inner - 1] = dx[inner]
+    rhs[inner] = 3 * (dx[inner] * slope[inner - 1] + dx[inner - 1] * slope[inner])
+    quad = sizes == 3
+    ini, end = first[quad], last[quad]
+    mat[0, ini + 1] = mat[1, ini] = mat[1, end] = mat[2, end - 1] = 1
+    rhs[ini], rhs[end] = 2 * slope[ini], 2 * slope[end - 1]
+    ini, end = first[~quad], last[~quad]
+    dist = x_old[ini + 2] - x_old[ini]
+    mat[0, ini + 1], mat[1, ini] = dist, dx[ini + 1]
+    rhs[ini] = ((dx[ini] + 2 * dist) * dx[ini + 1] * slope[ini]
+                + dx[ini]**2 * slope[ini + 1]) / dist
+    dist = x_old[end] - x_old[end - 2]
+    mat[2, end - 1], mat[1, end] = dist, dx[end - 2]
+    rhs[end] = (dx[end - 1]**2 * slope[end - 2]
+                + (2 * dist + dx[end - 1]) * dx[end - 2] * slope[end - 1]) / dist
+    deriv = solve_banded((1, 1), mat, rhs, overwrite_ab=True, overwrite_b=True,
+                         check_finite=False)
+
+    # cubic Hermite polynomial of the segment of every new point
+    seg = np.where(hi_idx > lo_idx, lo_idx, lo_idx - 1)
+    step, pos = dx[seg], x_new - x_old[seg]
+    coef_2 = (3 * slope[seg] - 2 * deriv[seg] - deriv[seg + 1]) / step
+    coef_3 = (deriv[seg] + deriv[seg + 1] - 2 * slope[seg]) / step**2
+    y_new = ((coef_3 * pos + coef_2) * pos + deriv[seg]) * pos + y_old[seg]
+    y_new[~in_range | bad_node[seg]] = np.nan
+    return y_new
+
+def _interp_linear(x_old, y_old, x_new, lo_idx, hi_idx, in_range):
+    """Linear interpolation with the formula of numpy.interp, nan outside the
+    range.
+
+    Parameters:
+        x_old (np.array): coordinates of the nodes
+        y_old (np.array): values of the nodes
+        x_new (np.array): coordinates of the new points
+        lo_idx, hi_idx, in_range (np.array): output of _bracket_segments
+
+    Returns:
+        np.array
+    """
+    y_old = y_old.astype(np.float64)
+    y_lo, y_hi = y_old[lo_idx], y_old[hi_idx]
+    x_lo, x_hi = x_old[lo_idx], x_old[hi_idx]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (y_hi - y_lo) / (x_hi - x_lo)
+        y_new = slope * (x_new - x_lo) + y_lo
+        # if nan in one direction, try the other
+        nan_new = np.isnan(y_new)
+        y_new[nan_new] = slope[nan_new] * (x_new[nan_new] - x_hi[nan_new]) + y_hi[nan_new]
+    nan_new = np.isnan(y_new) & (y_lo == y_hi)
+    y_new[nan_new] = y_lo[nan_new]
+    # nodes and end of segments
+    at_node = (x_new == x_lo) | (lo_idx == hi_idx)
+    y_new[at_node] = y_lo[at_node]
+    y_new[~in_range] = np.nan
+    return y_new
@@ -13,17 +13,17 @@ with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
 Define TropCyclone class.
 """
 
-__all__ = ['TCRain']
+__all__ = ['TCRain', 'wind_rain_from_tracks']
 
 import itertools
 import logging
-import datetime as dt
 import numpy as np
 from numba import jit
 from scipy import sparse
 
 from climada.hazard.base import Hazard
-from climada.hazard.trop_cyclone import TropCyclone
+from climada.hazard.trop_cyclone import TropCyclone, MODEL_VANG, \
+compute_windfields, coastal_centroids_idx, track_dates
 from climada.hazard.tag import Tag as TagHazard
 from climada.hazard.centroids.centr import Centroids
 
@@ -70,19 +70,25 @@ class TCRain(Hazard):
 
         LOGGER.info('Mapping %s tracks to %s centroids.', str(tracks.size),
                     str(centroids.size))
+        # grid index of the centroids, shared by all the tracks
+        centr_index = centroids_index(np.asarray(centroids.lat, dtype=float),
+                                      np.asarray(centroids.lon, dtype=float),
+                                      dist_degree)
         if self.pool:
             chunksize = min(num_tracks // self.pool.ncpus, 1000)
             tc_haz = self.pool.map(self._set_from_track, tracks.data,
                                    itertools.repeat(centroids, num_tracks),
                                    itertools.repeat(dist_degree, num_tracks),
                                    itertools.repeat(self.intensity_thres, num_tracks),
+                                   itertools.repeat(centr_index, num_tracks),
                                    chunksize=chunksize)
         else:
             tc_haz = list()
             for track in tracks.data:
                 tc_haz.append(self._set_from_track(track, centroids,
                                                    dist_degree=dist_degree,
-                                                   intensity=self.intensity_thres))
+                                                   intensity=self.intensity_thres,
+                                                   centr_index=centr_index))
         LOGGER.debug('Append events.')
         self.concatenate(tc_haz)
         LOGGER.debug('Compute frequency.')
@@ -90,8 +96,8 @@ class TCRain(Hazard):
         self.tag.description = description
 
     @staticmethod
-    @jit(forceobj=True)
-    def _set_from_track(track, centroids, dist_degree=3, intensity=0.1):
+    def _set_from_track(track, centroids, dist_degree=3, intensity=0.1,
+                        centr_index=None):
         """Set hazard from track and centroids.
         Parameters:
             track (xr.Dataset): tropical cyclone track.
@@ -100,13 +106,16 @@ class TCRain(Hazard):
                                the rainfield is processed (default 3 deg,~300km)
             intensity (int): min intensity threshold below which values are not
                              considered
+            centr_index (tuple, optional): centroids_index of the centroids
+                and dist_degree. Default: computed
         Returns:
             TCRain
         """
         new_haz = TCRain()
         new_haz.tag = TagHazard(HAZ_TYPE, 'IBTrACS: ' + track.name)
         new_haz.intensity = rainfield_from_track(track, centroids,
-                                                 dist_degree, intensity)
+                                                 dist_degree, intensity,
+                                                 centr_index)
         new_haz.units = 'mm'
         new_haz.centroids = centroids
         new_haz.event_id = np.array([1])
@@ -116,16 +125,152 @@ class TCRain(Hazard):
         new_haz.fraction = new_haz.intensity.copy()
         new_haz.fraction.data.fill(1)
         # store date of start
-        new_haz.date = np.array([dt.datetime(
-            track.time.dt.year[0], track.time.dt.month[0],
-            track.time.dt.day[0]).toordinal()])
+        new_haz.date = track_dates(track.time.values[:1])
         new_haz.orig = np.array([track.orig_event_flag])
         new_haz.category = np.array([track.category])
         new_haz.basin = [track.basin]
         return new_haz
 
-def rainfield_from_track(track, centroids, dist_degree=3, intensity=0.1):
+def wind_rain_from_tracks(tracks, centroids=None, dist_degree=3, model='H08',
+                          ignore_distance_to_coast=False, description='',
+                          pool=None):
+    """Windfields and rainfields of the same tracks computed in one pass over
+    the tracks. Same results as TropCyclone.set_from_tracks and
+    TCRain.set_from_tracks, with the centroids selection, geospherical
+    vectors and grid index computed once, one dispatch of the tracks and no
+    concatenation of single event hazards. Both hazards have the same
+    events (ids, names, dates, frequencies, orig, category and basin).
+
+    Parameters:
+        tracks (TCTracks): tracks of events
+        centroids (Centroids, optional): Centroids where to model TC.
+            Default: global centroids for the wind, global centroids on land
+            for the rain, as the defaults of set_from_tracks.
+        dist_degree (int, optional): distance (in degrees) from node within
+            which the rainfield is processed (default 3 deg,~300km)
+        model (str, optional): model to compute gust. Default Holland2008.
+        ignore_distance_to_coast (boolean, optional): if True, centroids
+            far from coast are not ignored for the wind. Default False
+        description (str, optional): description of the events
+        pool (pathos.pool, optional): Pool that will be used for parallel
+            computation. Default: None
+
+    Raises:
+        ValueError
+
+    Returns:
+        TropCyclone, TCRain
+    """
+    try:
+        mod_id = MODEL_VANG[model]
+    except KeyError:
+        LOGGER.error('Model not implemented: %s.', model)
+        raise ValueError
+    num_tracks = tracks.size
+    if centroids is None:
+        centroids = Centroids.from_base_grid(res_as=360, land=False)
+        rain_centroids = Centroids.from_base_grid(res_as=360, land=True)
+    else:
+        rain_centroids = centroids
+
+    for centr in (centroids, rain_centroids):
+        if not centr.coord.size:
+            centr.set_meta_to_lat_lon()
+
+    coastal_idx = coastal_centroids_idx(centroids, ignore_distance_to_coast)
+    coastal_geosph = tuple(ar[coastal_idx] for ar in centroids.get_geosph_vector(cache=False))
+    centr_index = centroids_index(np.asarray(rain_centroids.lat, dtype=float),
+                                  np.asarray(rain_centroids.lon, dtype=float),
+                                  dist_degree)
+    wind_thres, rain_thres = TropCyclone.intensity_thres, TCRain.intensity_thres
+
+    LOGGER.info('Mapping %s tracks to %s centroids.', str(num_tracks),
+                str(centroids.size))
+    if pool and num_tracks:
+        chunksize = min(num_tracks // pool.ncpus, 1000)
+        fields = pool.map(_wind_rain_from_track, tracks.data,
+                          itertools.repeat(centroids, num_tracks),
+                          itertools.repeat(coastal_idx, num_tracks),
+                          itertools.repeat(mod_id, num_tracks),
+                          itertools.repeat(coastal_geosph, num_tracks),
+                          itertools.repeat(rain_centroids, num_tracks),
+                          itertools.repeat(dist_degree, num_tracks),
+                          itertools.repeat(centr_index, num_tracks),
+                          itertools.repeat(wind_thres, num_tracks),
+                          itertools.repeat(rain_thres, num_tracks),
+                          chunksize=chunksize)
+    else:
+        fields = [_wind_rain_from_track(track, centroids, coastal_idx, mod_id,
+                                        coastal_geosph, rain_centroids, dist_degree,
+                                        centr_index, wind_thres, rain_thres)
+                  for track in tracks.data]
+    winds, rains = [list(field) for field in zip(*fields)] if fields else ([], [])
+
+    tc_wind, tc_rain = TropCyclone(), TCRain()
+    names = [track.name for track in tracks.data]
+    tc_wind.tag = TagHazard(tc_wind.tag.haz_type, ['Name: ' + name for name in names]
+                            if len(names) != 1 else 'Name: ' + names[0])
+    tc_rain.tag = TagHazard(HAZ_TYPE, ['IBTrACS: ' + name for name in names]
+                            if len(names) != 1 else 'IBTrACS: ' + names[0])
+    tc_wind.units, tc_rain.units = 'm/s', 'mm'
+    for haz, centr, intensity in zip((tc_wind, tc_rain), (centroids, rain_centroids),
+                                     (winds, rains)):
+        haz.tag.description = description
+        haz.centroids = centr
+        haz.intensity = sparse.vstack(intensity, format='csr') if intensity \
+            else sparse.csr_matrix((0, centr.size))
+        haz.fraction = haz.intensity.copy()
+        haz.fraction.data.fill(1)
+        haz.event_id = np.arange(1, num_tracks + 1)
+        haz.event_name = [track.sid for track in tracks.data]
+        # store first day of track as date
+        haz.date = track_dates([track.time.values[0] for track in tracks.data])
+        haz.orig = np.array([track.orig_event_flag for track in tracks.data], bool)
+        haz.category = np.array([track.category for track in tracks.data], int)
+        haz.basin = [track.basin for track in tracks.data]
+        TropCyclone.frequency_from_tracks(haz, tracks.data)
+        haz._cast_dtype()
+    return tc_wind, tc_rain
+
+def _wind_rain_from_track(track, centroids, coastal_idx, mod_id, centr_geosph,
+                          rain_centroids, dist_degree, centr_index, wind_thres,
+                          rain_thres):
+    """Maximum wind and rain of a track at the centroids.
+
+    Parameters:
+        track (xr.Dataset): tropical cyclone track.
+        centroids (Centroids): Centroids instance of the wind.
+        coastal_idx (np.array): Indices of centroids close to coast.
+        mod_id (int): Holland model selection according to MODEL_VANG
+        centr_geosph (tuple(np.array)): geospherical vectors and bases of the
+            coastal centroids
+        rain_centroids (Centroids): Centroids instance of the rain.
+        dist_degree (int): distance (in degrees) from node within which the
+            rainfield is processed
+        centr_index (tuple): centroids_index of rain_centroids and dist_degree
+        wind_thres (float): winds below are set to 0
+        rain_thres (float): rains below are set to 0
+
+    Returns:
+        sparse.csr_matrix (1 x centroids), sparse.csr_matrix (1 x rain_centroids)
+    """
+    windfields = compute_windfields(track, centroids.coord[coastal_idx], mod_id,
+                                    centr_geosph)
+    wind = np.zeros(centroids.size)
+    wind[coastal_idx] = np.linalg.norm(windfields, axis=-1).max(axis=0)
+    wind[wind < wind_thres] = 0
+    rain = rainfield_from_track(track, rain_centroids, dist_degree, rain_thres,
+                                centr_index)
+    return sparse.csr_matrix(wind.reshape(1, -1)), rain
+
+def rainfield_from_track(track, centroids, dist_degree=3, intensity=0.1,
+                         centr_index=None):
     """Compute rainfield for track at centroids.
+
+    Only the centroids within dist_degree of every node are evaluated: they
+    are looked up in a grid index of the centroids (see centroids_index) and
+    the rain rates of the nodes are accumulated in place by a Numba kernel.
+
     Parameters:
         track (xr.Dataset): tropical cyclone track.
         centroids (Centroids): Centroids instance.
@@ -133,63 +278,132 @@ def rainfield_from_track(track, centroids, dist_degree=3, intensity=0.1):
                            the rainfield is processed (default 3 deg,~300km)
         intensity (int): min intensity threshold below which values are not
                          considered
+        centr_index (tuple, optional): centroids_index of the centroids and
+            dist_degree. Default: computed
+
+    Returns:
+        sparse.csr_matrix (1 x centroids)
     """
-    dlon, dlat = dist_degree, dist_degree
+    c_lat = np.asarray(centroids.lat, dtype=float)
+    c_lon = np.asarray(centroids.lon, dtype=float)
+    if centr_index is None:
+        centr_index = centroids_index(c_lat, c_lon, dist_degree)
+
+    rainsum = np.zeros(c_lat.size)
+    if c_lat.size:
+        _rainsum_kernel(track.lat.values.astype(float), track.lon.values.astype(float),
+                        _wind_kn(track), c_lat, c_lon, np.cos(c_lat / 180 * np.pi),
+                        float(dist_degree), *centr_index, rainsum)
+
+    pos = ((rainsum >= intensity) & (rainsum != 0)).nonzero()[0]
+    return sparse.csr_matrix((rainsum[pos], pos, np.array([0, pos.size])),
+                             shape=(1, c_lat.size))
+
+def centroids_index(c_lat, c_lon, dist_degree=3):
+    """Grid index of the centroids: the centroids are sorted by cells of at
+    least dist_degree degrees (row major), so that the centroids close to a
+    node are in a few contiguous ranges.
 
-    n_track_nodes = len(track.lat)
-    n_centroids = len(centroids.lat)
-    cos_centroids_lat = np.cos(centroids.lat / 180 * np.pi)
+    Parameters:
+        c_lat (np.array): latitudes of the centroids
+        c_lon (np.array): longitudes of the centroids
+        dist_degree (float, optional): minimum cell size in degrees.
+            Default: 3
+
+    Returns:
+        np.array (sorted centroids indices), np.array (offsets of the cells
+        in the sorted indices), float (first latitude), float (first
+        longitude), int (number of rows), int (number of columns),
+        float (cell size)
+    """
+    if not c_lat.size:
+        return np.zeros(0, int), np.zeros(1, int), 0.0, 0.0, 0, 0, float(dist_degree)
+    lat0, lon0 = c_lat.min(), c_lon.min()
+    # at most about a million cells
+    cell = max(float(dist_degree), (c_lat.max() - lat0) / 1000,
+               (c_lon.max() - lon0) / 1000)
+    i_lat = np.floor((c_lat - lat0) / cell).astype(int)
+    i_lon = np.floor((c_lon - lon0) / cell).astype(int)
+    nlat, nlon = i_lat.max() + 1, i_lon.max() + 1
+    cell_id = i_lat * nlon + i_lon
+    order = np.argsort(cell_id, kind='stable')
+    cell_ptr = np.zeros(nlat * nlon + 1, int)
+    np.cumsum(np.bincount(cell_id, minlength=nlat * nlon), out=cell_ptr[1:])
+    return order, cell_ptr, lat0, lon0, nlat, nlon, cell
+
+def _wind_kn(track):
+    """Maximum sustained wind of the track nodes in knots.
 
-    rainsum = np.zeros(n_centroids)
+    Parameters:
+        track (xr.Dataset): tropical cyclone track.
 
-    # transform wind speed in knots
-    if track.max_sustained_wind_unit == 'kn':
-        pass
-    elif track.max_sustained_wind_unit == 'km/h':
-        track.max_sustained_wind /= 1.852
+    Returns:
+        np.array
+    """
+    wind = track.max_sustained_wind.values.astype(float)
+    if track.max_sustained_wind_unit == 'km/h':
+        wind = wind / 1.852
     elif track.max_sustained_wind_unit == 'mph':
-        track.max_sustained_wind /= 1.151
+        wind = wind / 1.151
     elif track.max_sustained_wind_unit == 'm/s':
-        track.max_sustained_wind /= (1000 * 60 * 60)
-        track.max_sustained_wind /= 1.852
-
-    track.attrs['max_sustained_wind_unit'] = 'kn'
+        wind = wind / (1000 * 60 * 60) / 1.852
+    return wind
 
-    lats = track.lat.values
-    lons = track.lon.values
+@jit(nopython=True)
+def _rainsum_kernel(t_lat, t_lon, t_wind, c_lat, c_lon, c_cos, dist_degree,
+                    order, cell_ptr, lat0, lon0, nlat, nlon, cell, rainsum):
+    """Add the RCLIPER rain rates of the nodes of a track to rainsum at the
+    centroids within dist_degree (in latitude and longitude) of every node.
 
-    for node in range(n_track_nodes):
-        inreach = (np.abs(centroids.lat - lats[node]) < dlat) \
-                & (np.abs(centroids.lon - lons[node]) < dlon)
-
-        if inreach.any():
-            pos = np.where(inreach)[0]
-
-            fradius_km = np.zeros(n_centroids)
-            dd = ((lons[node] - centroids.lon[pos]) * cos_centroids_lat[pos])**2 \
-                + (lats[node] - centroids.lat[pos])**2
-
-            fradius_km[pos] = np.sqrt(dd) * 111.12
-
-            rainsum += _RCLIPER(track.max_sustained_wind.values[node],
-                                inreach, fradius_km)
-
-    rainsum[rainsum < intensity] = 0
-
-    return sparse.csr_matrix(rainsum)
-
-def _RCLIPER(fmaxwind_kn, inreach, radius_km):
-    """Calculate rainrate in mm/h based on RCLIPER given windspeed (kn) at
-    a specific node
     Parameters:
-        fmaxwind_kn (float): maximum sustained wind at specific node
-        inreach (np.array, boolean): 1 if centroid is within dist_degree,
-                                         0 otherwise
-        radius_km (np.array): distance to node for every centroid
+        t_lat, t_lon (np.array): nodes coordinates in degrees
+        t_wind (np.array): maximum sustained wind of the nodes in knots
+        c_lat, c_lon (np.array): centroids coordinates in degrees
+        c_cos (np.array): cosinus of the centroids latitudes
+        dist_degree (float): distance from node in degrees
+        order, cell_ptr, lat0, lon0, nlat, nlon, cell: centroids_index
+        rainsum (np.array): rain at every centroid, updated
     """
+    for k in range(t_lat.size):
+        if np.isnan(t_lat[k]) or np.isnan(t_lon[k]):
+            continue
+        i_lo = max(int(np.floor((t_lat[k] - dist_degree - lat0) / cell)), 0)
+        i_hi = min(int(np.floor((t_lat[k] + dist_degree - lat0) / cell)), nlat - 1)
+        j_lo = max(int(np.floor((t_lon[k] - dist_degree - lon0) / cell)), 0)
+        j_hi = min(int(np.floor((t_lon[k] + dist_degree - lon0) / cell)), nlon - 1)
+        if i_lo > i_hi or j_lo > j_hi:
+            continue
+        t_0, t_m, r_m, r_0 = _rcliper_params(t_wind[k])
+        for i in range(i_lo, i_hi + 1):
+            # cells of a row are contiguous in order
+            for idx in order[cell_ptr[i * nlon + j_lo]:cell_ptr[i * nlon + j_hi + 1]]:
+                if not (abs(c_lat[idx] - t_lat[k]) < dist_degree
+                        and abs(c_lon[idx] - t_lon[k]) < dist_degree):
+                    continue
+                radius_km = np.sqrt(((t_lon[k] - c_lon[idx]) * c_cos[idx])**2
+                                    + (t_lat[k] - c_lat[idx])**2) * 111.12
+                # rain rate in mm/h
+                if radius_km <= r_m:
+                    rainrate = (t_0 + (t_m - t_0) * (radius_km / r_m)) / 24. * 25.4
+                elif radius_km > r_m:
+                    rainrate = (t_m * np.exp(-(radius_km - r_m) / r_0)) / 24. * 25.4
+                else:
+                    rainrate = 0.
+                if rainrate > 0:
+                    rainsum[idx] += rainrate
+
+@jit(nopython=True)
+def _rcliper_params(fmaxwind_kn):
+    """Parameters of the RCLIPER rain rate given windspeed (kn) at a
+    specific node: rain rates at the center and at the radius of maximum
+    rain (inch per day), radius of maximum rain and decay radius (km).
 
-    rainrate = np.zeros(len(inreach))
+    Parameters:
+        fmaxwind_kn (float): maximum sustained wind at specific node
 
+    Returns:
+        float, float, float, float
+    """
     # Define Coefficients (CLIPER NHC bias adjusted (Tuleya, 2007))
     a1 = -1.1  # inch per day
     a2 = -1.6  # inch per day
@@ -203,19 +417,5 @@ def _RCLIPER(fmaxwind_kn, inreach, radius_km):
 
     u_norm_kn = 1. + (fmaxwind_kn - 35.) / 33.
 
-    T0 = a1 + b1 * u_norm_kn
-    Tm = a2 + b2 * u_norm_kn
-    rm = a3 + b3 * u_norm_kn
-    r0 = a4 + b4 * u_norm_kn
-
-    i = (radius_km <= rm) & inreach
-    ii = (radius_km > rm) & inreach
-
-    # Calculate R-Cliper symmetric rain rate in mm/h
-    rainrate[i] = (T0 + (Tm - T0) * (radius_km[i] / rm)) / 24. * 25.4
-    rainrate[ii] = (Tm * np.exp(-(radius_km[ii] - rm) / r0)) / 24. * 25.4
-
-    rainrate[np.isnan(rainrate)] = 0
-    rainrate[rainrate < 0] = 0
-
-    return rainrate
+    return a1 + b1 * u_norm_kn, a2 + b2 * u_norm_kn, a3 + b3 * u_norm_kn, \
+        a4 + b4 * u_norm_kn
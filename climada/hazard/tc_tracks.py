@@ -24,6 +24,7 @@ __all__ = ['CAT_NAMES', 'SAFFIR_SIM_CAT', 'TCTracks', 'set_category']
 import os
 import glob
 import shutil
+import tempfile
 import logging
 import warnings
 import datetime as dt
@@ -36,7 +37,7 @@ from matplotlib.colors import BoundaryNorm, ListedColormap
 import cartopy.crs as ccrs
 import pandas as pd
 import xarray as xr
-from sklearn.neighbors import DistanceMetric
+import h5py
 import netCDF4 as nc
 from numba import jit
 import scipy.io.matlab as matlab
@@ -48,6 +49,7 @@ from climada.util.constants import EARTH_RADIUS_KM, SYSTEM_DIR
 from climada.util.files_handler import get_file_names, download_ftp
 import climada.util.plot as u_plot
 import climada.hazard.tc_tracks_synth
+from climada.hazard.tc_columns import TCColumns, NS_PER_HOUR
 
 LOGGER = logging.getLogger(__name__)
 
@@ -89,6 +91,13 @@ IBTRACS_USA_AGENCIES = [
 ]
 """Names/IDs of agencies in IBTrACS that correspond to 'usa_*' variables"""
 
+IBTRACS_CACHE_VARS = ['time', 'time_step', 'lat', 'lon', 'basin',
+                      'wind', 'pres', 'rmw', 'roci', 'poci']
+"""Variables of the nodes in the preprocessed IBTrACS file"""
+
+IBTRACS_CACHE_CHUNK = 1000
+"""Number of storms preprocessed at once"""
+
 DEF_ENV_PRESSURE = 1010
 """Default environmental pressure"""
 
@@ -138,22 +147,62 @@ class TCTracks():
             computed during processing:
                 - on_land
                 - dist_since_lf
+        columns (TCColumns): same tracks stored as concatenated arrays.
+            Once accessed or set, data is the reference: columns are then built
+            from it at every access, without modifying it. Columns which are
+            set are kept until data is accessed.
     """
     def __init__(self, pool=None):
         """Empty constructor. Read csv IBTrACS files if provided."""
-        self.data = list()
+        self._data = list()
+        self._columns = None
         if pool:
             self.pool = pool
             LOGGER.debug('Using %s CPUs.', self.pool.ncpus)
         else:
             self.pool = None
 
+    @property
+    def data(self):
+        """List of tracks as xarray.Dataset"""
+        if self._data is None:
+            self._data = self._columns.to_datasets()
+            self._columns = None
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._columns = None
+
+    @property
+    def columns(self):
+        """Tracks as TCColumns. If the tracks are held as data, the columns
+        are a new copy of them: modifications need to be set back."""
+        if self._columns is None:
+            columns = TCColumns()
+            columns.set_from_datasets(self._data)
+            return columns
+        return self._columns
+
+    @columns.setter
+    def columns(self, columns):
+        self._columns = columns
+        self._data = None
+
     def append(self, tracks):
         """Append tracks to current.
 
         Parameters:
-            tracks (xarray.Dataset or list(xarray.Dataset)): tracks to append.
+            tracks (xarray.Dataset or list(xarray.Dataset) or TCColumns):
+                tracks to append.
         """
+        if isinstance(tracks, TCColumns):
+            if self._columns is None:
+                self._data.extend(tracks.to_datasets())
+            else:
+                self._columns.append(tracks)
+            return
         if not isinstance(tracks, list):
             tracks = [tracks]
         self.data.extend(tracks)
@@ -194,8 +243,14 @@ class TCTracks():
                 magnitude should come first.
         """
         out = self.__class__(self.pool)
-        out.data = self.data
+        if self._columns is not None:
+            sel = np.ones(self.size, bool)
+            for key, pattern in filterdict.items():
+                sel &= (self._columns.attrs[key] == pattern).values
+            out.columns = self._columns.select(sel)
+            return out
 
+        out.data = self.data
         for key, pattern in filterdict.items():
             out.data = [ds for ds in out.data if ds.attrs[key] == pattern]
 
@@ -204,7 +259,7 @@ class TCTracks():
     def read_ibtracs_netcdf(self, provider=None, storm_id=None,
                             year_range=None, basin=None, estimate_missing=False,
                             correct_pres=False,
-                            file_name='IBTrACS.ALL.v04r00.nc'):
+                            file_name='IBTrACS.ALL.v04r00.nc', cache=False):
         """Fill from raw ibtracs v04. Removes nans in coordinates, central
         pressure and removes repeated times data. Fills nans of environmental_pressure
         and radius_max_wind. Checks environmental_pressure > central_pressure.
@@ -226,22 +281,21 @@ class TCTracks():
                 `estimate_missing` instead!
             file_name (str, optional): name of netcdf file to be dowloaded or located
                 at climada/data/system. Default: 'IBTrACS.ALL.v04r00.nc'.
+            cache (bool, optional): read the tracks from the preprocessed copy
+                of the netcdf file written by `ibtracs_preprocess` (on first
+                use, or when the netcdf file is newer). The tracks are then
+                filled as columns (see TCTracks.columns). Default: False
         """
         if correct_pres:
             LOGGER.warning("`correct_pres` is deprecated. "
                            "Use `estimate_missing` instead.")
             estimate_missing = True
         self.data = list()
-        fn_nc = os.path.join(os.path.abspath(SYSTEM_DIR), file_name)
-        if not glob.glob(fn_nc):
-            try:
-                download_ftp(f'{IBTRACS_URL}/{IBTRACS_FILE}', IBTRACS_FILE)
-                shutil.move(IBTRACS_FILE, fn_nc)
-            except ValueError as err:
-                LOGGER.error('Error while downloading %s. Try to download it '
-                             'manually and put the file in '
-                             'climada_python/data/system/', IBTRACS_URL)
-                raise err
+        if cache:
+            self._read_ibtracs_cache(provider, storm_id, year_range, basin,
+                                     estimate_missing, file_name)
+            return
+        fn_nc = _ibtracs_file(file_name)
 
         ibtracs_ds = xr.open_dataset(fn_nc)
         match = np.ones(ibtracs_ds.sid.shape[0], dtype=bool)
@@ -277,29 +331,7 @@ class TCTracks():
             LOGGER.warning('No valid timestamps found for %s.', st_ids)
             ibtracs_ds = ibtracs_ds.sel(storm=valid_st)
 
-        if not provider:
-            agency_pref, track_agency_ix = ibtracs_track_agency(ibtracs_ds)
-
-        for var in ['wind', 'pres', 'rmw', 'poci', 'roci']:
-            if provider:
-                # enforce use of specified provider's data points
-                ibtracs_ds[var] = ibtracs_ds[f'{provider}_{var}']
-            else:
-                # array of values in order of preference
-                cols = [f'{a}_{var}' for a in agency_pref]
-                cols = [col for col in cols if col in ibtracs_ds.data_vars.keys()]
-                all_vals = ibtracs_ds[cols].to_array(dim='agency')
-                preferred_ix = all_vals.notnull().argmax(dim='agency')
-
-                if var in ['wind', 'pres']:
-                    # choice: wmo -> wmo_agency/usa_agency -> preferred
-                    ibtracs_ds[var] = ibtracs_ds['wmo_' + var] \
-                        .fillna(all_vals.isel(agency=track_agency_ix)) \
-                        .fillna(all_vals.isel(agency=preferred_ix))
-                else:
-                    ibtracs_ds[var] = all_vals.isel(agency=preferred_ix)
-        ibtracs_ds = ibtracs_ds[['sid', 'name', 'basin', 'lat', 'lon', 'time', 'valid_t',
-                                 'wind', 'pres', 'rmw', 'roci', 'poci']]
+        ibtracs_ds = _ibtracs_select_provider(ibtracs_ds, provider)
 
         if estimate_missing:
             ibtracs_ds['pres'][:] = _estimate_pressure(ibtracs_ds.pres,
@@ -397,6 +429,58 @@ class TCTracks():
             }))
         self.data = all_tracks
 
+    def _read_ibtracs_cache(self, provider, storm_id, year_range, basin,
+                            estimate_missing, file_name):
+        """Fill columns from the preprocessed IBTrACS file. Same parameters
+        and processing as read_ibtracs_netcdf, for all the tracks at once."""
+        fn_nc = os.path.join(os.path.abspath(SYSTEM_DIR), file_name)
+        cache_file = _ibtracs_cache_file(fn_nc, provider)
+        if not os.path.isfile(cache_file) or (os.path.isfile(fn_nc) and
+                                              os.path.getmtime(fn_nc) > os.path.getmtime(cache_file)):
+            ibtracs_preprocess(provider, file_name)
+
+        with h5py.File(cache_file, 'r') as data:
+            sid = data['sid'][:]
+            offsets = data['offsets'][:]
+            match = np.ones(sid.size, dtype=bool)
+            if storm_id:
+                if not isinstance(storm_id, list):
+                    storm_id = [storm_id]
+                match &= np.isin(sid, [i.encode() for i in storm_id])
+                if np.count_nonzero(match) == 0:
+                    LOGGER.info('No tracks with given IDs %s.', storm_id)
+            else:
+                year_range = year_range if year_range else (1980, 2018)
+            if year_range:
+                years = sid.astype('S4').astype(int)
+                match &= (years >= year_range[0]) & (years <= year_range[1])
+                if np.count_nonzero(match) == 0:
+                    LOGGER.info('No tracks in time range (%s, %s).', *year_range)
+            if basin:
+                match &= np.logical_or.reduceat(data['basin'][:] == basin.encode(),
+                                                offsets[:-1])
+                if np.count_nonzero(match) == 0:
+                    LOGGER.info('No tracks in basin %s.', basin)
+
+            if np.count_nonzero(match) == 0:
+                LOGGER.info('There are no tracks matching the specified requirements.')
+                self.data = []
+                return
+
+            # read the nodes between the first and the last matching tracks
+            first, last = np.flatnonzero(match)[[0, -1]]
+            block = slice(offsets[first], offsets[last + 1])
+            sizes = np.diff(offsets)[match]
+            node_idx = np.arange(sizes.sum()) + np.repeat(
+                offsets[:-1][match] - offsets[first] - np.cumsum(sizes) + sizes, sizes)
+            nodes = {var: data[var][block][node_idx] for var in IBTRACS_CACHE_VARS}
+            name = data['name'][:][match]
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            sid = sid[match]
+
+        self.columns = _ibtracs_columns(nodes, offsets, sid, name, provider,
+                                        estimate_missing)
+
     def read_processed_ibtracs_csv(self, file_names):
         """Fill from processed ibtracs csv file(s).
 
@@ -634,6 +718,9 @@ class TCTracks():
 
     def equal_timestep(self, time_step_h=1, land_params=False):
         """Generate interpolated track values to time steps of min_time_step.
+        Without pool, tracks having all the same variables are interpolated
+        all at once as columns (see TCColumns.equal_timestep).
+
         Parameters:
             time_step_h (float, optional): time step in hours to which to
                 interpolate. Default: 1.
@@ -642,6 +729,8 @@ class TCTracks():
         """
         LOGGER.info('Interpolating %s tracks to %sh time steps.', self.size,
                     time_step_h)
+        if not self.size:
+            return
 
         if land_params:
             extent = self.get_extent()
@@ -655,6 +744,9 @@ class TCTracks():
                                       itertools.repeat(time_step_h, self.size),
                                       itertools.repeat(land_geom, self.size),
                                       chunksize=chunksize)
+        elif self._columns is not None or \
+        all(set(track.variables) == set(self._data[0].variables) for track in self._data):
+            self.columns = self.columns.equal_timestep(time_step_h, land_geom)
         else:
             new_data = list()
             for track in self.data:
@@ -668,8 +760,10 @@ class TCTracks():
 
     @property
     def size(self):
-        """Get longitude from coord array"""
-        return len(self.data)
+        """Get number of tracks"""
+        if self._columns is not None:
+            return self._columns.size
+        return len(self._data)
 
     def get_bounds(self, deg_buffer=0.1):
         """Get bounds as (lon_min, lat_min, lon_max, lat_max) tuple.
@@ -680,6 +774,8 @@ class TCTracks():
         Returns:
             tuple (lon_min, lat_min, lon_max, lat_max)
         """
+        if self._columns is not None:
+            return self._columns.get_bounds(deg_buffer)
         bounds = coord_util.latlon_bounds(
             np.concatenate([t.lat.values for t in self.data]),
             np.concatenate([t.lon.values for t in self.data]),
@@ -769,6 +865,7 @@ class TCTracks():
 
     def write_netcdf(self, folder_name):
         """Write a netcdf file per track with track.sid name in given folder.
+        For large sets of tracks, use write_hdf5 which writes one file.
 
         Parameters:
             folder_name (str): folder name where to write files
@@ -791,10 +888,40 @@ class TCTracks():
         for file in file_tr:
             if not os.path.splitext(file)[1] == '.nc':
                 continue
-            track = xr.open_dataset(file)
+            with xr.open_dataset(file) as track:
+                track = track.load()
             track.attrs['orig_event_flag'] = bool(track.orig_event_flag)
             self.data.append(track)
 
+    def write_hdf5(self, file_name, append=False):
+        """Write all the tracks to one HDF5 file, with the nodes of all the
+        tracks one after the other and a table of track attributes. See
+        TCColumns.write_hdf5.
+
+        Parameters:
+            file_name (str): file name to write, with h5 format
+            append (bool, optional): add the tracks to the ones of an existing
+                file. Default: False
+        """
+        self.columns.write_hdf5(file_name, append)
+
+    def read_hdf5(self, file_name, storm_id=None, year_range=None, basin=None):
+        """Read tracks written by write_hdf5, all of them or only the ones
+        matching the given requirements.
+
+        Parameters:
+            file_name (str): file name to read, with h5 format
+            storm_id (str or list(str), optional): sid of the tracks to read.
+                Default: all
+            year_range (tuple, optional): first and last year of the first
+                time of the tracks to read. Default: all
+            basin (str, optional): basin attribute of the tracks to read.
+                Default: all
+        """
+        columns = TCColumns()
+        columns.read_hdf5(file_name, storm_id, year_range, basin)
+        self.columns = columns
+
     @staticmethod
     @jit(parallel=True, forceobj=True)
     def _one_interp_data(track, time_step_h, land_geom=None):
@@ -896,15 +1023,19 @@ class TCTracks():
         self.data.append(tr_ds)
 
 
-def track_land_params(track, land_geom):
+def track_land_params(track, land_geom, gridded=False):
     """Compute parameters of land for one track.
 
     Parameters:
         track (xr.Dataset): tropical cyclone track
         land_geom (shapely.geometry.multipolygon.MultiPolygon): land geometry
+        gridded (bool, optional): look up the land raster instead of the
+            geometry, see `climada.util.coordinates.coord_on_land`.
+            Default: False
     """
     track['on_land'] = ('time',
-                        coord_util.coord_on_land(track.lat.values, track.lon.values, land_geom))
+                        coord_util.coord_on_land(track.lat.values, track.lon.values, land_geom,
+                                                 gridded=gridded))
     track['dist_since_lf'] = ('time', _dist_since_lf(track))
 
 def _dist_since_lf(track):
@@ -917,44 +1048,95 @@ def _dist_since_lf(track):
     Returns:
         np.arrray
     """
-    dist_since_lf = np.zeros(track.time.values.shape)
-
-    # Index in sea that follows a land index
-    sea_land_idx = np.where(np.diff(track.on_land.astype(int)) == 1)[0]
-    if not sea_land_idx.size:
-        return (dist_since_lf + 1) * np.nan
-
-    # Index in sea that comes from previous land index
-    land_sea_idx = np.where(np.diff(track.on_land.astype(int)) == -1)[0] + 1
-    if track.on_land[-1]:
-        land_sea_idx = np.append(land_sea_idx, track.time.size)
-    orig_lf = np.empty((sea_land_idx.size, 2))
-    for i_lf, lf_point in enumerate(sea_land_idx):
-        orig_lf[i_lf][0] = track.lat[lf_point] + \
-            (track.lat[lf_point + 1] - track.lat[lf_point]) / 2
-        orig_lf[i_lf][1] = track.lon[lf_point] + \
-            (track.lon[lf_point + 1] - track.lon[lf_point]) / 2
-
-    dist = DistanceMetric.get_metric('haversine')
-    nodes1 = np.radians(np.array([track.lat.values[1:],
-                                  track.lon.values[1:]]).transpose())
-    nodes0 = np.radians(np.array([track.lat.values[:-1],
-                                  track.lon.values[:-1]]).transpose())
-    dist_since_lf[1:] = dist.pairwise(nodes1, nodes0).diagonal()
-    dist_since_lf[~track.on_land.values] = 0.0
-    nodes1 = np.array([track.lat.values[sea_land_idx + 1],
-                       track.lon.values[sea_land_idx + 1]]).transpose() / 180 * np.pi
-    dist_since_lf[sea_land_idx + 1] = \
-        dist.pairwise(nodes1, orig_lf / 180 * np.pi).diagonal()
-    for sea_land, land_sea in zip(sea_land_idx, land_sea_idx):
-        dist_since_lf[sea_land + 1:land_sea] = \
-            np.cumsum(dist_since_lf[sea_land + 1:land_sea])
+    return _dist_since_lf_nodes(track.lat.values, track.lon.values,
+                                track.on_land.values, np.array([0, track.time.size]))
 
-    dist_since_lf *= EARTH_RADIUS_KM
-    dist_since_lf[~track.on_land.values] = np.nan
+def _dist_since_lf_nodes(lat, lon, on_land, offsets):
+    """Compute the distance to landfall in km of the nodes of several tracks,
+    as _dist_since_lf for every track. Points on water and points of tracks
+    without landfall get nan values.
+
+    Parameters:
+        lat (np.array): latitude of the nodes of all the tracks
+        lon (np.array): longitude of the nodes of all the tracks
+        on_land (np.array): whether every node is on land
+        offsets (np.array): position of the first node of every track, plus
+            the total number of nodes at the end
+
+    Returns:
+        np.array
+    """
+    on_land = on_land.astype(bool)
+    track_idx = np.repeat(np.arange(offsets.size - 1), np.diff(offsets))
+    landfall, lf_idx, run_end = _landfall_runs(on_land, offsets)
+
+    # distance to the previous node, or to the middle of the landfall segment
+    lat0, lon0 = np.empty(lat.size), np.empty(lat.size)
+    lat0[1:], lon0[1:] = lat[:-1], lon[:-1]
+    lat0[landfall] += (lat[landfall] - lat0[landfall]) / 2
+    lon0[landfall] += (lon[landfall] - lon0[landfall]) / 2
+    not_first = np.ones(lat.size, bool)
+    not_first[offsets[:-1][np.diff(offsets) > 0]] = False
+    dist_since_lf = np.zeros(lat.size)
+    dist_since_lf[not_first] = _haversine_rad(lat[not_first], lon[not_first],
+                                              lat0[not_first], lon0[not_first])
+
+    # cumulated over land since every landfall, but for tracks starting on land
+    _cumsum_runs(dist_since_lf, lf_idx, run_end)
+    has_lf = np.bincount(track_idx[landfall], minlength=offsets.size - 1) > 0
 
+    dist_since_lf *= EARTH_RADIUS_KM
+    dist_since_lf[~on_land | ~has_lf[track_idx]] = np.nan
     return dist_since_lf
 
+def _landfall_runs(on_land, offsets):
+    """Find the landfalls of several tracks, and the nodes on land following
+    them in the tracks starting at sea.
+
+    Parameters:
+        on_land (np.array(bool)): whether every node is on land
+        offsets (np.array): position of the first node of every track, plus
+            the total number of nodes at the end
+
+    Returns:
+        landfall (np.array(bool)): land nodes following a sea node of the
+            same track
+        lf_idx (np.array(int)): position of the landfall nodes of the tracks
+            starting at sea, sorted
+        run_end (np.array(int)): position of the first sea node after every
+            landfall of lf_idx, or of the end of its track
+    """
+    first = np.zeros(on_land.size, bool)
+    first[offsets[:-1][np.diff(offsets) > 0]] = True
+    prev_land = np.zeros(on_land.size, bool)
+    prev_land[1:] = on_land[:-1]
+    prev_land[first] = False
+    landfall = on_land & ~prev_land & ~first
+
+    track_idx = np.repeat(np.arange(offsets.size - 1), np.diff(offsets))
+    starts_sea = np.ones(offsets.size - 1, bool)
+    starts_sea[track_idx[first]] = ~on_land[first]
+    lf_idx = np.flatnonzero(landfall & starts_sea[track_idx])
+    sea_or_end = np.append(np.flatnonzero(~on_land | first), on_land.size)
+    run_end = sea_or_end[np.searchsorted(sea_or_end, lf_idx, side='right')]
+    return landfall, lf_idx, run_end
+
+def _haversine_rad(lat1, lon1, lat2, lon2):
+    """Element-wise great circle distance in radians between points given in
+    degrees."""
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+    sin_lat = np.sin(0.5 * (lat1 - lat2))
+    sin_lon = np.sin(0.5 * (lon1 - lon2))
+    return 2 * np.arcsin(np.sqrt(sin_lat * sin_lat
+                                 + np.cos(lat1) * np.cos(lat2) * sin_lon * sin_lon))
+
+@jit(nopython=True)
+def _cumsum_runs(values, starts, ends):
+    """Cumulative sum in place of values over every range starts[i]:ends[i]."""
+    for start, end in zip(starts, ends):
+        for idx in range(start + 1, end):
+            values[idx] += values[idx - 1]
+
 def _estimate_pressure(cen_pres, lat, lon, v_max):
     """Replace missing pressure values with statistical estimate.
 
@@ -1220,6 +1402,246 @@ def ibtracs_track_agency(ds_sel):
     track_agency_ix = xr.apply_ufunc(agency_fun, track_agency, vectorize=True)
     return agency_pref, track_agency_ix
 
+def _ibtracs_file(file_name):
+    """Path of IBTrACS netcdf file in SYSTEM_DIR, downloaded if not there."""
+    fn_nc = os.path.join(os.path.abspath(SYSTEM_DIR), file_name)
+    if not glob.glob(fn_nc):
+        try:
+            download_ftp(f'{IBTRACS_URL}/{IBTRACS_FILE}', IBTRACS_FILE)
+            shutil.move(IBTRACS_FILE, fn_nc)
+        except ValueError as err:
+            LOGGER.error('Error while downloading %s. Try to download it '
+                         'manually and put the file in '
+                         'climada_python/data/system/', IBTRACS_URL)
+            raise err
+    return fn_nc
+
+def _ibtracs_select_provider(ibtracs_ds, provider):
+    """Set wind, pres, rmw, poci and roci variables from the values of the
+    provider or of the preferred agencies, as in read_ibtracs_netcdf.
+
+    Parameters:
+        ibtracs_ds (xarray.Dataset): IBTrACS storms with valid_t variable
+        provider (str): agency, or None for automatic choice
+
+    Returns:
+        xarray.Dataset
+    """
+    if not provider:
+        agency_pref, track_agency_ix = ibtracs_track_agency(ibtracs_ds)
+
+    for var in ['wind', 'pres', 'rmw', 'poci', 'roci']:
+        if provider:
+            # enforce use of specified provider's data points
+            ibtracs_ds[var] = ibtracs_ds[f'{provider}_{var}']
+        else:
+            # array of values in order of preference
+            cols = [f'{a}_{var}' for a in agency_pref]
+            cols = [col for col in cols if col in ibtracs_ds.data_vars.keys()]
+            all_vals = ibtracs_ds[cols].to_array(dim='agency')
+            preferred_ix = all_vals.notnull().argmax(dim='agency')
+
+            if var in ['wind', 'pres']:
+                # choice: wmo -> wmo_agency/usa_agency -> preferred
+                ibtracs_ds[var] = ibtracs_ds['wmo_' + var] \
+                    .fillna(all_vals.isel(agency=track_agency_ix)) \
+                    .fillna(all_vals.isel(agency=preferred_ix))
+            else:
+                ibtracs_ds[var] = all_vals.isel(agency=preferred_ix)
+    return ibtracs_ds[['sid', 'name', 'basin', 'lat', 'lon', 'time', 'valid_t',
+                       'wind', 'pres', 'rmw', 'roci', 'poci']]
+
+def _ibtracs_cache_file(fn_nc, provider):
+    """Name of the preprocessed file of an IBTrACS netcdf file and provider."""
+    return f'{os.path.splitext(fn_nc)[0]}_{provider if provider else "auto"}.h5'
+
+def ibtracs_preprocess(provider=None, file_name=IBTRACS_FILE, chunk_size=IBTRACS_CACHE_CHUNK):
+    """Write the IBTrACS storms with the values of the chosen provider to an
+    HDF5 file next to the netcdf file, read by
+    TCTracks.read_ibtracs_netcdf(cache=True). The nodes of all the storms
+    are stored one after the other, in storm order. Usually, this function
+    doesn't need to be called explicitly since read_ibtracs_netcdf calls it
+    on first use.
+
+    Parameters:
+        provider (str, optional): agency, see read_ibtracs_netcdf. Default:
+            None (automatic choice)
+        file_name (str, optional): name of netcdf file to be dowloaded or
+            located at climada/data/system. Default: IBTRACS_FILE
+        chunk_size (int, optional): number of storms processed at once.
+            Default: IBTRACS_CACHE_CHUNK
+
+    Returns:
+        str: name of the written file
+    """
+    fn_nc = _ibtracs_file(file_name)
+    cache_file = _ibtracs_cache_file(fn_nc, provider)
+    LOGGER.info('Preprocessing %s into %s.', fn_nc, cache_file)
+    nodes = {var: [] for var in IBTRACS_CACHE_VARS}
+    sizes, sid, name = [], [], []
+    with xr.open_dataset(fn_nc) as ibtracs_all:
+        for start in range(0, ibtracs_all.sid.size, chunk_size):
+            ibtracs_ds = ibtracs_all.isel(storm=slice(start, start + chunk_size))
+            ibtracs_ds['valid_t'] = ibtracs_ds.time.notnull()
+            ibtracs_ds = _ibtracs_select_provider(ibtracs_ds, provider)
+            time_step = np.zeros(ibtracs_ds.time.shape)
+            time_step[:, 1:] = np.diff(ibtracs_ds.time.values, axis=1) / np.timedelta64(1, 's')
+            time_step[:, 0] = time_step[:, 1]
+
+            valid_t = ibtracs_ds.valid_t.values
+            for var in IBTRACS_CACHE_VARS:
+                if var == 'time_step':
+                    nodes[var].append(time_step[valid_t])
+                elif var == 'time':
+                    nodes[var].append(ibtracs_ds.time.values[valid_t].astype('datetime64[ns]')
+                                      .astype(np.int64))
+                else:
+                    nodes[var].append(ibtracs_ds[var].values[valid_t])
+            sizes.append(valid_t.sum(axis=1))
+            sid.append(ibtracs_ds.sid.values)
+            name.append(ibtracs_ds.name.values)
+
+    sizes, sid, name = [np.concatenate(arr) for arr in (sizes, sid, name)]
+    if np.any(sizes == 0):
+        LOGGER.warning('No valid timestamps found for %s.',
+                       ', '.join(sid[sizes == 0].astype(str)))
+    # readers never see a partially written file: it is written next to the
+    # final one and renamed once complete
+    tmp_fd, tmp_file = tempfile.mkstemp(suffix='.h5', dir=os.path.dirname(cache_file))
+    os.close(tmp_fd)
+    try:
+        with h5py.File(tmp_file, 'w') as data:
+            data.create_dataset('sid', data=sid[sizes > 0].astype(bytes))
+            data.create_dataset('name', data=name[sizes > 0].astype(bytes))
+            data.create_dataset('offsets',
+                                data=np.concatenate([[0], np.cumsum(sizes[sizes > 0])]))
+            for var, values in nodes.items():
+                values = np.concatenate(values)
+                if values.dtype.kind in 'SO':
+                    values = values.astype(bytes)
+                data.create_dataset(var, data=values, compression='gzip',
+                                    chunks=(min(values.size, 2**16),) if values.size else None)
+        os.replace(tmp_file, cache_file)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+    return cache_file
+
+def _ibtracs_columns(nodes, offsets, sid, name, provider, estimate_missing):
+    """Process the nodes of IBTrACS storms read from the preprocessed file,
+    as read_ibtracs_netcdf does track by track.
+
+    Parameters:
+        nodes (dict(str: np.array)): IBTRACS_CACHE_VARS of all the nodes
+        offsets (np.array): position of the first node of every storm, plus
+            the total number of nodes at the end
+        sid (np.array): storm ids (bytes)
+        name (np.array): storm names (bytes)
+        provider (str): provider, or None
+        estimate_missing (bool): estimate missing values
+
+    Returns:
+        TCColumns
+    """
+    if estimate_missing:
+        nodes['pres'] = _estimate_pressure(nodes['pres'], nodes['lat'], nodes['lon'],
+                                           nodes['wind']).astype(nodes['pres'].dtype)
+        nodes['wind'] = _estimate_vmax(nodes['wind'], nodes['lat'], nodes['lon'],
+                                       nodes['pres']).astype(nodes['wind'].dtype)
+
+    # maximum wind of every storm, including the nodes without pressure
+    max_wind = np.fmax.reduceat(nodes['wind'], offsets[:-1])
+    valid = ~np.isnan(nodes['wind']) & ~np.isnan(nodes['pres'])
+    storm_idx = np.repeat(np.arange(sid.size), np.diff(offsets))
+    sizes = np.bincount(storm_idx[valid], minlength=sid.size)
+    if np.any(sizes == 0):
+        LOGGER.warning('No valid wind/pressure values found for %s.',
+                       ', '.join(sid[sizes == 0].astype(str)))
+    nodes = {var: values[valid] for var, values in nodes.items()}
+    sid, name, max_wind = sid[sizes > 0], name[sizes > 0], max_wind[sizes > 0]
+    offsets = np.concatenate([[0], np.cumsum(sizes[sizes > 0])])
+    first, n_storms = offsets[:-1], sid.size
+
+    time = nodes['time']
+    time[first] = np.floor_divide(time[first], NS_PER_HOUR) * NS_PER_HOUR
+    multi = np.diff(offsets) > 1
+    nodes['time_step'][first[multi]] = (time[first[multi] + 1] - time[first[multi]]) / 1e9
+    # round to seconds, half to even as pandas
+    sec, rest = np.divmod(time, 10**9)
+    sec += (rest > 5 * 10**8) | ((rest == 5 * 10**8) & (sec % 2 == 1))
+    time = (sec * 10**9).astype('datetime64[ns]')
+
+    basins, basin_idx = np.unique(nodes['basin'], return_inverse=True)
+    basin_pres = np.array([BASIN_ENV_PRESSURE.get(basin.decode(), DEF_ENV_PRESSURE)
+                           for basin in basins])
+    for var in ['rmw', 'roci']:
+        nodes[var] = _fill_tracks(_fill_tracks(nodes[var], offsets, 1), offsets, 1,
+                                  backward=True)
+        nodes[var][np.isnan(nodes[var])] = 0
+    nodes['poci'] = _fill_tracks(_fill_tracks(nodes['poci'], offsets, 4), offsets, 4,
+                                 backward=True).astype(float)
+    no_poci = np.isnan(nodes['poci'])
+    nodes['poci'][no_poci] = basin_pres[basin_idx[no_poci]]
+    if estimate_missing:
+        nodes['rmw'][:] = estimate_rmw(nodes['rmw'], nodes['pres'])
+        nodes['roci'][:] = estimate_roci(nodes['roci'], nodes['rmw'])
+        nodes['roci'][:] = np.fmax(nodes['rmw'], nodes['roci'])
+    # ensure environmental pressure >= central pressure
+    nodes['poci'][:] = np.fmax(nodes['poci'], nodes['pres'])
+
+    columns = TCColumns()
+    columns.variables = {
+        'time': time,
+        'lat': nodes['lat'],
+        'lon': nodes['lon'],
+        'time_step': nodes['time_step'],
+        'radius_max_wind': nodes['rmw'],
+        'radius_oci': nodes['roci'],
+        'max_sustained_wind': nodes['wind'],
+        'central_pressure': nodes['pres'],
+        'environmental_pressure': nodes['poci'],
+    }
+    columns.offsets = offsets
+    category = np.searchsorted(SAFFIR_SIM_CAT, max_wind, side='right') - 1
+    category[category == len(SAFFIR_SIM_CAT) - 1] = -1
+    columns.attrs = pd.DataFrame({
+        'max_sustained_wind_unit': 'kn',
+        'central_pressure_unit': 'mb',
+        'name': name.astype(str),
+        'sid': sid.astype(str),
+        'orig_event_flag': np.ones(n_storms, bool),
+        'data_provider': provider if provider else 'ibtracs',
+        'basin': nodes['basin'][first].astype(str),
+        'id_no': np.char.replace(np.char.replace(sid, b'N', b'0'), b'S', b'1').astype(float),
+        'category': category,
+    })
+    return columns
+
+def _fill_tracks(values, offsets, limit, backward=False):
+    """Fill nan values of every track with the last (or next) valid value of
+    the same track, at most limit nodes away, as xarray ffill (or bfill).
+
+    Parameters:
+        values (np.array): values of the nodes of all the tracks
+        offsets (np.array): position of the first node of every track, plus
+            the total number of nodes at the end
+        limit (int): maximum number of nodes filled after a valid one
+        backward (bool, optional): fill with the next valid value. Default: False
+
+    Returns:
+        np.array
+    """
+    if backward:
+        return _fill_tracks(values[::-1], offsets[-1] - offsets[::-1], limit)[::-1]
+    pos = np.arange(values.size)
+    last = np.where(np.isnan(values), -1, pos)
+    np.maximum.accumulate(last, out=last)
+    start = np.repeat(offsets[:-1], np.diff(offsets))
+    fill = np.isnan(values) & (last >= start) & (pos - last <= limit)
+    values = values.copy()
+    values[fill] = values[last[fill]]
+    return values
+
 def _change_max_wind_unit(wind, unit_orig, unit_dest):
     """Compute maximum wind speed in unit_dest
 
@@ -25,12 +25,14 @@ import logging
 import matplotlib.cm as cm_mp
 from matplotlib.lines import Line2D
 import matplotlib.pyplot as plt
-from numba import jit
+from numba import jit, prange
 import numpy as np
+import pandas as pd
 
 from climada.util.config import CONFIG
 import climada.util.coordinates
 import climada.hazard.tc_tracks
+import climada.hazard.tc_columns
 
 LOGGER = logging.getLogger(__name__)
 
@@ -41,7 +43,8 @@ def calc_random_walk(tracks,
                      ens_amp=0.1,
                      max_angle=np.pi / 10,
                      seed=CONFIG['trop_cyclone']['random_seed'],
-                     decay=True):
+                     decay=True,
+                     batch=False):
     """
     Generate synthetic tracks based on directed random walk. An ensemble of
     tracks is computed for every track contained.
@@ -79,6 +82,13 @@ def calc_random_walk(tracks,
             Default: configuration file
         decay (bool, optional): compute land decay in probabilistic tracks.
             Default: True
+        batch (bool, optional): generate the ensembles of all the tracks at
+            once in tracks.columns with calc_random_walk_columns, without
+            building xarray objects. The land decay is then computed for all
+            the tracks at once as well, with the land raster (see
+            `climada.util.coordinates.coord_on_land`). The random numbers
+            differ from the ones of the track by track computation.
+            Default: False
     """
     LOGGER.info('Computing %s synthetic tracks.', ens_size * tracks.size)
 
@@ -88,6 +98,43 @@ def calc_random_walk(tracks,
     if seed >= 0:
         np.random.seed(seed)
 
+    if batch:
+        tracks.columns = calc_random_walk_columns(tracks.columns, ens_size,
+                                                  ens_amp0, ens_amp, max_angle,
+                                                  seed)
+    else:
+        _calc_random_walk_data(tracks, ens_size, ens_amp0, ens_amp, max_angle)
+
+    if decay:
+        if batch:
+            hist_tracks = tracks.columns.attrs.orig_event_flag.values.astype(bool)
+        else:
+            hist_tracks = [track for track in tracks.data if track.orig_event_flag]
+        if np.any(hist_tracks):
+            try:
+                if batch:
+                    tracks.columns.set_land_params(gridded=True)
+                    v_rel, p_rel = _calc_land_decay_columns(tracks.columns)
+                    _apply_land_decay_columns(tracks.columns, v_rel, p_rel)
+                else:
+                    extent = tracks.get_extent()
+                    land_geom = climada.util.coordinates.get_land_geometry(
+                        extent=extent, resolution=10
+                    )
+                    v_rel, p_rel = _calc_land_decay(hist_tracks, land_geom,
+                                                    pool=tracks.pool)
+                    tracks.data = _apply_land_decay(tracks.data, v_rel, p_rel,
+                                                    land_geom, pool=tracks.pool)
+            except ValueError:
+                LOGGER.info('No land decay coefficients could be applied.')
+        else:
+            LOGGER.error('No historical tracks contained. '
+                         'Historical tracks are needed for land decay.')
+
+
+def _calc_random_walk_data(tracks, ens_size, ens_amp0, ens_amp, max_angle):
+    """Generate the ensembles track by track in tracks.data, drawing from
+    the global random number generator."""
     random_vec = [np.random.uniform(size=ens_size * (2 + track.time.size))
                   for track in tracks.data]
 
@@ -106,23 +153,104 @@ def calc_random_walk(tracks,
 
     tracks.data = sum(new_ens, [])
 
-    if decay:
-        hist_tracks = [track for track in tracks.data if track.orig_event_flag]
-        if hist_tracks:
-            try:
-                extent = tracks.get_extent()
-                land_geom = climada.util.coordinates.get_land_geometry(
-                    extent=extent, resolution=10
-                )
-                v_rel, p_rel = _calc_land_decay(hist_tracks, land_geom,
-                                                pool=tracks.pool)
-                tracks.data = _apply_land_decay(tracks.data, v_rel, p_rel,
-                                                land_geom, pool=tracks.pool)
-            except ValueError:
-                LOGGER.info('No land decay coefficients could be applied.')
-        else:
-            LOGGER.error('No historical tracks contained. '
-                         'Historical tracks are needed for land decay.')
+
+def calc_random_walk_columns(columns,
+                             ens_size=9,
+                             ens_amp0=1.5,
+                             ens_amp=0.1,
+                             max_angle=np.pi / 10,
+                             seed=CONFIG['trop_cyclone']['random_seed']):
+    """
+    Generate synthetic tracks based on directed random walk for all the tracks
+    at once. Same random walk as calc_random_walk, computed on the columns of
+    the tracks in one compiled kernel.
+
+    Every track draws its random numbers from its own generator, spawned from
+    seed, so that the result only depends on the seed and the position of the
+    track, not on the number of threads.
+
+    Parameters:
+        columns (TCColumns): tracks, see `climada.hazard.tc_columns`
+        ens_size (int, optional): number of ensemble members per track.
+            Default 9.
+        ens_amp0 (float, optional): amplitude of max random starting point
+            shift in decimal degree (longitude and latitude). Default: 1.5
+        ens_amp (float, optional): amplitude of random walk wiggles in
+            decimal degree (longitude and latitude). Default: 0.1
+        max_angle (float, optional): maximum angle of variation. Default: pi/10.
+        seed (int, optional): random number generator seed for replicability
+            of random walk. Put negative value if you don't want to use it.
+            Default: configuration file
+
+    Returns:
+        TCColumns: every track followed by its ens_size synthetic tracks
+    """
+    sizes = columns.track_sizes
+    rnd_offsets = np.zeros(columns.size + 1, int)
+    rnd_offsets[1:] = np.cumsum(ens_size * (2 + sizes))
+    rnd_vec = np.empty(rnd_offsets[-1])
+    seed_seq = np.random.SeedSequence(seed if seed >= 0 else None)
+    for i_track, child in enumerate(seed_seq.spawn(columns.size)):
+        np.random.default_rng(child).random(
+            out=rnd_vec[rnd_offsets[i_track]:rnd_offsets[i_track + 1]])
+
+    # every track repeated ens_size + 1 times
+    ens_track = np.repeat(np.arange(columns.size), ens_size + 1)
+    ens_sizes = sizes[ens_track]
+    out = climada.hazard.tc_columns.TCColumns()
+    out.offsets = np.zeros(ens_track.size + 1, int)
+    out.offsets[1:] = np.cumsum(ens_sizes)
+    node_idx = np.arange(out.offsets[-1]) + \
+        np.repeat(columns.offsets[ens_track] - out.offsets[:-1], ens_sizes)
+    out.variables = {name: values[node_idx] for name, values in columns.variables.items()}
+    _rnd_walk_kernel(columns.variables['lat'], columns.variables['lon'],
+                     columns.offsets, rnd_vec, rnd_offsets, ens_size,
+                     ens_amp0, ens_amp, max_angle, out.variables['lat'],
+                     out.variables['lon'])
+
+    i_ens = np.tile(np.arange(ens_size + 1), columns.size)
+    gen = i_ens > 0
+    suffix = '_gen' + pd.Series(i_ens[gen]).astype(str).values
+    out.attrs = columns.attrs.iloc[ens_track].reset_index(drop=True)
+    out.attrs.loc[gen, 'orig_event_flag'] = False
+    out.attrs.loc[gen, 'name'] = out.attrs.name[gen] + suffix
+    out.attrs.loc[gen, 'sid'] = out.attrs.sid[gen] + suffix
+    out.attrs['id_no'] = out.attrs.id_no + i_ens / 100
+    out.var_attrs = {name: dict(attrs) for name, attrs in columns.var_attrs.items()}
+    return out
+
+
+@jit(nopython=True, parallel=True)
+def _rnd_walk_kernel(lat, lon, offsets, rnd_vec, rnd_offsets, ens_size,
+                     ens_amp0, ens_amp, max_angle, out_lat, out_lon):
+    """Fill coordinates of the synthetic tracks in out_lat and out_lon,
+    where the ens_size + 1 copies of track i start at node
+    offsets[i] * (ens_size + 1). Same computation as _one_rnd_walk."""
+    for i_track in prange(offsets.size - 1):
+        first = offsets[i_track]
+        n_dat = offsets[i_track + 1] - first
+        if n_dat == 0:
+            continue
+        rnd = rnd_vec[rnd_offsets[i_track]:rnd_offsets[i_track + 1]]
+        # change sign of latitude change for southern hemishpere:
+        sign = np.sign(lat[first])
+        tmp_ang, coord_x, coord_y = 0.0, 0.0, 0.0
+        for i_ens in range(ens_size):
+            x_ini = ens_amp0 * (rnd[i_ens] - 0.5)
+            y_ini = ens_amp0 * (rnd[ens_size + i_ens] - 0.5)
+            out_first = first * (ens_size + 1) + (i_ens + 1) * n_dat
+            coord_x0, coord_y0 = 0.0, 0.0
+            for i_node in range(n_dat):
+                tmp_ang += 2 * max_angle * rnd[2 * ens_size + i_ens * n_dat + i_node] \
+                    - max_angle
+                coord_x += ens_amp * np.sin(tmp_ang)
+                coord_y += ens_amp * np.cos(tmp_ang)
+                if i_node == 0:
+                    coord_x0, coord_y0 = coord_x, coord_y
+                out_lon[out_first + i_node] = lon[first + i_node] \
+                    + sign * (coord_x - coord_x0) + x_ini
+                out_lat[out_first + i_node] = lat[first + i_node] \
+                    + sign * (coord_y - coord_y0) + y_ini
 
 
 @jit(parallel=True)
@@ -261,6 +389,170 @@ def _apply_land_decay(tracks, v_rel, p_rel, land_geom, s_rel=True,
     return tracks
 
 
+def _calc_land_decay_columns(columns, s_rel=True):
+    """Compute wind and pressure decay coefficients from the historical tracks
+    of columns, as _calc_land_decay but for all the tracks at once. The land
+    parameters of the columns need to be set (see TCColumns.set_land_params).
+
+    Parameters:
+        columns (TCColumns): tracks with on_land and dist_since_lf
+        s_rel (bool, optional): use environmental presure to calc S value
+            (true) or central presure (false)
+
+    Returns:
+        v_rel (dict(category: A)), p_rel (dict(category: (S, B)))
+    """
+    hist = columns.attrs.orig_event_flag.values.astype(bool)
+    start, end, _, _ = _landfall_runs_columns(columns, hist)
+    wind = columns.variables['max_sustained_wind']
+    pres = columns.variables['central_pressure']
+    ss_scale = _landfall_category(wind[start - 1])
+    valid = ss_scale > 0
+    start, end, ss_scale = start[valid], end[valid], ss_scale[valid]
+    node_idx, node_run = _run_nodes(start, end)
+
+    v_landfall = wind[start - 1][node_run]
+    v_land = np.divide(wind[node_idx], v_landfall, out=wind[node_idx].astype(float),
+                       where=v_landfall > 0)
+    p_land = pres[node_idx] / pres[start - 1][node_run]
+    p_ref = columns.variables['environmental_pressure'] if s_rel else pres
+    p_land_s = (p_ref[end - 1] / pres[start - 1])[node_run]
+    x_land = columns.variables['dist_since_lf'][node_idx]
+
+    v_lf, p_lf, x_val = dict(), dict(), dict()
+    node_scale = ss_scale[node_run]
+    # categories in order of first landfall, as track by track
+    scales, first_run = np.unique(ss_scale, return_index=True)
+    for scale in scales[np.argsort(first_run)]:
+        msk = node_scale == scale
+        v_lf[int(scale)] = v_land[msk].astype(np.float32)
+        p_lf[int(scale)] = (p_land_s[msk].astype(np.float32), p_land[msk].astype(np.float32))
+        x_val[int(scale)] = x_land[msk].astype(np.float32)
+    return _decay_calc_coeff(x_val, v_lf, p_lf)
+
+
+def _apply_land_decay_columns(columns, v_rel, p_rel, s_rel=True):
+    """Compute wind and pressure decay due to landfall in the synthetic tracks
+    of columns, as _apply_land_decay but for all the tracks at once: the n-th
+    landfall of all the tracks is computed in the n-th iteration. The land
+    parameters of the columns need to be set (see TCColumns.set_land_params).
+    The columns are modified in place.
+
+    Parameters:
+        columns (TCColumns): tracks with on_land and dist_since_lf
+        v_rel (dict): {category: A}, where wind decay = exp(-x*A)
+        p_rel (dict): (category: (S, B)}, where pressure decay
+            = S-(S-1)*exp(-x*B)
+        s_rel (bool, optional): use environmental presure to calc S value
+            (true) or central presure (false)
+    """
+    syn = ~columns.attrs.orig_event_flag.values.astype(bool)
+    if not np.any(syn):
+        LOGGER.error('No synthetic tracks contained. Synthetic tracks'
+                     ' are needed.')
+        raise ValueError
+
+    if not v_rel or not p_rel:
+        LOGGER.info('No decay coefficients.')
+        return
+
+    lf_start, lf_end, lf_track, lf_rank = _landfall_runs_columns(columns, syn)
+    n_lf = np.bincount(lf_track, minlength=columns.size)
+    wind = columns.variables['max_sustained_wind'].astype(float)
+    pres = columns.variables['central_pressure'].astype(float)
+    p_ref = columns.variables['environmental_pressure'] if s_rel else pres
+    dist = columns.variables['dist_since_lf']
+    n_scale = len(climada.hazard.tc_tracks.SAFFIR_SIM_CAT)
+    v_coef = np.array([v_rel.get(scale, np.nan) for scale in range(n_scale + 1)])
+    p_coef = np.array([p_rel[scale][1] if scale in p_rel else np.nan
+                       for scale in range(n_scale + 1)])
+
+    for rank in range(lf_rank.max() + 1 if lf_rank.size else 0):
+        runs = np.flatnonzero(lf_rank == rank)
+        start, end = lf_start[runs], lf_end[runs]
+        ss_scale = _landfall_category(wind[start - 1])
+        valid = (ss_scale > 0) & (end - start > 1)
+        runs, start, end, ss_scale = runs[valid], start[valid], end[valid], ss_scale[valid]
+        v_landfall, p_landfall = wind[start - 1], pres[start - 1]
+        node_idx, node_run = _run_nodes(start, end)
+
+        p_decay = _decay_p_function((p_ref[end - 1] / p_landfall)[node_run],
+                                    p_coef[ss_scale][node_run], dist[node_idx])
+        # dont applay decay if it would decrease central pressure
+        no_decay = p_decay < 1
+        p_decay[no_decay] = pres[node_idx][no_decay] / p_landfall[node_run][no_decay]
+        pres[node_idx] = p_landfall[node_run] * p_decay
+
+        v_decay = _decay_v_function(v_coef[ss_scale][node_run], dist[node_idx])
+        # dont applay decay if it would increas wind speeds
+        no_decay = v_decay > 1
+        v_decay[no_decay] = wind[node_idx][no_decay] / v_landfall[node_run][no_decay]
+        wind[node_idx] = v_landfall[node_run] * v_decay
+
+        # correct values of sea between two landfalls
+        runs = runs[rank + 1 < n_lf[lf_track[runs]]]
+        sea_start, sea_end = lf_end[runs], lf_start[runs + 1]
+        rndn = 0.1 * (np.abs(np.random.normal(size=runs.size) * 5) + 6)
+        node_idx, node_run = _run_nodes(sea_start, sea_end)
+        r_diff = pres[sea_start] - pres[sea_start - 1] + rndn
+        pres[node_idx] -= r_diff[node_run]
+        rndn = rndn * 10  # mean value 10
+        r_diff = wind[sea_start] - wind[sea_start - 1] - rndn
+        wind[node_idx] -= r_diff[node_run]
+
+    # correct limits of the tracks with landfall
+    decayed = n_lf > 0
+    node_decayed = decayed[columns.track_idx]
+    env_pres = columns.variables['environmental_pressure']
+    with np.errstate(invalid='ignore'):
+        cor_p = node_decayed & (pres > env_pres)
+        pres[cor_p] = env_pres[cor_p]
+        wind[node_decayed & (wind < 0)] = 0
+    columns.variables['max_sustained_wind'] = wind
+    columns.variables['central_pressure'] = pres
+    columns.attrs.loc[decayed, 'category'] = columns.get_category()[decayed]
+
+
+def _landfall_runs_columns(columns, sel):
+    """Landfalls of the selected tracks of columns which start at sea.
+
+    Parameters:
+        columns (TCColumns): tracks with on_land
+        sel (np.array(bool)): selected tracks
+
+    Returns:
+        start (np.array): first node on land of every landfall, sorted
+        end (np.array): first node on sea after start, or end of the track
+        track (np.array): track of every landfall
+        rank (np.array): position of every landfall in its track
+    """
+    _, start, end = climada.hazard.tc_tracks._landfall_runs(
+        columns.variables['on_land'].astype(bool), columns.offsets)
+    track = columns.track_idx[start]
+    start, end, track = start[sel[track]], end[sel[track]], track[sel[track]]
+    rank = np.arange(start.size) - np.searchsorted(track, track)
+    return start, end, track, rank
+
+
+def _landfall_category(v_landfall):
+    """Saffir-Simpson scale index (1 to len(SAFFIR_SIM_CAT)) of the wind at
+    landfall, as in _decay_values. 0 where the wind is above all the
+    thresholds or nan."""
+    scale_thresholds = climada.hazard.tc_tracks.SAFFIR_SIM_CAT
+    ss_scale = np.searchsorted(scale_thresholds, v_landfall, side='right') + 1
+    ss_scale[ss_scale > len(scale_thresholds)] = 0
+    return ss_scale
+
+
+def _run_nodes(start, end):
+    """Positions of the nodes of every range start[i]:end[i], and index i of
+    the range of every node."""
+    sizes = end - start
+    node_run = np.repeat(np.arange(start.size), sizes)
+    node_idx = np.arange(sizes.sum()) + np.repeat(start - np.cumsum(sizes) + sizes, sizes)
+    return node_idx, node_run
+
+
 def _decay_values(track, land_geom, s_rel):
     """Compute wind and pressure relative to landafall values.
 
@@ -30,6 +30,7 @@ from climada.hazard.centroids.centr import Centroids
 import climada.util.dates_times as u_dt
 from climada.util.constants import HAZ_TEMPLATE_XLS, HAZ_DEMO_FL
 from climada.util.coordinates import equal_crs
+from climada.util.config import CONFIG
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 HAZ_TEST_MAT = os.path.join(DATA_DIR, 'atl_prob_no_name.mat')
@@ -496,6 +497,25 @@ class TestAppend(unittest.TestCase):
         self.assertEqual(haz1.tag.haz_type, haz1_orig.tag.haz_type)
         self.assertEqual(haz1.tag.description, haz1_orig.tag.description)
 
+    def test_append_to_empty_copy(self):
+        """Append to an empty hazard: modifying the result in place leaves
+        the appended hazard unchanged."""
+        haz1 = Hazard('TC')
+        haz2 = dummy_hazard()
+        intensity = haz2.intensity.toarray()
+        haz1.append(haz2)
+        haz1.intensity.data[:] = 0
+        haz1.frequency[:] = 0
+        haz1.centroids.lat[:] = 0
+        self.assertTrue(np.array_equal(haz2.intensity.toarray(), intensity))
+        self.assertTrue(np.all(haz2.frequency > 0))
+        self.assertTrue(np.any(haz2.centroids.lat != 0))
+
+        haz3 = Hazard('TC')
+        haz3.concatenate([haz2])
+        haz3.centroids.lat[:] = 0
+        self.assertTrue(np.any(haz2.centroids.lat != 0))
+
     def test_same_centroids_extend(self):
         """Append hazard with same centroids, different events."""
         haz1 = dummy_hazard()
@@ -979,6 +999,34 @@ class TestHDF5(unittest.TestCase):
             self.assertTrue(np.array_equal(hazard.fraction.toarray(), haz_read.fraction.toarray()))
             self.assertIsInstance(haz_read.fraction, sparse.csr_matrix)
 
+    def test_write_read_compact_pass(self):
+        """Read and write a hazard with the compact dtype profile."""
+        file_name = os.path.join(DATA_DIR, 'test_haz.h5')
+
+        hazard = Hazard('TC')
+        hazard.read_mat(HAZ_TEST_MAT)
+        hazard.event_name = list(map(str, hazard.event_name))
+        CONFIG['global']['dtype_profile'] = 'compact'
+        try:
+            hazard.write_hdf5(file_name)
+            haz_read = Hazard('TC')
+            haz_read.read_hdf5(file_name)
+        finally:
+            CONFIG['global']['dtype_profile'] = 'default'
+
+        self.assertEqual(hazard.intensity.dtype, np.float64)
+        self.assertEqual(haz_read.intensity.dtype, np.float32)
+        self.assertEqual(haz_read.intensity.indices.dtype, np.int32)
+        self.assertEqual(haz_read.fraction.dtype, np.float32)
+        self.assertEqual(haz_read.event_id.dtype, np.int32)
+        self.assertEqual(haz_read.date.dtype, np.int32)
+        self.assertEqual(haz_read.centroids.lat.dtype, np.float64)
+        self.assertTrue(np.array_equal(hazard.event_id, haz_read.event_id))
+        self.assertTrue(np.array_equal(hazard.date, haz_read.date))
+        self.assertTrue(np.allclose(hazard.intensity.toarray(),
+                                    haz_read.intensity.toarray(), rtol=1e-6))
+        self.assertTrue(np.array_equal(hazard.centroids.coord, haz_read.centroids.coord))
+
 class TestCentroids(unittest.TestCase):
     """Test return period statistics"""
 
@@ -0,0 +1,301 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Test tc_columns module.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import h5py
+import numpy as np
+import pandas as pd
+from scipy.interpolate import interp1d
+from shapely.geometry import box, MultiPolygon
+
+import climada.hazard.tc_tracks as tc
+from climada.hazard.tc_columns import TCColumns, _h5_append, _h5_values
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+TEST_TRACK = os.path.join(DATA_DIR, "trac_brb_test.csv")
+TEST_TRACK_SHORT = os.path.join(DATA_DIR, "trac_short_test.csv")
+
+class TestColumns(unittest.TestCase):
+    """Test columnar tracks"""
+
+    def test_set_to_datasets_pass(self):
+        """Test conversion from and to list of xr.Dataset."""
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT])
+        tracks = tc_track.data
+
+        columns = TCColumns()
+        columns.set_from_datasets(tracks)
+        self.assertEqual(columns.size, 2)
+        self.assertEqual(columns.offsets.tolist(), [0, tracks[0].time.size,
+                                                    tracks[0].time.size + tracks[1].time.size])
+        self.assertTrue(np.array_equal(columns.track_idx,
+                                       np.repeat([0, 1], columns.track_sizes)))
+        self.assertEqual(columns.attrs.sid.tolist(), [track.sid for track in tracks])
+
+        for track, track_col in zip(tracks, columns.to_datasets()):
+            self.assertEqual(set(track.variables), set(track_col.variables))
+            self.assertEqual(set(track.coords), set(track_col.coords))
+            for name in track.variables:
+                self.assertTrue(np.array_equal(track[name].values, track_col[name].values))
+            self.assertTrue(pd.Series(track.attrs).equals(pd.Series(track_col.attrs)))
+            self.assertIsInstance(track_col.orig_event_flag, bool)
+
+        # datasets are views of the columns
+        track_col = columns.get_dataset(1)
+        self.assertTrue(np.shares_memory(track_col.lat.values, columns.variables['lat']))
+
+        tracks[1] = tracks[1].drop('time_step')
+        with self.assertLogs('climada.hazard.tc_columns', level='ERROR') as cm:
+            with self.assertRaises(ValueError):
+                columns.set_from_datasets(tracks)
+        self.assertIn('variables', cm.output[0])
+
+    def test_select_append_pass(self):
+        """Test select and append."""
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT, TEST_TRACK])
+        tracks = tc_track.data
+        columns = TCColumns()
+        columns.set_from_datasets(tracks)
+
+        sel = columns.select(np.array([False, True, True]))
+        self.assertEqual(sel.size, 2)
+        self.assertEqual(sel.attrs.index.tolist(), [0, 1])
+        for track, track_col in zip(tracks[1:], sel.to_datasets()):
+            self.assertTrue(np.array_equal(track.max_sustained_wind.values,
+                                           track_col.max_sustained_wind.values))
+            self.assertTrue(np.array_equal(track.time.values, track_col.time.values))
+
+        sel.append(columns.select([0]))
+        self.assertEqual(sel.size, 3)
+        self.assertEqual(sel.attrs.sid.tolist(), [tracks[1].sid, tracks[2].sid, tracks[0].sid])
+        self.assertTrue(np.array_equal(sel.get_dataset(2).lon.values, tracks[0].lon.values))
+
+        empty = TCColumns()
+        empty.append(sel)
+        self.assertEqual(empty.size, 3)
+
+    def test_equal_timestep_pass(self):
+        """Test interpolation of all the tracks at once."""
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT])
+        tracks = tc_track.data
+        # unaligned times, single node track
+        tracks[1] = tracks[1].assign_coords(time=tracks[1].time + np.timedelta64(20, 'm'))
+        tracks.append(tracks[0].isel(time=[3]))
+        columns = TCColumns()
+        columns.set_from_datasets(tracks)
+
+        with self.assertLogs('climada.hazard.tc_columns', level='WARNING') as cm:
+            new_col = columns.equal_timestep(time_step_h=2)
+        self.assertIn('Not enough elements', cm.output[0])
+        new_tracks = new_col.to_datasets()
+
+        self.assertEqual(new_tracks[0].time.size, 112)
+        self.assertTrue(np.all(np.diff(new_tracks[0].time.values) == np.timedelta64(2, 'h')))
+        self.assertTrue(np.all(new_tracks[0].time_step.values == 2))
+        self.assertEqual(new_tracks[0].lat.values[0], tracks[0].lat.values[0])
+        self.assertEqual(new_tracks[0].max_sustained_wind.values[3],
+                         tracks[0].max_sustained_wind.values[1])
+        self.assertEqual(new_tracks[0].category, tracks[0].category)
+
+        # first time floored to the time step: outside of the track
+        self.assertEqual(new_tracks[1].time.values[0], tracks[1].time.values[0]
+                         - np.timedelta64(20, 'm'))
+        self.assertTrue(np.isnan(new_tracks[1].max_sustained_wind.values[0]))
+        self.assertTrue(np.isnan(new_tracks[1].lat.values[0]))
+        self.assertAlmostEqual(new_tracks[1].central_pressure.values[1], np.interp(
+            new_tracks[1].time.values[1].astype(float), tracks[1].time.values.astype(float),
+            tracks[1].central_pressure.values))
+
+        self.assertEqual(new_tracks[2].time.size, 1)
+        self.assertEqual(new_tracks[2].time_step.values[0], tracks[2].time_step.values[0])
+
+    def test_equal_timestep_spline_pass(self):
+        """Test quadratic and cubic interpolation of lat and lon of all the tracks."""
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT])
+        tracks = tc_track.data
+        tracks.append(tracks[0].isel(time=[3, 4, 6]))
+        tracks.append(tracks[0].isel(time=[3, 4, 6, 7]))
+        tracks[1] = tracks[1].assign_coords(time=tracks[1].time + np.timedelta64(20, 'm'))
+        tracks[1]['lat'].values[3] = np.nan
+        columns = TCColumns()
+        columns.set_from_datasets(tracks)
+        new_tracks = columns.equal_timestep(time_step_h=1).to_datasets()
+
+        for track, new_track in zip(tracks, new_tracks):
+            x_old = track.time.values.astype(float)
+            x_new = new_track.time.values.astype(float)
+            for var in ['lat', 'lon']:
+                np.testing.assert_allclose(new_track[var].values, interp1d(
+                    x_old, track[var].values, kind=['quadratic', 'cubic'][min(1, x_old.size - 3)],
+                    fill_value=np.nan, bounds_error=False)(x_new), rtol=1e-10)
+        self.assertTrue(np.all(np.isnan(new_tracks[1].lat.values)))
+        self.assertFalse(np.any(np.isnan(new_tracks[1].lon.values[1:])))
+
+    def test_set_land_params_pass(self):
+        """Test land parameters of all the tracks at once."""
+        land_geom = MultiPolygon([box(-62, 13, -57, 15), box(-30, 11, -26, 13)])
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT, TEST_TRACK])
+        tracks = tc_track.data
+        # starting on land
+        tracks[2] = tracks[2].isel(time=slice(22, None))
+        columns = TCColumns()
+        columns.set_from_datasets(tracks)
+        columns.set_land_params(land_geom)
+
+        for track, track_col in zip(tracks, columns.to_datasets()):
+            tc.track_land_params(track, land_geom)
+            self.assertTrue(np.array_equal(track.on_land.values, track_col.on_land.values))
+            self.assertTrue(np.allclose(track.dist_since_lf.values,
+                                        track_col.dist_since_lf.values, equal_nan=True))
+        self.assertTrue(tracks[2].on_land.values[0])
+        dist_on_land = tracks[1].dist_since_lf.values[tracks[1].on_land.values]
+        self.assertEqual(dist_on_land.size, 4)
+        self.assertTrue(np.all(np.diff(dist_on_land) > 0))
+
+    def test_tctracks_columns_pass(self):
+        """Test TCTracks switching between data and columns."""
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT])
+        bounds = tc_track.get_bounds()
+        sid = 'short'
+        tc_track.data[1].attrs['sid'] = sid
+
+        tracks = tc_track.data
+        tracks[0].max_sustained_wind.attrs['units'] = 'kn'
+        self.assertEqual(tc_track.columns.size, 2)
+        self.assertIs(tc_track.data, tracks)
+        self.assertEqual(tc_track.size, 2)
+        self.assertEqual(tc_track.get_bounds(), bounds)
+        self.assertEqual(tc_track.subset({'sid': sid}).columns.attrs.sid.tolist(), [sid])
+        self.assertEqual(tc_track.subset({'sid': sid}).size, 1)
+
+        # columns as reference until data is accessed
+        tc_track.columns = tc_track.columns
+        self.assertEqual(tc_track.subset({'sid': sid}).columns.attrs.sid.tolist(), [sid])
+        tc_track.append(tc_track.columns.select([0]))
+        self.assertEqual(tc_track.size, 3)
+        self.assertEqual(len(tc_track.data), 3)
+        self.assertIsNone(tc_track._columns)
+        self.assertEqual(tc_track.data[1].sid, sid)
+        self.assertEqual(tc_track.data[2].max_sustained_wind.attrs, {'units': 'kn'})
+
+        # tracks held as data: appended columns become datasets
+        tc_track.append(tc_track.columns.select([1]))
+        self.assertEqual(tc_track.size, 4)
+        self.assertEqual(tc_track.data[3].sid, sid)
+        self.assertEqual(len(tracks), 2)
+
+    def test_append_copy_pass(self):
+        """Test that columns appended to empty ones are copied."""
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv(TEST_TRACK)
+        columns = tc_track.columns
+        appended = TCColumns()
+        appended.append(columns)
+        appended.variables['lat'][:] = 0
+        appended.attrs['sid'] = 'other'
+        self.assertTrue(np.array_equal(columns.variables['lat'],
+                                       tc_track.data[0].lat.values))
+        self.assertEqual(columns.attrs.sid[0], tc_track.data[0].sid)
+
+class TestHDF5(unittest.TestCase):
+    """Test single file storage of columnar tracks"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_write_read_append_pass(self):
+        """Test write, append and read all or some tracks."""
+        file_name = os.path.join(self.tmp_dir, 'tracks.h5')
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT, TEST_TRACK])
+        tracks = tc_track.data
+        for track, basin in zip(tracks, ['NA', 'EP', 'NA']):
+            track.attrs['basin'] = basin
+        tracks[1].attrs['sid'] = 'short'
+        tracks[2] = tracks[2].assign_coords(time=tracks[2].time + np.timedelta64(3650, 'D'))
+        tracks[2].attrs['sid'] = 'later'
+        tracks[2].attrs['orig_event_flag'] = False
+
+        tc_track.data = tracks[:2]
+        tc_track.write_hdf5(file_name)
+        tc_track.data = tracks[2:]
+        tc_track.write_hdf5(file_name, append=True)
+
+        tc_read = tc.TCTracks()
+        tc_read.read_hdf5(file_name)
+        self.assertEqual(tc_read.size, 3)
+        for track, track_read in zip(tracks, tc_read.data):
+            self.assertEqual(set(track.variables), set(track_read.variables))
+            for name in track.variables:
+                self.assertTrue(np.array_equal(track[name].values, track_read[name].values))
+            self.assertEqual(track.attrs, track_read.attrs)
+            self.assertIsInstance(track_read.orig_event_flag, bool)
+        self.assertEqual(tc_read.columns.variables['time'].dtype, np.dtype('datetime64[ns]'))
+
+        tc_read.read_hdf5(file_name, basin='NA')
+        self.assertEqual(tc_read.columns.attrs.sid.tolist(), [tracks[0].sid, 'later'])
+        tc_read.read_hdf5(file_name, basin='NA', year_range=(1900, 1960))
+        self.assertEqual(tc_read.columns.attrs.sid.tolist(), [tracks[0].sid])
+        tc_read.read_hdf5(file_name, storm_id=['short', 'later'])
+        self.assertEqual(tc_read.size, 2)
+        self.assertTrue(np.array_equal(tc_read.data[0].lat.values, tracks[1].lat.values))
+        self.assertTrue(np.array_equal(tc_read.data[1].time.values, tracks[2].time.values))
+        tc_read.read_hdf5(file_name, storm_id='none')
+        self.assertEqual(tc_read.size, 0)
+
+        tc_track.data = [tracks[0].drop('time_step')]
+        with self.assertLogs('climada.hazard.tc_columns', level='ERROR') as cm:
+            with self.assertRaises(ValueError):
+                tc_track.write_hdf5(file_name, append=True)
+        self.assertIn('variables', cm.output[0])
+
+    def test_h5_values_pass(self):
+        """Test partial read of datasets over several chunks."""
+        file_name = os.path.join(self.tmp_dir, 'values.h5')
+        values = np.arange(300000, dtype=float)
+        idx = np.array([2, 5, 70000, 70001, 200000, 299999])
+        with h5py.File(file_name, 'w') as hf_data:
+            _h5_append(hf_data, 'val', values[:1000])
+            _h5_append(hf_data, 'val', values[1000:])
+            _h5_append(hf_data, 'name', values[:10].astype(str).astype(object))
+        with h5py.File(file_name, 'r') as hf_data:
+            self.assertTrue(np.array_equal(_h5_values(hf_data['val']), values))
+            self.assertTrue(np.array_equal(_h5_values(hf_data['val'], idx), idx))
+            self.assertEqual(_h5_values(hf_data['name'], idx[:2]).tolist(), ['2.0', '5.0'])
+            self.assertEqual(_h5_values(hf_data['val'], idx[:0]).size, 0)
+
+# Execute Tests
+if __name__ == "__main__":
+    TESTS = unittest.TestLoader().loadTestsFromTestCase(TestColumns)
+    TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestHDF5))
+    unittest.TextTestRunner(verbosity=2).run(TESTS)
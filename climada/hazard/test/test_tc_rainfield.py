@@ -26,7 +26,9 @@ from scipy import sparse
 import datetime as dt
 
 from climada.hazard.tc_tracks import TCTracks
-from climada.hazard.tc_rainfield import TCRain, rainfield_from_track
+from climada.hazard.tc_rainfield import TCRain, rainfield_from_track, centroids_index, \
+wind_rain_from_tracks
+from climada.hazard.trop_cyclone import TropCyclone
 from climada.hazard.centroids.centr import Centroids
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
@@ -132,6 +134,53 @@ class TestReader(unittest.TestCase):
         self.assertEqual(tc_haz.fraction.nonzero()[0].size, 0)
         self.assertEqual(tc_haz.intensity.nonzero()[0].size, 0)
 
+    def test_wind_rain_pass(self):
+        """Test wind and rain of the same tracks in one pass."""
+        tc_track = TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT])
+        tc_track.equal_timestep()
+        tc_track.data[1].attrs['sid'] = 'short'
+        tc_wind, tc_rain = wind_rain_from_tracks(tc_track, CENTR_TEST_BRB,
+                                                 description='both')
+        tc_wind.check()
+        tc_rain.check()
+
+        self.assertIsInstance(tc_wind, TropCyclone)
+        self.assertIsInstance(tc_rain, TCRain)
+        self.assertEqual(tc_rain.tag.file_name, ['IBTrACS: 1951239N12334'] * 2)
+        self.assertEqual(tc_wind.tag.file_name, ['Name: 1951239N12334'] * 2)
+        self.assertEqual(tc_rain.tag.description, 'both')
+        self.assertEqual((tc_wind.units, tc_rain.units), ('m/s', 'mm'))
+        for var in ['event_id', 'date', 'frequency', 'orig', 'category']:
+            self.assertTrue(np.array_equal(getattr(tc_wind, var), getattr(tc_rain, var)))
+        self.assertEqual(tc_rain.event_id.tolist(), [1, 2])
+        self.assertEqual(tc_rain.event_name, ['1951239N12334', 'short'])
+        self.assertEqual(tc_wind.event_name, tc_rain.event_name)
+        self.assertEqual(dt.datetime.fromordinal(tc_rain.date[0]), dt.datetime(1951, 8, 27))
+        self.assertTrue(np.array_equal(tc_rain.frequency, np.ones(2)))
+
+        # same as wind and rain computed separately
+        tc_haz = TropCyclone()
+        tc_haz.set_from_tracks(tc_track, CENTR_TEST_BRB, batch=True)
+        self.assertTrue(np.allclose(tc_wind.intensity.toarray(), tc_haz.intensity.toarray(),
+                                    rtol=1e-10, atol=1e-10))
+        self.assertEqual(tc_wind.intensity.nnz, 280)
+        self.assertEqual(tc_rain.intensity.shape, (2, 296))
+        self.assertEqual(tc_rain.intensity[1].nnz, 0)
+        rainfall = rainfield_from_track(tc_track.data[0], CENTR_TEST_BRB)
+        self.assertTrue(np.array_equal(tc_rain.intensity[0].toarray(), rainfall.toarray()))
+        self.assertEqual(tc_rain.fraction.nnz, 296)
+
+    def test_wind_rain_empty_pass(self):
+        """Test wind and rain of no tracks."""
+        tc_wind, tc_rain = wind_rain_from_tracks(TCTracks(), CENTR_TEST_BRB)
+        for haz in (tc_wind, tc_rain):
+            haz.check()
+            self.assertEqual(haz.intensity.shape, (0, 296))
+            self.assertEqual(haz.event_id.size, 0)
+            self.assertEqual(haz.date.size, 0)
+            self.assertEqual(haz.tag.file_name, [])
+
 class TestModel(unittest.TestCase):
     """Test modelling of rainfall"""
 
@@ -149,6 +198,36 @@ class TestModel(unittest.TestCase):
         self.assertAlmostEqual(rainfall[0, 130], 43.290917792)
         self.assertAlmostEqual(rainfall[0, 200], 76.315923838)
 
+    def test_rainfield_index_pass(self):
+        """Test only centroids within dist_degree of the nodes get rain."""
+        tc_track = TCTracks()
+        tc_track.read_processed_ibtracs_csv(TEST_TRACK)
+        tc_track.equal_timestep()
+        track = tc_track.data[0]
+        centroids = Centroids()
+        centroids.set_lat_lon(np.repeat(np.arange(8, 20, 0.5), 24),
+                              np.tile(np.arange(-66, -54, 0.5), 24))
+        rainfall = rainfield_from_track(track, centroids, dist_degree=1,
+                                        intensity=0)
+        self.assertEqual(track.max_sustained_wind_unit, 'kn')
+        self.assertEqual(rainfall.shape, (1, centroids.size))
+
+        in_reach = np.zeros(centroids.size, bool)
+        for lat, lon in zip(track.lat.values, track.lon.values):
+            in_reach |= (np.abs(centroids.lat - lat) < 1) \
+                & (np.abs(centroids.lon - lon) < 1)
+        self.assertTrue(in_reach.any())
+        self.assertTrue(np.array_equal(rainfall.indices, in_reach.nonzero()[0]))
+
+        order, cell_ptr, lat0, lon0, nlat, nlon, cell = centroids_index(
+            centroids.lat, centroids.lon, 1)
+        self.assertEqual((lat0, lon0, nlat, nlon, cell), (8, -66, 12, 12, 1))
+        self.assertEqual(cell_ptr[-1], centroids.size)
+        self.assertTrue(np.array_equal(np.sort(order), np.arange(centroids.size)))
+        cell_id = (centroids.lat[order] - lat0) // cell * nlon \
+            + (centroids.lon[order] - lon0) // cell
+        self.assertTrue(np.all(np.diff(cell_id) >= 0))
+
 if __name__ == "__main__":
     TESTS = unittest.TestLoader().loadTestsFromTestCase(TestReader)
     TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestModel))
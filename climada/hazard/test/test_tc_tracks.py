@@ -20,6 +20,8 @@ Test tc_tracks module.
 """
 
 import os
+import shutil
+import tempfile
 import unittest
 import xarray as xr
 import numpy as np
@@ -149,6 +151,46 @@ class TestIBTracs(unittest.TestCase):
         self.assertAlmostEqual(tc_try.data[0].central_pressure.values[5], 1008.63837, 5)
         self.assertAlmostEqual(tc_try.data[0].central_pressure.values[-1], 1014.1515, 4)
 
+    def test_read_cache_pass(self):
+        """Test reading from preprocessed file against netcdf file"""
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            # subset of the IBTrACS storms, preprocessed next to it in tmp_dir
+            fn_nc = os.path.join(tmp_dir, 'IBTrACS.SUBSET.nc')
+            with xr.open_dataset(tc._ibtracs_file(tc.IBTRACS_FILE)) as ibtracs_all:
+                sid = ibtracs_all.sid.values.astype(str)
+                sel = np.isin([storm[:4] for storm in sid], ['1993', '1994']) \
+                    | (sid == '2017242N16333')
+                ibtracs_all.isel(storm=np.flatnonzero(sel)).to_netcdf(fn_nc)
+
+            tc_track = tc.TCTracks()
+            tc_track.read_ibtracs_netcdf(provider='usa', year_range=(1993, 1994),
+                                         basin='EP', estimate_missing=True,
+                                         file_name=fn_nc)
+            tc_cache = tc.TCTracks()
+            tc_cache.read_ibtracs_netcdf(provider='usa', year_range=(1993, 1994),
+                                         basin='EP', estimate_missing=True, cache=True,
+                                         file_name=fn_nc)
+            self.assertIsNone(tc_cache._data)
+            self.assertEqual(tc_cache.size, 52)
+            for track, track_cache in zip(tc_track.data, tc_cache.data):
+                self.assertEqual(track.sid, track_cache.sid)
+                self.assertEqual(track.category, track_cache.category)
+                self.assertEqual(track.basin, track_cache.basin)
+                for var in track.variables:
+                    self.assertTrue(np.array_equal(track[var].values,
+                                                   track_cache[var].values))
+
+            tc_cache.read_ibtracs_netcdf(storm_id='2017242N16333', cache=True,
+                                         file_name=fn_nc)
+            self.assertEqual(tc_cache.size, 1)
+            self.assertEqual(tc_cache.data[0].name, 'IRMA')
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ['IBTrACS.SUBSET.nc',
+                                                           'IBTrACS.SUBSET_auto.h5',
+                                                           'IBTrACS.SUBSET_usa.h5'])
+        finally:
+            shutil.rmtree(tmp_dir)
+
 
 class TestIO(unittest.TestCase):
     """Test reading of tracks from files of different formats"""
@@ -313,6 +355,13 @@ class TestFuncs(unittest.TestCase):
         self.assertEqual(tc_track.data[0].id_no, 1951239012334)
         self.assertEqual(tc_track.data[0].category, 1)
 
+    def test_interp_empty_pass(self):
+        """Interpolate empty TCTracks."""
+        tc_track = tc.TCTracks()
+        tc_track.equal_timestep(land_params=True)
+        self.assertEqual(tc_track.size, 0)
+        self.assertEqual(tc_track.data, [])
+
     def test_interp_origin_pass(self):
         """Interpolate track to min_time_step crossing lat origin"""
         tc_track = tc.TCTracks()
@@ -432,7 +481,7 @@ class TestFuncs(unittest.TestCase):
 
         self.assertGreater(track.dist_since_lf.values[-1],
                            dist_to_coast(track.lat.values[-1], track.lon.values[-1]) / 1000)
-        self.assertEqual(1020.5431562223974, track['dist_since_lf'].values[-1])
+        self.assertAlmostEqual(1020.5431562223974, track['dist_since_lf'].values[-1])
 
         # check distances on land always increase, in second landfall
         dist_on_land = track.dist_since_lf.values[track.on_land]
@@ -511,6 +560,22 @@ class TestFuncs(unittest.TestCase):
         out_rmw = tc.estimate_rmw(rmw, cen_pres)
         self.assertTrue(np.allclose(ref_rmw, out_rmw, equal_nan=True))
 
+    def test_fill_tracks_pass(self):
+        """Test _fill_tracks as xarray ffill and bfill of every track"""
+        values = np.array([np.nan, 1, np.nan, np.nan, 2, np.nan, np.nan, np.nan, 3, np.nan])
+        offsets = np.array([0, 6, 6, 10])
+        ffill = tc._fill_tracks(values, offsets, 1)
+        self.assertTrue(np.array_equal(ffill, [np.nan, 1, 1, np.nan, 2, 2, np.nan, np.nan, 3, 3],
+                                       equal_nan=True))
+        bfill = tc._fill_tracks(values, offsets, 2, backward=True)
+        self.assertTrue(np.array_equal(bfill, [1, 1, 2, 2, 2, np.nan, 3, 3, 3, np.nan],
+                                       equal_nan=True))
+        self.assertTrue(np.isnan(values[0]))
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            track = xr.DataArray(values[start:end], dims='time')
+            self.assertTrue(np.array_equal(ffill[start:end], track.ffill('time', limit=1),
+                                           equal_nan=True))
+
     def test_estimate_rmw_pass(self):
         """Test estimate_rmw function."""
         NM_TO_KM = (1.0 * ureg.nautical_mile).to(ureg.kilometer).magnitude
@@ -24,9 +24,11 @@ import numpy as np
 import os
 import unittest
 import xarray as xr
+from shapely.geometry import box, MultiPolygon
 
 import climada.hazard.tc_tracks as tc
 import climada.hazard.tc_tracks_synth as tc_synth
+from climada.hazard.tc_columns import TCColumns
 import climada.util.coordinates
 from climada.util.constants import TC_ANDREW_FL
 
@@ -355,6 +357,42 @@ class TestDecay(unittest.TestCase):
         track_res = tc_synth._apply_decay_coeffs(track_gen, v_rel, p_rel, land_geom, True)
         self.assertTrue(np.array_equal(cp_ref, track_res.central_pressure[9:11]))
 
+    def test_land_decay_columns_pass(self):
+        """Test land decay of all the tracks at once against track by track."""
+        land_geom = MultiPolygon([box(-81.5, 25, -80, 27), box(-92, 29.5, -89, 32)])
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv(TC_ANDREW_FL)
+        track_gen = tc_track.data[0].copy(True)
+        track_gen.lat.values[:] += 0.3
+        track_gen.attrs['orig_event_flag'] = False
+        track_gen.attrs['sid'] += '_gen1'
+        tracks = [tc_track.data[0], track_gen]
+        wind_orig = track_gen.max_sustained_wind.values.copy()
+        columns = TCColumns()
+        columns.set_from_datasets(tracks)
+        columns.set_land_params(land_geom)
+
+        v_rel, p_rel = tc_synth._calc_land_decay_columns(columns)
+        v_ref, p_ref = tc_synth._calc_land_decay(tracks[:1], land_geom)
+        self.assertEqual(list(v_rel.keys()), list(v_ref.keys()))
+        for ss_scale in v_ref:
+            self.assertAlmostEqual(v_rel[ss_scale], v_ref[ss_scale])
+            self.assertTrue(np.allclose(p_rel[ss_scale], p_ref[ss_scale]))
+
+        np.random.seed(8)
+        tc_synth._apply_land_decay_columns(columns, v_ref, p_ref)
+        np.random.seed(8)
+        tracks = tc_synth._apply_land_decay(tracks, v_ref, p_ref, land_geom)
+        self.assertEqual(np.unique(columns.variables['on_land'][columns.track_idx == 1]
+                                   .astype(int), return_counts=True)[1].size, 2)
+        self.assertFalse(np.array_equal(tracks[1].max_sustained_wind.values, wind_orig))
+        for track, track_col in zip(tracks, columns.to_datasets()):
+            self.assertTrue(np.allclose(track.max_sustained_wind.values,
+                                        track_col.max_sustained_wind.values))
+            self.assertTrue(np.allclose(track.central_pressure.values,
+                                        track_col.central_pressure.values))
+            self.assertEqual(track.category, track_col.category)
+
 class TestSynth(unittest.TestCase):
     def test_random_no_landfall_pass(self):
         """Test calc_random_walk with decay and no historical tracks with landfall"""
@@ -403,6 +441,39 @@ class TestSynth(unittest.TestCase):
         self.assertAlmostEqual(tc_track.data[2].lat[7].values, 12.3454308)
         self.assertAlmostEqual(tc_track.data[2].lat[8].values, 12.42745488)
 
+    def test_random_walk_columns_pass(self):
+        """Test random walk of all the tracks at once."""
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT])
+        tracks = tc_track.data
+        ens_size = 3
+        columns = tc_synth.calc_random_walk_columns(tc_track.columns, ens_size=ens_size,
+                                                    seed=25)
+        self.assertEqual(columns.size, 2 * (ens_size + 1))
+        self.assertEqual(columns.attrs.orig_event_flag.tolist(),
+                         [True, False, False, False] * 2)
+        self.assertEqual(columns.attrs.name[5], tracks[1].name + '_gen1')
+        self.assertEqual(columns.attrs.sid[3], tracks[0].sid + '_gen3')
+        self.assertAlmostEqual(columns.attrs.id_no[2], tracks[0].id_no + 0.02)
+
+        # same walk as track by track, with random numbers of one generator per track
+        children = np.random.SeedSequence(25).spawn(2)
+        for i_track, (track, child) in enumerate(zip(tracks, children)):
+            rnd_vec = np.random.default_rng(child).random(ens_size * (2 + track.time.size))
+            ens_ref = tc_synth._one_rnd_walk(track.copy(True), ens_size, 1.5, 0.1,
+                                             np.pi / 10, rnd_vec)
+            for i_ens, track_ref in enumerate(ens_ref):
+                track_col = columns.get_dataset(i_track * (ens_size + 1) + i_ens)
+                self.assertTrue(np.allclose(track_col.lat.values, track_ref.lat.values))
+                self.assertTrue(np.allclose(track_col.lon.values, track_ref.lon.values))
+                self.assertTrue(np.array_equal(track_col.max_sustained_wind.values,
+                                               track_ref.max_sustained_wind.values))
+
+        tc_track.calc_random_walk(ens_size=ens_size, seed=25, decay=False, batch=True)
+        self.assertIsNone(tc_track._data)
+        self.assertTrue(np.array_equal(tc_track.columns.variables['lat'],
+                                       columns.variables['lat']))
+
     def test_random_walk_decay_pass(self):
         """Test land decay is called from calc_random_walk."""
         tc_track = tc.TCTracks()
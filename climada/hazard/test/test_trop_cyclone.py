@@ -19,6 +19,7 @@ with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
 Test TropCyclone class
 """
 
+import copy
 import os
 import unittest
 import numpy as np
@@ -59,6 +60,8 @@ class TestReader(unittest.TestCase):
         self.assertEqual(tc_haz.tag.file_name, 'Name: 1951239N12334')
         self.assertEqual(tc_haz.units, 'm/s')
         self.assertEqual(tc_haz.centroids.size, 296)
+        self.assertIsNone(tc_haz.centroids._geosph)
+        self.assertIsNone(CENTR_TEST_BRB._geosph)
         self.assertEqual(tc_haz.event_id.size, 1)
         self.assertEqual(tc_haz.date.size, 1)
         self.assertEqual(dt.datetime.fromordinal(tc_haz.date[0]).year, 1951)
@@ -156,6 +159,62 @@ class TestReader(unittest.TestCase):
         self.assertEqual(tc_haz.fraction.nonzero()[0].size, 0)
         self.assertEqual(tc_haz.intensity.nonzero()[0].size, 0)
 
+    def test_set_batch_pass(self):
+        """Test set_from_tracks computing all the tracks at once."""
+        tc_track = TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT, TEST_TRACK])
+        tc_track.equal_timestep()
+        tracks = tc_track.data
+        # southern hemisphere track
+        tracks[2] = tracks[2].assign_coords(lat=-tracks[2].lat)
+        tracks[2].attrs['sid'] = 'south'
+        tracks[1].attrs['sid'] = 'short'
+        tc_track.data = tracks
+        centroids = CENTR_TEST_BRB.coord.copy()
+        centroids[::2, 0] *= -1
+        tc_haz = TropCyclone()
+        tc_haz.set_from_tracks(tc_track, centroids=CENTR_TEST_BRB, model='H08',
+                               batch=True)
+        tc_haz.check()
+
+        self.assertEqual(tc_haz.tag.file_name, ['Name: 1951239N12334'] * 3)
+        self.assertEqual(tc_haz.units, 'm/s')
+        self.assertEqual(tc_haz.event_id.tolist(), [1, 2, 3])
+        self.assertEqual(tc_haz.event_name, ['1951239N12334', 'short', 'south'])
+        self.assertEqual(dt.datetime.fromordinal(tc_haz.date[0]), dt.datetime(1951, 8, 27))
+        self.assertTrue(np.array_equal(tc_haz.frequency, np.ones(3)))
+        self.assertEqual(tc_haz.category.tolist(), [track.category for track in tracks])
+        self.assertTrue(np.array_equal(tc_haz.orig, [True, True, True]))
+        self.assertEqual(tc_haz.intensity.shape, (3, 296))
+        self.assertEqual(tc_haz.intensity[0].nonzero()[0].size, 280)
+        self.assertEqual(tc_haz.intensity[1].nonzero()[0].size, 0)
+        self.assertAlmostEqual(tc_haz.intensity[0, 1], 27.08333002)
+        self.assertAlmostEqual(tc_haz.intensity[0, 100], 36.45564037)
+        self.assertAlmostEqual(tc_haz.intensity[0, 295], 40.62433745)
+        self.assertEqual(tc_haz.fraction.nonzero()[0].size, 280)
+
+        # same as the maximum of the windfields of every track
+        tc_track.data = tracks
+        intensity = tc.compute_windfields_columns(tc_track.columns, centroids, 0).toarray()
+        self.assertGreater(np.count_nonzero(intensity[2]), 0)
+        for track, inten in zip(tracks, intensity):
+            windfields = tc.compute_windfields(track, centroids, 0)
+            self.assertTrue(np.allclose(np.linalg.norm(windfields, axis=-1).max(axis=0),
+                                        inten, rtol=1e-10, atol=1e-10))
+
+        # empty tracks in between and at the end
+        columns = copy.copy(tc_track.columns)
+        offsets = columns.offsets
+        columns.offsets = np.concatenate([offsets[:2], offsets[1:], offsets[-1:]])
+        _, bounds, hemisphere = tc._windfield_nodes(tc_track.columns)
+        _, bounds_empty, hemisphere_empty = tc._windfield_nodes(columns)
+        np.testing.assert_array_equal(bounds_empty[[0, 2, 3]], bounds)
+        self.assertTrue(np.all(np.isnan(bounds_empty[[1, 4]])))
+        np.testing.assert_array_equal(hemisphere_empty[[0, 2, 3]], hemisphere)
+        intensity_empty = tc.compute_windfields_columns(columns, centroids, 0).toarray()
+        np.testing.assert_array_equal(intensity_empty[[0, 2, 3]], intensity)
+        self.assertFalse(np.any(intensity_empty[[1, 4]]))
+
 class TestModel(unittest.TestCase):
     """Test modelling of tropical cyclone"""
 
@@ -29,16 +29,20 @@ import datetime as dt
 import numpy as np
 from scipy import sparse
 import matplotlib.animation as animation
+from numba import jit, prange
 from tqdm import tqdm
 
 from climada.hazard.base import Hazard
 from climada.hazard.tag import Tag as TagHazard
 from climada.hazard.tc_tracks import TCTracks, estimate_rmw
+from climada.hazard.tc_columns import TCColumns
 from climada.hazard.tc_clim_change import get_knutson_criterion, calc_scale_knutson
 from climada.hazard.centroids.centr import Centroids
 from climada.util import ureg
-from climada.util.coordinates import dist_approx
+from climada.util.constants import ONE_LAT_KM
+from climada.util.coordinates import dist_approx, latlon_to_geosph_vector
 import climada.util.plot as u_plot
+import climada.util.dtypes as u_dtype
 
 LOGGER = logging.getLogger(__name__)
 
@@ -57,6 +61,10 @@ CENTR_NODE_MAX_DIST_DEG = 5.5
 MODEL_VANG = {'H08': 0}
 """Enumerate different symmetric wind field calculation."""
 
+WINDFIELD_TILE = (500, 10000)
+"""Number of tracks and of centroids processed at once by
+compute_windfields_columns"""
+
 KMH_TO_MS = (1.0 * ureg.km / ureg.hour).to(ureg.meter / ureg.second).magnitude
 KN_TO_MS = (1.0 * ureg.knot).to(ureg.meter / ureg.second).magnitude
 NM_TO_KM = (1.0 * ureg.nautical_mile).to(ureg.kilometer).magnitude
@@ -102,7 +110,7 @@ class TropCyclone(Hazard):
 
     def set_from_tracks(self, tracks, centroids=None, description='',
                         model='H08', ignore_distance_to_coast=False,
-                        store_windfields=False):
+                        store_windfields=False, batch=False):
         """Clear and fill with windfields from specified tracks.
 
         Parameters:
@@ -119,6 +127,10 @@ class TropCyclone(Hazard):
                 are stored in a sparse matrix of shape
                 (npositions,  ncentroids * 2), that can be reshaped to a full
                 ndarray of shape (npositions, ncentroids, 2). Default: False.
+            batch (boolean, optional): If True, compute the maximum winds of
+                all the tracks at once from tracks.columns with
+                compute_windfields_columns instead of track by track. Not used
+                if store_windfields is True. Default: False.
 
         Raises:
             ValueError
@@ -130,18 +142,18 @@ class TropCyclone(Hazard):
         if not centroids.coord.size:
             centroids.set_meta_to_lat_lon()
 
-        if ignore_distance_to_coast:
-            # Select centroids with lat < 61
-            coastal_idx = (np.abs(centroids.lat) < 61).nonzero()[0]
-        else:
-            # Select centroids which are inside INLAND_MAX_DIST_KM and lat < 61
-            if not centroids.dist_coast.size:
-                centroids.set_dist_coast()
-            coastal_idx = ((centroids.dist_coast < INLAND_MAX_DIST_KM * 1000)
-                           & (np.abs(centroids.lat) < 61)).nonzero()[0]
+        coastal_idx = coastal_centroids_idx(centroids, ignore_distance_to_coast)
 
         LOGGER.info('Mapping %s tracks to %s centroids.', str(tracks.size),
                     str(coastal_idx.size))
+        # geospherical vectors of the centroids, shared by all the tracks
+        coastal_geosph = tuple(ar[coastal_idx] for ar in centroids.get_geosph_vector(cache=False))
+        if batch and not store_windfields:
+            self._set_from_columns(tracks.columns, centroids, coastal_idx, model,
+                                   coastal_geosph)
+            self.tag.description = description
+            self._cast_dtype()
+            return
         if self.pool:
             chunksize = min(num_tracks // self.pool.ncpus, 1000)
             tc_haz = self.pool.map(
@@ -150,6 +162,7 @@ class TropCyclone(Hazard):
                 itertools.repeat(coastal_idx, num_tracks),
                 itertools.repeat(model, num_tracks),
                 itertools.repeat(store_windfields, num_tracks),
+                itertools.repeat(coastal_geosph, num_tracks),
                 chunksize=chunksize)
         else:
             last_perc = 0
@@ -162,12 +175,14 @@ class TropCyclone(Hazard):
                 tc_haz.append(
                     self._tc_from_track(track, centroids, coastal_idx,
                                         model=model,
-                                        store_windfields=store_windfields))
+                                        store_windfields=store_windfields,
+                                        centr_geosph=coastal_geosph))
         LOGGER.debug('Append events.')
         self.concatenate(tc_haz)
         LOGGER.debug('Compute frequency.')
         self.frequency_from_tracks(tracks.data)
         self.tag.description = description
+        self._cast_dtype()
 
     def set_climate_scenario_knu(self, ref_year=2050, rcp_scenario=45):
         """Compute future events for given RCP scenario and year. RCP 4.5
@@ -271,19 +286,23 @@ class TropCyclone(Hazard):
         """Set hazard frequency from tracks data.
 
         Parameters:
-            tracks (list of xarray.Dataset)
+            tracks (list of xarray.Dataset or TCColumns)
         """
-        if not tracks:
+        if not len(tracks):
             return
-        year_max = np.amax([t.time.dt.year.values.max() for t in tracks])
-        year_min = np.amin([t.time.dt.year.values.min() for t in tracks])
+        if isinstance(tracks, TCColumns):
+            years = tracks.variables['time'].astype('datetime64[Y]').astype(int) + 1970
+            year_max, year_min = years.max(), years.min()
+        else:
+            year_max = np.amax([t.time.dt.year.values.max() for t in tracks])
+            year_min = np.amin([t.time.dt.year.values.min() for t in tracks])
         year_delta = year_max - year_min + 1
         num_orig = np.count_nonzero(self.orig)
         ens_size = (self.event_id.size / num_orig) if num_orig > 0 else 1
         self.frequency = np.ones(self.event_id.size) / (year_delta * ens_size)
 
     def _tc_from_track(self, track, centroids, coastal_idx, model='H08',
-                       store_windfields=False):
+                       store_windfields=False, centr_geosph=None):
         """Generate windfield hazard from a single track dataset
 
         Parameters:
@@ -293,6 +312,8 @@ class TropCyclone(Hazard):
             model (str, optional): Windfield model. Default: H08.
             store_windfields (boolean, optional): If True, store windfields.
                 Default: False.
+            centr_geosph (tuple(np.array), optional): geospherical vectors
+                and bases of the coastal centroids. Default: computed.
 
         Raises:
             ValueError, KeyError
@@ -307,7 +328,7 @@ class TropCyclone(Hazard):
             raise ValueError
         ncentroids = centroids.coord.shape[0]
         coastal_centr = centroids.coord[coastal_idx]
-        windfields = compute_windfields(track, coastal_centr, mod_id)
+        windfields = compute_windfields(track, coastal_centr, mod_id, centr_geosph)
         npositions = windfields.shape[0]
         intensity = np.zeros(ncentroids)
         intensity[coastal_idx] = np.linalg.norm(windfields, axis=-1)\
@@ -327,19 +348,59 @@ class TropCyclone(Hazard):
         new_haz.event_id = np.array([1])
         new_haz.frequency = np.array([1])
         new_haz.event_name = [track.sid]
+        new_haz.intensity = u_dtype.cast_sparse(new_haz.intensity)
         new_haz.fraction = new_haz.intensity.copy()
         new_haz.fraction.data.fill(1)
         # store first day of track as date
-        new_haz.date = np.array([
-            dt.datetime(track.time.dt.year[0],
-                        track.time.dt.month[0],
-                        track.time.dt.day[0]).toordinal()
-        ])
+        new_haz.date = track_dates(track.time.values[:1])
         new_haz.orig = np.array([track.orig_event_flag])
         new_haz.category = np.array([track.category])
         new_haz.basin = [track.basin]
         return new_haz
 
+    def _set_from_columns(self, columns, centroids, coastal_idx, model='H08',
+                          centr_geosph=None):
+        """Fill with the windfields of all the tracks computed at once. Same
+        result as the concatenation of _tc_from_track of every track.
+
+        Parameters:
+            columns (TCColumns): tracks
+            centroids (Centroids): Centroids instance.
+            coastal_idx (np.array): Indices of centroids close to coast.
+            model (str, optional): Windfield model. Default: H08.
+            centr_geosph (tuple(np.array), optional): geospherical vectors
+                and bases of the coastal centroids. Default: computed.
+
+        Raises:
+            ValueError
+        """
+        try:
+            mod_id = MODEL_VANG[model]
+        except KeyError:
+            LOGGER.error('Model not implemented: %s.', model)
+            raise ValueError
+        intensity = compute_windfields_columns(columns, centroids.coord[coastal_idx],
+                                               mod_id, self.intensity_thres, centr_geosph)
+        self.clear()
+        names = columns.attrs.name.tolist()
+        self.tag = TagHazard(HAZ_TYPE, ['Name: ' + name for name in names]
+                             if len(names) > 1 else 'Name: ' + names[0])
+        self.intensity = sparse.csr_matrix(
+            (intensity.data, coastal_idx[intensity.indices], intensity.indptr),
+            shape=(columns.size, centroids.size))
+        self.fraction = self.intensity.copy()
+        self.fraction.data.fill(1)
+        self.units = 'm/s'
+        self.centroids = copy.deepcopy(centroids)
+        self.event_id = np.arange(1, columns.size + 1)
+        self.event_name = columns.attrs.sid.tolist()
+        # store first day of track as date
+        self.date = track_dates(columns.variables['time'][columns.offsets[:-1]])
+        self.orig = columns.attrs.orig_event_flag.values.astype(bool)
+        self.category = columns.attrs.category.values.astype(int)
+        self.basin = columns.attrs.basin.tolist()
+        self.frequency_from_tracks(columns)
+
     def _apply_criterion(self, criterion, scale):
         """Apply changes defined in criterion with a given scale
         Parameters:
@@ -368,13 +429,51 @@ class TropCyclone(Hazard):
                 setattr(haz_cc, chg['variable'], new_val)
         return haz_cc
 
-def compute_windfields(track, centroids, model):
+def track_dates(first_times):
+    """Dates of the events of tracks: ordinal of the first day of every track.
+
+    Parameters:
+        first_times (np.array): datetime64 of the first node of every track
+
+    Returns:
+        np.array(int)
+    """
+    return np.asarray(first_times).astype('datetime64[D]').astype(int) \
+        + dt.date(1970, 1, 1).toordinal()
+
+def coastal_centroids_idx(centroids, ignore_distance_to_coast=False):
+    """Indices of the centroids where windfields are computed: latitude
+    below 61 degrees and, unless ignore_distance_to_coast, within
+    INLAND_MAX_DIST_KM of the coast.
+
+    Parameters:
+        centroids (Centroids): Centroids instance.
+        ignore_distance_to_coast (boolean, optional): if True, centroids
+            far from coast are not ignored. Default False
+
+    Returns:
+        np.array
+    """
+    if ignore_distance_to_coast:
+        # Select centroids with lat < 61
+        return (np.abs(centroids.lat) < 61).nonzero()[0]
+    # Select centroids which are inside INLAND_MAX_DIST_KM and lat < 61
+    dist_coast = centroids.dist_coast if centroids.dist_coast.size \
+        else centroids.get_dist_coast()
+    return ((dist_coast < INLAND_MAX_DIST_KM * 1000)
+            & (np.abs(centroids.lat) < 61)).nonzero()[0]
+
+def compute_windfields(track, centroids, model, centr_geosph=None):
     """Compute 1-minute sustained winds (in m/s) at 10 meters above ground
 
     Parameters:
         track (xr.Dataset): track infomation
         centroids (2d np.array): each row is a centroid [lat, lon]
         model (int): Holland model selection according to MODEL_VANG
+        centr_geosph (tuple(np.array), optional): geospherical vectors and
+            bases of the centroids, as Centroids.get_geosph_vector. If given,
+            the distances to the centroids are derived from them. Default:
+            None
 
     Returns:
         np.array
@@ -408,10 +507,15 @@ def compute_windfields(track, centroids, model):
         return windfields
 
     # compute distances and vectors to all centroids
+    t_geosph = latlon_to_geosph_vector(t_lat, t_lon, basis=True)
+    if centr_geosph is not None:
+        centr_geosph = [ar[None, track_centr_msk] for ar in centr_geosph]
     d_centr, v_centr = [ar[0] for ar in dist_approx(
         t_lat[None], t_lon[None],
         track_centr[None, :, 0], track_centr[None, :, 1],
-        log=True, method="geosphere")]
+        log=True, method="geosphere",
+        geosph1=None if centr_geosph is None else [ar[None] for ar in t_geosph],
+        geosph2=centr_geosph)]
 
     # exclude centroids that are too far from or too close to the eye
     close_centr = (d_centr < CENTR_NODE_MAX_DIST_KM) & (d_centr > 1e-2)
@@ -428,7 +532,7 @@ def compute_windfields(track, centroids, model):
     t_rad[:] = estimate_rmw(t_rad, t_cen) * NM_TO_KM
 
     # translational speed of track at every node
-    v_trans = _vtrans(t_lat, t_lon, t_tstep)
+    v_trans = _vtrans(t_lat, t_lon, t_tstep, t_geosph)
     v_trans_norm = v_trans[0]
 
     # adjust pressure at previous track point
@@ -474,6 +578,219 @@ def compute_windfields(track, centroids, model):
     windfields[1:, track_centr_idx, :] = v_full
     return windfields
 
+def compute_windfields_columns(columns, centroids, model, intensity_thres=0,
+                               centr_geosph=None):
+    """Maximum 1-minute sustained winds (in m/s) at 10 meters above ground
+    of all the tracks at once. Same result as the maximum over the track
+    nodes of the norm of compute_windfields for every track.
+
+    The parameters of the nodes are computed for all the tracks at once.
+    Then tiles of tracks and centroids are processed by a fused Numba kernel,
+    which computes for every centroid and node within CENTR_NODE_MAX_DIST_KM
+    the distance and direction, Holland's wind speed and the translational
+    correction, and keeps the maximum wind of every track without storing
+    intermediate arrays.
+
+    Parameters:
+        columns (TCColumns): tracks
+        centroids (2d np.array): each row is a centroid [lat, lon]
+        model (int): Holland model selection according to MODEL_VANG
+        intensity_thres (float, optional): winds below are set to 0.
+            Default: 0
+        centr_geosph (tuple(np.array), optional): geospherical vectors and
+            bases of the centroids, as Centroids.get_geosph_vector. Default:
+            computed
+
+    Returns:
+        sparse.csr_matrix (tracks x centroids)
+    """
+    if model != 0:
+        raise NotImplementedError
+    nodes, bounds, hemisphere = _windfield_nodes(columns)
+    c_lat, c_lon = centroids[:, 0].astype(float), centroids[:, 1].astype(float)
+    c_vec = latlon_to_geosph_vector(c_lat, c_lon) if centr_geosph is None \
+        else centr_geosph[0]
+
+    tile_tracks, tile_centr = WINDFIELD_TILE
+    rows, cols, data = [], [], []
+    for i_ini in range(0, columns.size, tile_tracks):
+        i_end = min(i_ini + tile_tracks, columns.size)
+        offsets = columns.offsets[i_ini:i_end + 1]
+        for j_ini in range(0, c_lat.size, tile_centr):
+            j_sel = slice(j_ini, j_ini + tile_centr)
+            wind = np.zeros((i_end - i_ini, c_lat[j_sel].size))
+            _windfield_max_kernel(c_lat[j_sel], c_lon[j_sel], c_vec[j_sel],
+                                  bounds[i_ini:i_end], hemisphere[i_ini:i_end],
+                                  offsets, nodes, wind)
+            row, col = ((wind >= intensity_thres) & (wind > 0)).nonzero()
+            rows.append(row + i_ini)
+            cols.append(col + j_ini)
+            data.append(wind[row, col])
+    if not rows:
+        return sparse.csr_matrix((columns.size, c_lat.size))
+    return sparse.csr_matrix((np.concatenate(data), (np.concatenate(rows),
+                                                     np.concatenate(cols))),
+                             shape=(columns.size, c_lat.size))
+
+def _windfield_nodes(columns):
+    """Parameters of the nodes of all the tracks used by
+    _windfield_max_kernel, as in compute_windfields.
+
+    Parameters:
+        columns (TCColumns): tracks
+
+    Returns:
+        np.array (nodes x 16), np.array (tracks x 4) bounding boxes as
+        _close_centroids, np.array (tracks) 1 in northern and -1 in southern
+        hemisphere
+    """
+    t_lat, t_lon, t_tstep, t_rad, t_env, t_cen = [
+        columns.variables[ar].astype(float) for ar in ['lat', 'lon', 'time_step',
+                                                        'radius_max_wind',
+                                                        'environmental_pressure',
+                                                        'central_pressure']]
+    if not t_lat.size:
+        return np.zeros((0, 16)), np.zeros((columns.size, 4)), np.ones(columns.size)
+    track_idx = columns.track_idx
+    offsets = columns.offsets
+
+    # longitudes as in compute_windfields and _close_centroids
+    t_lon[t_lon <= -180] += 360
+    t_lon[(_track_reduce(np.minimum, t_lon, offsets) > 180)[track_idx]] -= 360
+    cross = (_track_reduce(np.minimum, t_lon, offsets) < -170) \
+        & (_track_reduce(np.maximum, t_lon, offsets) > 170)
+    t_lon[cross[track_idx] & (t_lon < 0)] += 360
+    bounds = np.stack([_track_reduce(np.minimum, t_lon, offsets),
+                       _track_reduce(np.minimum, t_lat, offsets),
+                       _track_reduce(np.maximum, t_lon, offsets),
+                       _track_reduce(np.maximum, t_lat, offsets)], axis=-1)
+    bounds[:, :2] -= CENTR_NODE_MAX_DIST_DEG
+    bounds[:, 2:] += CENTR_NODE_MAX_DIST_DEG
+    bounds[bounds[:, 2] > 180, 2] -= 360
+
+    south = _track_reduce(np.add, t_lat < 0, offsets) \
+        > _track_reduce(np.add, t_lat > 0, offsets)
+    hemisphere = np.where(south, -1.0, 1.0)
+
+    t_cen = np.where(t_cen > t_env, t_env, t_cen)
+    t_rad = estimate_rmw(t_rad, t_cen) * NM_TO_KM
+    vec, vbasis = latlon_to_geosph_vector(t_lat, t_lon, basis=True)
+    # the values of the first node of every track are not used
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v_trans_norm, v_trans = _vtrans(t_lat, t_lon, t_tstep, (vec, vbasis))
+        prev_pres = np.concatenate([t_cen[:1], t_cen[:-1]])
+        prev_pres[prev_pres < 850] = t_cen[prev_pres < 850]
+        hol_b = _bs_hol08(v_trans_norm, t_env, t_cen, prev_pres, t_lat, t_tstep)
+
+    nodes = np.empty((t_lat.size, 16))
+    nodes[:, 0] = t_lat
+    nodes[:, 1] = t_rad
+    nodes[:, 2] = hol_b
+    nodes[:, 3] = t_env - t_cen
+    # Coriolis force parameter
+    nodes[:, 4] = 2 * 0.0000729 * np.sin(np.radians(np.abs(t_lat)))
+    nodes[:, 5:7] = v_trans
+    nodes[:, 7:10] = vec
+    nodes[:, 10:16] = vbasis.reshape(-1, 6)
+    return nodes, bounds, hemisphere
+
+def _track_reduce(ufunc, values, offsets):
+    """Reduction of the values of the nodes of every track, e.g. with
+    np.minimum. Empty tracks give nan.
+
+    Parameters:
+        ufunc (np.ufunc): reduction
+        values (np.array): values of the nodes of all the tracks
+        offsets (np.array): first node of every track, plus number of nodes
+
+    Returns:
+        np.array
+    """
+    result = np.full(offsets.size - 1, np.nan)
+    nonempty = offsets[1:] > offsets[:-1]
+    if np.any(nonempty):
+        # consecutive positions of the non-empty tracks bracket their nodes
+        result[nonempty] = ufunc.reduceat(values, offsets[:-1][nonempty])
+    return result
+
+@jit(nopython=True, parallel=True)
+def _windfield_max_kernel(c_lat, c_lon, c_vec, bounds, hemisphere, offsets,
+                          nodes, wind):
+    """Maximum wind of tracks at centroids. Same computation as
+    compute_windfields, for every centroid and track node pair, without
+    intermediate arrays.
+
+    Parameters:
+        c_lat, c_lon (np.array): centroids coordinates in degrees
+        c_vec (np.array): centroids geospherical vectors
+        bounds (np.array): bounding box of every track
+        hemisphere (np.array): 1 or -1 for every track
+        offsets (np.array): offsets of the tracks in nodes
+        nodes (np.array): nodes parameters from _windfield_nodes
+        wind (np.array): tracks x centroids, filled with maximum winds
+    """
+    rho = 1.15
+    eps = np.spacing(1)
+    for j in prange(c_lat.size):
+        for i in range(hemisphere.size):
+            if not bounds[i, 1] < c_lat[j] < bounds[i, 3]:
+                continue
+            if bounds[i, 2] < bounds[i, 0]:
+                if not (bounds[i, 0] < c_lon[j] or c_lon[j] < bounds[i, 2]):
+                    continue
+            elif not bounds[i, 0] < c_lon[j] < bounds[i, 2]:
+                continue
+            w_max = 0.0
+            # the first node of a track has no translational velocity
+            for k in range(offsets[i] + 1, offsets[i + 1]):
+                node = nodes[k]
+                # great circle distance is at least the latitude difference
+                if abs(c_lat[j] - node[0]) * ONE_LAT_KM >= CENTR_NODE_MAX_DIST_KM:
+                    continue
+                # the haversine is a quarter of the squared chord
+                hav = 0.0
+                for comp in range(3):
+                    hav += (c_vec[j, comp] - node[7 + comp])**2
+                hav = min(1.0, 0.25 * hav)
+                d_centr = np.degrees(2 * np.arcsin(np.sqrt(hav))) * ONE_LAT_KM
+                if not 1e-2 < d_centr < CENTR_NODE_MAX_DIST_KM:
+                    continue
+
+                # normed tangential vector at the node pointing to the centroid
+                scal = 1 - 2 * hav
+                fact = 1 / max(eps, np.sqrt(1 - scal**2))
+                v_0, v_1 = 0.0, 0.0
+                for comp in range(3):
+                    vec = c_vec[j, comp] - scal * node[7 + comp]
+                    v_0 += vec * node[10 + comp]
+                    v_1 += vec * node[13 + comp]
+                v_0 *= fact
+                v_1 *= fact
+
+                # Holland's angular velocity, see _stat_holland
+                d_centr_mult = 0.5 * 1000 * d_centr * node[4]
+                r_max_norm = (node[1] / d_centr)**node[2]
+                sqrt_term = 100 * node[2] / rho * r_max_norm * node[3] \
+                    * np.exp(-r_max_norm) + d_centr_mult**2
+                if not sqrt_term > 0:
+                    sqrt_term = 0.0
+                v_ang = (np.sqrt(sqrt_term) - d_centr_mult) * hemisphere[i]
+
+                # translational velocity decreasing with distance from eye
+                v_trans_corr = node[1] / d_centr
+                if not v_trans_corr < 1:
+                    v_trans_corr = 1.0
+                v_full_0 = node[5] * v_trans_corr + v_ang * v_1
+                v_full_1 = node[6] * v_trans_corr - v_ang * v_0
+                if np.isnan(v_full_0):
+                    v_full_0 = 0.0
+                if np.isnan(v_full_1):
+                    v_full_1 = 0.0
+                w_node = np.sqrt(v_full_0**2 + v_full_1**2)
+                if w_node > w_max:
+                    w_max = w_node
+            wind[i, j] = w_max
+
 def _close_centroids(t_lat, t_lon, centroids):
     """Choose centroids within padded rectangular region around track
 
@@ -505,7 +822,7 @@ def _close_centroids(t_lat, t_lon, centroids):
         msk_lon = (track_bounds[0] < centr_lon) & (centr_lon < track_bounds[2])
     return msk_lat & msk_lon
 
-def _vtrans(t_lat, t_lon, t_tstep):
+def _vtrans(t_lat, t_lon, t_tstep, t_geosph=None):
     """Translational vector and velocity at each track node.
 
     Parameters
@@ -516,6 +833,9 @@ def _vtrans(t_lat, t_lon, t_tstep):
         track longitudes
     t_tstep : np.array
         track time steps
+    t_geosph : tuple of np.array, optional
+        geospherical vectors and bases of the track nodes, as returned by
+        `latlon_to_geosph_vector(t_lat, t_lon, basis=True)`. Default: None
 
     Returns
     -------
@@ -526,9 +846,14 @@ def _vtrans(t_lat, t_lon, t_tstep):
     """
     v_trans = np.zeros((t_lat.size, 2))
     v_trans_norm = np.zeros((t_lat.size,))
+    geosph1, geosph2 = None, None
+    if t_geosph is not None:
+        geosph1 = [ar[:-1, None] for ar in t_geosph]
+        geosph2 = [ar[1:, None] for ar in t_geosph]
     norm, vec = dist_approx(t_lat[:-1, None], t_lon[:-1, None],
                             t_lat[1:, None], t_lon[1:, None],
-                            log=True, method="geosphere")
+                            log=True, method="geosphere",
+                            geosph1=geosph1, geosph2=geosph2)
     v_trans[1:, :] = vec[:, 0, 0]
     v_trans[1:, :] *= KMH_TO_MS / t_tstep[1:, None]
     v_trans_norm[1:] = norm[:, 0, 0]
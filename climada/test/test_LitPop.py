@@ -156,15 +156,14 @@ class TestFunctionIntegration(unittest.TestCase):
             cntry_val.append(total_asset_val)
         lp._get_gdp2asset_factor(country_info, 2016, curr_shp, fin_mode='gdp')
         cut_bbox = lp._get_country_shape(curr_country, 1)[0]
-        all_coords = lp._litpop_box2coords(cut_bbox, resolution, 1)
+        all_coords = np.column_stack(lp._litpop_box2coords(cut_bbox, resolution, 0))
         mask = lp._mask_from_shape(curr_shp, resolution=resolution,
                                    points2check=all_coords)
         litpop_data = lp._get_litpop_box(cut_bbox, resolution, 0, 2016, [3, 0])
-        litpop_curr = litpop_data[mask.sp_index.indices]
-        lon, lat = zip(*np.array(all_coords)[mask.sp_index.indices])
+        litpop_curr = litpop_data[mask]
         litpop_curr = lp._calc_admin1(curr_country, country_info[curr_country],
                                       admin1_info[curr_country], litpop_curr,
-                                      list(zip(lon, lat)), resolution, 0, conserve_cntrytotal=0,
+                                      all_coords[mask], resolution, 0, conserve_cntrytotal=0,
                                       check_plot=0, masks_adm1=[], return_data=1)
         self.assertEqual(len(litpop_curr), 699)
         self.assertAlmostEqual(max(litpop_curr), 80313679854.39496, places=2)
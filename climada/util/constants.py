@@ -32,6 +32,8 @@ __all__ = ['SOURCE_DIR',
            'GLB_CENTROIDS_NC',
            'ISIMIP_GPWV3_NATID_150AS',
            'NATEARTH_CENTROIDS',
+           'NATEARTH_LAND_RASTER',
+           'NATEARTH_COUNTRY_RASTER',
            'DEMO_GDP2ASSET',
            'RIVER_FLOOD_REGIONS_CSV',
            'TC_ANDREW_FL',
@@ -85,6 +87,22 @@ including region ids from Natural Earth. The 360 AS file includes distance to
 coast from NASA.
 """
 
+NATEARTH_LAND_RASTER = os.path.join(SYSTEM_DIR, 'NatEarth_land_raster_{}as.tif')
+"""
+Global land mask and signed distance to coast at XXX arc-seconds resolution
+(format placeholder), derived from Natural Earth. The files are not provided
+with CLIMADA, but generated locally on first use, see
+`climada.util.coordinates.get_land_raster`.
+"""
+
+NATEARTH_COUNTRY_RASTER = os.path.join(SYSTEM_DIR, 'NatEarth_country_raster_{}as.tif')
+"""
+Global country codes at XXX arc-seconds resolution (format placeholder),
+derived from Natural Earth, with pixels at country borders marked as ambiguous.
+The files are not provided with CLIMADA, but generated locally on first use,
+see `climada.util.coordinates.get_country_raster`.
+"""
+
 ENT_TEMPLATE_XLS = os.path.join(SYSTEM_DIR, 'entity_template.xlsx')
 """Entity template in xls format."""
 
@@ -19,11 +19,15 @@ with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
 Define functions to handle with coordinates
 """
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import copy
+import itertools
 import logging
 import math
 from multiprocessing import cpu_count
 import os
+import threading
 import zipfile
 
 from cartopy.io import shapereader
@@ -38,14 +42,21 @@ import rasterio.crs
 import rasterio.features
 import rasterio.mask
 import rasterio.warp
+import rasterio.windows
 import scipy.interpolate
+import scipy.ndimage
+import scipy.spatial
+from scipy import sparse
 from shapely.geometry import Polygon, MultiPolygon, Point, box
 import shapely.ops
 import shapely.vectorized
 import shapefile
 
 from climada.util.constants import (DEF_CRS, SYSTEM_DIR, ONE_LAT_KM,
+                                    EARTH_RADIUS_KM,
                                     NATEARTH_CENTROIDS,
+                                    NATEARTH_LAND_RASTER,
+                                    NATEARTH_COUNTRY_RASTER,
                                     ISIMIP_GPWV3_NATID_150AS,
                                     ISIMIP_NATID_TO_ISO,
                                     RIVER_FLOOD_REGIONS_CSV)
@@ -72,6 +83,49 @@ DEM_NODATA = -9999
 MAX_DEM_TILES_DOWN = 300
 """Maximum DEM tiles to dowload"""
 
+RASTER_TILE_PIXELS = 2**22
+"""Maximum number of pixels per band decoded at once by `read_raster_sparse`"""
+
+RASTER_BLOCK_SIZE = 512
+"""Size (in pixels) of the square blocks cached by `RasterSampler`"""
+
+RASTER_BLOCK_CACHE_BYTES = 256 * 1024**2
+"""Memory budget (in bytes) of the block cache shared by the samplers of
+`get_raster_sampler`, and default budget of the other `RasterSampler` instances"""
+
+_RASTER_SAMPLER_CACHE = dict()
+"""Raster samplers kept in memory by `get_raster_sampler`, indexed by file path,
+modification time, size and resolution"""
+
+_RASTER_SAMPLER_LOCK = threading.Lock()
+
+LAND_RASTER_RES_AS = 150
+"""Default resolution (in arc-seconds) of the land mask and distance to coast raster"""
+
+LAND_CLS_SEA, LAND_CLS_LAND, LAND_CLS_COAST = 0, 1, 2
+"""Pixel classes of the land mask raster"""
+
+_LAND_RASTER_CACHE = dict()
+"""Land rasters kept in memory by `get_land_raster`, indexed by file path"""
+
+COUNTRY_RASTER_RES_AS = 150
+"""Default resolution (in arc-seconds) of the coarse level of the country code index"""
+
+COUNTRY_RASTER_REFINE = 10
+"""Refinement factor of the fine level of the country code index at country borders"""
+
+COUNTRY_RASTER_TILE = 24
+"""Size (in pixels of the coarse level) of the tiles refined at country borders"""
+
+COUNTRY_AMBIGUOUS = -1
+"""Country code of pixels at country borders in the country code index"""
+
+_COUNTRY_RASTER_CACHE = dict()
+"""Country rasters kept in memory by `get_country_raster`, indexed by file path"""
+
+_COUNTRY_SHAPES_CACHE = dict()
+"""Country shapes kept in memory by `_country_shapes`, indexed by resolution"""
+
 def latlon_to_geosph_vector(lat, lon, rad=False, basis=False):
     """Convert lat/lon coodinates to radial vectors (on geosphere)
 
@@ -197,7 +251,7 @@ def latlon_bounds(lat, lon, buffer=0.0):
     return (lon_min, max(lat.min() - buffer, -90), lon_max, min(lat.max() + buffer, 90))
 
 def dist_approx(lat1, lon1, lat2, lon2, log=False, normalize=True,
-                method="equirect"):
+                method="equirect", geosph1=None, geosph2=None):
     """Compute approximation of geodistance in km
 
     Parameters
@@ -217,6 +271,15 @@ def dist_approx(lat1, lon1, lat2, lon2, log=False, normalize=True,
         * "equirect": equirectangular; very fast, good only at small distances.
         * "geosphere": spherical approximation, slower, but much higher accuracy.
         Default: "equirect".
+    geosph1, geosph2 : tuple of ndarrays, optional
+        Only used with method "geosphere". Precomputed geospherical vectors
+        and tangent bases of the first and second points, as returned by
+        `latlon_to_geosph_vector(lat, lon, basis=True)`, with shapes
+        (nbatch, nx, 3) and (nbatch, nx, 2, 3) (resp. ny for the second
+        points). If given, the distances and tangential vectors are derived
+        from them by dot products instead of trigonometric functions of the
+        coordinates, e.g. to reuse the vectors of fixed centroids. Default:
+        None
 
     Returns
     -------
@@ -240,20 +303,29 @@ def dist_approx(lat1, lon1, lat2, lon2, log=False, normalize=True,
         if log:
             vtan = np.stack([d_lat, d_lon], axis=-1) * ONE_LAT_KM
     elif method == "geosphere":
-        lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
-        dlat = 0.5 * (lat2[:, None] - lat1[:, :, None])
-        dlon = 0.5 * (lon2[:, None] - lon1[:, :, None])
-        # haversine formula:
-        hav = np.sin(dlat)**2 \
-            + np.cos(lat1[:, :, None]) * np.cos(lat2[:, None]) * np.sin(dlon)**2
+        if geosph1 is not None and geosph2 is not None:
+            (vec1, vbasis), vec2 = geosph1, geosph2[0]
+            # the haversine is a quarter of the squared chord
+            chord = vec2[:, None] - vec1[:, :, None]
+            hav = np.fmin(1, 0.25 * np.einsum('nkli,nkli->nkl', chord, chord))
+        else:
+            lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+            dlat = 0.5 * (lat2[:, None] - lat1[:, :, None])
+            dlon = 0.5 * (lon2[:, None] - lon1[:, :, None])
+            # haversine formula:
+            hav = np.sin(dlat)**2 \
+                + np.cos(lat1[:, :, None]) * np.cos(lat2[:, None]) * np.sin(dlon)**2
+            if log:
+                vec1, vbasis = latlon_to_geosph_vector(lat1, lon1, rad=True, basis=True)
+                vec2 = latlon_to_geosph_vector(lat2, lon2, rad=True)
         dist_km = np.degrees(2 * np.arcsin(np.sqrt(hav))) * ONE_LAT_KM
         if log:
-            vec1, vbasis = latlon_to_geosph_vector(lat1, lon1, rad=True, basis=True)
-            vec2 = latlon_to_geosph_vector(lat2, lon2, rad=True)
             scal = 1 - 2 * hav
             fact = dist_km / np.fmax(np.spacing(1), np.sqrt(1 - scal**2))
-            vtan = fact[..., None] * (vec2[:, None] - scal[..., None] * vec1[:, :, None])
-            vtan = np.einsum('nkli,nkji->nklj', vtan, vbasis)
+            # vec1 is orthogonal to its tangent basis: only vec2 is projected
+            nbatch, nx_pts, ny_pts = dist_km.shape
+            vtan = np.matmul(vbasis.reshape(nbatch, nx_pts * 2, 3), vec2.swapaxes(1, 2))
+            vtan = fact[..., None] * vtan.reshape(nbatch, nx_pts, 2, ny_pts).swapaxes(2, 3)
     else:
         LOGGER.error("Unknown distance approximation method: %s", method)
         raise KeyError
@@ -349,7 +421,8 @@ def utm_zones(wgs_bounds):
             zones.append((epsg + 100, bounds))
     return zones
 
-def dist_to_coast(coord_lat, lon=None, signed=False):
+def dist_to_coast(coord_lat, lon=None, signed=False, gridded=False,
+                  res_as=LAND_RASTER_RES_AS):
     """Compute (signed) distance to coast from input points in meters.
 
     Parameters:
@@ -364,6 +437,11 @@ def dist_to_coast(coord_lat, lon=None, signed=False):
             - float with a longitude value in epsg:4326
         signed (bool): If True, distance is signed with positive values off shore and negative
             values on land. Default: False
+        gridded (bool): If True, interpolate the precomputed land raster (see
+            `get_land_raster`) which is much faster. Exact distances are only computed for
+            points close to the coast. Default: False
+        res_as (int, optional): Resolution in arc-seconds of the land raster used if
+            `gridded` is True. Default: LAND_RASTER_RES_AS
 
     Returns:
         np.array
@@ -373,6 +451,9 @@ def dist_to_coast(coord_lat, lon=None, signed=False):
             LOGGER.error('Input CRS is not %s', str(NE_CRS))
             raise ValueError
         geom = coord_lat
+        if gridded:
+            return _dist_to_coast_gridded(geom.geometry.y.values, geom.geometry.x.values,
+                                          signed, res_as)
     else:
         if lon is None:
             if isinstance(coord_lat, np.ndarray) and coord_lat.shape[1] == 2:
@@ -386,6 +467,8 @@ def dist_to_coast(coord_lat, lon=None, signed=False):
                 LOGGER.error('Mismatching input coordinates size: %s != %s',
                              lat.size, lon.size)
                 raise ValueError
+        if gridded:
+            return _dist_to_coast_gridded(lat, lon, signed, res_as)
         geom = gpd.GeoDataFrame(geometry=gpd.points_from_xy(lon, lat), crs=NE_CRS)
 
     pad = 20
@@ -454,12 +537,7 @@ def dist_to_coast_nasa(lat, lon, highres=False, signed=False):
         os.chdir(cwd)
 
     intermediate_res = None if highres else 0.1
-    west_msk = (lon < 0)
-    dist = np.zeros_like(lat)
-    for msk in [west_msk, ~west_msk]:
-        if np.count_nonzero(msk) > 0:
-            dist[msk] = read_raster_sample(
-                path, lat[msk], lon[msk], intermediate_res=intermediate_res, fill_value=0)
+    dist = read_raster_sample(path, lat, lon, intermediate_res=intermediate_res, fill_value=0)
     if not signed:
         dist = np.abs(dist)
     return 1000 * dist
@@ -509,7 +587,8 @@ def get_land_geometry(country_names=None, extent=None, resolution=10):
         geom = MultiPolygon([geom])
     return geom
 
-def coord_on_land(lat, lon, land_geom=None):
+def coord_on_land(lat, lon, land_geom=None, gridded=False,
+                  res_as=LAND_RASTER_RES_AS):
     """Check if point is on land (True) or water (False) of provided coordinates.
     All globe considered if no input countries.
 
@@ -517,7 +596,12 @@ def coord_on_land(lat, lon, land_geom=None):
         lat (np.array): latitude of points in epsg:4326
         lon (np.array): longitude of points in epsg:4326
         land_geom (shapely.geometry.multipolygon.MultiPolygon, optional):
-            profiles of land.
+            profiles of land. If given, it is used for all points, also if `gridded` is True.
+        gridded (bool): If True and no `land_geom` is given, look up the precomputed land
+            raster (see `get_land_raster`) which is much faster. The Natural Earth land
+            geometry is then only checked for points close to the coast. Default: False
+        res_as (int, optional): Resolution in arc-seconds of the land raster used if
+            `gridded` is True. Default: LAND_RASTER_RES_AS
 
     Returns:
         np.array(bool)
@@ -526,6 +610,8 @@ def coord_on_land(lat, lon, land_geom=None):
         LOGGER.error('Wrong size input coordinates: %s != %s.', lat.size,
                      lon.size)
         raise ValueError
+    if gridded and land_geom is None:
+        return _coord_on_land_gridded(lat, lon, res_as)
     delta_deg = 1
     if land_geom is None:
         land_geom = get_land_geometry(
@@ -536,6 +622,188 @@ def coord_on_land(lat, lon, land_geom=None):
             resolution=10)
     return shapely.vectorized.contains(land_geom, lon, lat)
 
+def generate_land_raster(res_as=LAND_RASTER_RES_AS, path=None):
+    """Generate global land mask and signed distance to coast raster from Natural Earth
+
+    The GeoTIFF file contains two bands: The signed distance to coast in meters (positive
+    off shore and negative on land) at each pixel center, and the land class of each
+    pixel (LAND_CLS_SEA, LAND_CLS_LAND or LAND_CLS_COAST). Pixels crossed by the coast line
+    and their direct neighbours are of class LAND_CLS_COAST. For points in those pixels,
+    the sampling functions fall back to the exact Natural Earth geometries.
+
+    Usually, this function doesn't need to be called explicitly since `get_land_raster`
+    generates the file on first use.
+
+    Parameters:
+        res_as (int, optional): Resolution in arc-seconds. Has to divide 180 degrees.
+            Default: LAND_RASTER_RES_AS
+        path (str, optional): If set, write resulting file here instead of the default
+            location given by NATEARTH_LAND_RASTER.
+    """
+    if (180 * 3600) % res_as != 0:
+        LOGGER.error('Resolution of %s arc-seconds does not divide 180 degrees.', res_as)
+        raise ValueError
+    if path is None:
+        path = NATEARTH_LAND_RASTER.format(res_as)
+    res_deg = res_as / 3600
+    height, width = (180 * 3600) // res_as, (360 * 3600) // res_as
+    transform = rasterio.Affine(res_deg, 0, -180, 0, -res_deg, 90)
+
+    LOGGER.info('Generating land raster at %s arc-seconds.', res_as)
+    shp_file = shapereader.natural_earth(resolution='10m', category='cultural',
+                                         name='admin_0_countries')
+    land_shapes = [(geom, 1) for geom in shapereader.Reader(shp_file).geometries()]
+    on_land = rasterio.features.rasterize(
+        land_shapes, out_shape=(height, width), transform=transform,
+        fill=0, dtype=rasterio.uint8).astype(bool)
+    land_touched = rasterio.features.rasterize(
+        land_shapes, out_shape=(height, width), transform=transform,
+        fill=0, all_touched=True, dtype=rasterio.uint8).astype(bool)
+    coast = get_coastlines(resolution=10).geometry
+    coast_touched = rasterio.features.rasterize(
+        [(geom, 1) for geom in coast], out_shape=(height, width), transform=transform,
+        fill=0, all_touched=True, dtype=rasterio.uint8).astype(bool)
+    coast_touched = scipy.ndimage.binary_dilation(coast_touched | (land_touched & ~on_land),
+                                                  structure=np.ones((3, 3), dtype=bool))
+    land_cls = np.full((height, width), LAND_CLS_SEA, dtype=np.float32)
+    land_cls[on_land] = LAND_CLS_LAND
+    land_cls[coast_touched] = LAND_CLS_COAST
+    del land_touched, coast_touched
+
+    # nearest neighbor search on the unit sphere among densified coast line points
+    LOGGER.info('Computing distance to coast of %s pixels.', height * width)
+    coast_pts = _densify_lines(coast, 0.5 * res_deg)
+    coast_tree = scipy.spatial.cKDTree(latlon_to_geosph_vector(coast_pts[:, 1], coast_pts[:, 0]))
+    lon_dim = -180 + res_deg * (np.arange(width) + 0.5)
+    dist = np.empty((height, width), dtype=np.float32)
+    for rows in np.array_split(np.arange(height), max(1, height // 100)):
+        lon, lat = np.meshgrid(lon_dim, 90 - res_deg * (rows + 0.5))
+        chord, _ = coast_tree.query(latlon_to_geosph_vector(lat, lon).reshape(-1, 3))
+        dist[rows] = (2 * np.arcsin(np.fmin(1, 0.5 * chord))).reshape(lat.shape)
+    dist *= EARTH_RADIUS_KM * 1000
+    dist[on_land] *= -1
+
+    meta = {
+        'crs': NE_CRS,
+        'height': height,
+        'width': width,
+        'transform': transform,
+        'compress': 'deflate',
+        'tiled': True,
+    }
+    write_raster(path, np.stack([dist.ravel(), land_cls.ravel()]), meta, dtype=np.float32)
+
+def get_land_raster(res_as=LAND_RASTER_RES_AS, path=None):
+    """Get global land mask and signed distance to coast raster
+
+    The raster is generated (see `generate_land_raster`) and written to the data folder if it
+    doesn't exist yet. After the first call, the raster is kept in memory.
+
+    Parameters:
+        res_as (int, optional): Resolution in arc-seconds. Default: LAND_RASTER_RES_AS
+        path (str, optional): If set, read the raster from this file instead of the default
+            location given by NATEARTH_LAND_RASTER.
+
+    Returns:
+        dist (np.array): 2d array of signed distances to coast in meters
+        land_cls (np.array): 2d array of land classes (LAND_CLS_SEA, LAND_CLS_LAND or
+            LAND_CLS_COAST)
+        transform (affine.Affine): affine transformation defining the raster
+    """
+    if path is None:
+        path = NATEARTH_LAND_RASTER.format(res_as)
+    if path not in _LAND_RASTER_CACHE:
+        if not os.path.isfile(path):
+            generate_land_raster(res_as=res_as, path=path)
+        LOGGER.info('Reading %s', path)
+        with rasterio.open(path, 'r') as src:
+            _LAND_RASTER_CACHE[path] = (src.read(1), src.read(2).astype(np.uint8),
+                                        src.transform)
+    return _LAND_RASTER_CACHE[path]
+
+def _densify_lines(geoms, max_dist):
+    """Points along the given lines with a maximum spacing of max_dist
+
+    Parameters:
+        geoms (iterable): LineString or MultiLineString geometries
+        max_dist (float): maximum distance between consecutive points
+
+    Returns:
+        np.array of shape (npoints, 2) with x (lon) and y (lat) coordinates
+    """
+    points = []
+    for geom in geoms:
+        lines = geom.geoms if hasattr(geom, 'geoms') else [geom]
+        for line in lines:
+            coords = np.asarray(line.coords)[:, :2]
+            seg = np.diff(coords, axis=0)
+            nsub = np.ceil(np.hypot(seg[:, 0], seg[:, 1]) / max_dist).astype(int)
+            nsub = np.fmax(1, nsub)
+            idx = np.repeat(np.arange(seg.shape[0]), nsub)
+            step = np.arange(idx.size) - np.repeat(np.cumsum(nsub) - nsub, nsub)
+            points.append(coords[idx] + seg[idx] * (step / nsub[idx])[:, None])
+            points.append(coords[-1:])
+    return np.concatenate(points, axis=0)
+
+def _raster_pixels(lat, lon, transform):
+    """Fractional row and column indices of points in a raster"""
+    lon = lon_normalize(np.array(lon, dtype=np.float64))
+    col = (lon - transform[2]) / transform[0]
+    row = (np.asarray(lat) - transform[5]) / transform[4]
+    return row, col
+
+def _raster_sample_nearest(data, row, col):
+    """Values of the pixels at fractional row and column indices"""
+    row = np.clip(np.floor(row).astype(int), 0, data.shape[0] - 1)
+    col = np.clip(np.floor(col).astype(int), 0, data.shape[1] - 1)
+    return data[row, col]
+
+def _raster_sample_bilinear(data, row, col, wrap_cols=False):
+    """Bilinear interpolation of pixel center values at fractional row and column indices
+
+    If `wrap_cols` is True, the columns are periodic (raster covering all longitudes), i.e.
+    points between the last and the first column center are interpolated between them.
+    """
+    row, col = row - 0.5, col - 0.5
+    row0 = np.clip(np.floor(row).astype(int), 0, data.shape[0] - 2)
+    frow = np.clip(row - row0, 0, 1)
+    if wrap_cols:
+        col0 = np.floor(col).astype(int)
+        fcol = col - col0
+        col0 %= data.shape[1]
+        col1 = (col0 + 1) % data.shape[1]
+    else:
+        col0 = np.clip(np.floor(col).astype(int), 0, data.shape[1] - 2)
+        fcol = np.clip(col - col0, 0, 1)
+        col1 = col0 + 1
+    return ((1 - frow) * ((1 - fcol) * data[row0, col0] + fcol * data[row0, col1])
+            + frow * ((1 - fcol) * data[row0 + 1, col0] + fcol * data[row0 + 1, col1]))
+
+def _coord_on_land_gridded(lat, lon, res_as):
+    """Helper function for `coord_on_land` using the land raster"""
+    lat, lon = np.asarray(lat), np.asarray(lon)
+    _, land_cls, transform = get_land_raster(res_as=res_as)
+    land_cls = _raster_sample_nearest(land_cls, *_raster_pixels(lat, lon, transform))
+    on_land = (land_cls == LAND_CLS_LAND)
+    coast_msk = (land_cls == LAND_CLS_COAST)
+    if np.any(coast_msk):
+        on_land[coast_msk] = coord_on_land(lat[coast_msk], lon[coast_msk])
+    return on_land
+
+def _dist_to_coast_gridded(lat, lon, signed, res_as):
+    """Helper function for `dist_to_coast` using the land raster"""
+    lat, lon = np.asarray(lat), np.asarray(lon)
+    dist, land_cls, transform = get_land_raster(res_as=res_as)
+    row, col = _raster_pixels(lat, lon, transform)
+    coast_msk = (_raster_sample_nearest(land_cls, row, col) == LAND_CLS_COAST)
+    global_cols = np.isclose(abs(transform[0]) * dist.shape[1], 360)
+    dist = _raster_sample_bilinear(dist, row, col, wrap_cols=global_cols).astype(np.float64)
+    if np.any(coast_msk):
+        dist[coast_msk] = dist_to_coast(lat[coast_msk], lon[coast_msk], signed=True)
+    if not signed:
+        dist = np.abs(dist)
+    return dist
+
 def nat_earth_resolution(resolution):
     """Check if resolution is available in Natural Earth. Build string.
 
@@ -828,7 +1096,8 @@ def natearth_country_to_int(country):
         return int(country.ISO_N3)
     return NATEARTH_AREA_NONISO_NUMERIC[str(country.NAME)]
 
-def get_country_code(lat, lon, gridded=False):
+def get_country_code(lat, lon, gridded=False, indexed=False,
+                     res_as=COUNTRY_RASTER_RES_AS):
     """Provide numeric (ISO 3166) code for every point.
 
     Oceans get the value zero. Areas that are not in ISO 3166 are given values
@@ -839,13 +1108,23 @@ def get_country_code(lat, lon, gridded=False):
         lon (np.array): longitude of points in epsg:4326
         gridded (bool): If True, interpolate precomputed gridded data which
             is usually much faster. Default: False.
+        indexed (bool): If True (and `gridded` is False), look up the
+            multi-resolution country code index (see `get_country_raster`) and
+            check the country shapes only for points at country borders. The
+            result is the same as without index, but much faster for large
+            numbers of points. Default: False.
+        res_as (int, optional): Resolution in arc-seconds of the coarse level
+            of the country code index used if `indexed` is True.
+            Default: COUNTRY_RASTER_RES_AS
 
     Returns:
         np.array(int)
     """
     lat, lon = [np.asarray(ar).ravel() for ar in [lat, lon]]
     LOGGER.info('Setting region_id %s points.', str(lat.size))
-    if gridded:
+    if not gridded and indexed:
+        region_id = _get_country_code_indexed(lat, lon, res_as)
+    elif gridded:
         base_file = hdf5.read(NATEARTH_CENTROIDS[150])
         meta, region_id = base_file['meta'], base_file['region_id']
         transform = rasterio.Affine(*meta['transform'])
@@ -871,6 +1150,166 @@ def get_country_code(lat, lon, gridded=False):
         region_id[region_id == -1] = 0
     return region_id
 
+def _country_shapes(resolution=10):
+    """Natural Earth country shapes with their numeric codes, sorted by area (ascending)
+
+    The shapes are read once and kept in memory: the returned GeoDataFrame must not be
+    modified.
+
+    Parameters:
+        resolution (int, optional): 10, 50 or 110. Resolution in m. Default: 10m
+
+    Returns:
+        GeoDataFrame with columns geometry and region_id
+    """
+    if resolution not in _COUNTRY_SHAPES_CACHE:
+        countries = get_country_geometries(resolution=resolution)
+        countries = countries[~countries.geometry.is_empty]
+        countries['region_id'] = [natearth_country_to_int(country)
+                                  for country in countries.itertuples()]
+        countries['area'] = countries.geometry.area
+        _COUNTRY_SHAPES_CACHE[resolution] = \
+            countries.sort_values(by=['area'])[['geometry', 'region_id']]
+    return _COUNTRY_SHAPES_CACHE[resolution]
+
+def _rasterize_country_shapes(countries, bounds, res_deg):
+    """Rasterize country codes, marking pixels at country borders as ambiguous
+
+    Where country shapes overlap, the larger one is chosen (as in `get_country_code`).
+
+    Parameters:
+        countries (GeoDataFrame): as returned by `_country_shapes`
+        bounds (tuple): (lon_min, lat_min, lon_max, lat_max) of the raster
+        res_deg (float): resolution in degrees
+
+    Returns:
+        np.array (2d, int32), affine.Affine
+    """
+    height = int(round((bounds[3] - bounds[1]) / res_deg))
+    width = int(round((bounds[2] - bounds[0]) / res_deg))
+    transform = rasterio.Affine(res_deg, 0, bounds[0], 0, -res_deg, bounds[3])
+    codes = rasterio.features.rasterize(
+        list(zip(countries.geometry, countries.region_id)), out_shape=(height, width),
+        transform=transform, fill=0, dtype=rasterio.int32)
+    border = rasterio.features.rasterize(
+        [(geom.boundary, 1) for geom in countries.geometry], out_shape=(height, width),
+        transform=transform, fill=0, all_touched=True, dtype=rasterio.uint8)
+    border = scipy.ndimage.binary_dilation(border.astype(bool),
+                                           structure=np.ones((3, 3), dtype=bool))
+    codes[border] = COUNTRY_AMBIGUOUS
+    return codes, transform
+
+def generate_country_raster(res_as=COUNTRY_RASTER_RES_AS, path=None):
+    """Generate global raster of country codes from Natural Earth
+
+    This is the coarse level of the country code index used by `get_country_code`.
+    Pixels that are crossed by a country border (or coast line) and their direct neighbours
+    have the value COUNTRY_AMBIGUOUS. All other pixels are completely contained in the
+    country (or ocean) given by their value.
+
+    Usually, this function doesn't need to be called explicitly since `get_country_raster`
+    generates the file on first use.
+
+    Parameters:
+        res_as (int, optional): Resolution in arc-seconds. Has to divide 180 degrees.
+            Default: COUNTRY_RASTER_RES_AS
+        path (str, optional): If set, write resulting file here instead of the default
+            location given by NATEARTH_COUNTRY_RASTER.
+    """
+    if (180 * 3600) % res_as != 0:
+        LOGGER.error('Resolution of %s arc-seconds does not divide 180 degrees.', res_as)
+        raise ValueError
+    if path is None:
+        path = NATEARTH_COUNTRY_RASTER.format(res_as)
+    LOGGER.info('Generating country raster at %s arc-seconds.', res_as)
+    codes, transform = _rasterize_country_shapes(_country_shapes(), (-180, -90, 180, 90),
+                                                 res_as / 3600)
+    meta = {
+        'crs': NE_CRS,
+        'height': codes.shape[0],
+        'width': codes.shape[1],
+        'transform': transform,
+        'compress': 'deflate',
+        'tiled': True,
+    }
+    write_raster(path, codes, meta, dtype=np.int32)
+
+def get_country_raster(res_as=COUNTRY_RASTER_RES_AS, path=None):
+    """Get global raster of country codes, with ambiguous pixels at country borders
+
+    The raster is generated (see `generate_country_raster`) and written to the data folder if
+    it doesn't exist yet. After the first call, the raster is kept in memory.
+
+    Parameters:
+        res_as (int, optional): Resolution in arc-seconds. Default: COUNTRY_RASTER_RES_AS
+        path (str, optional): If set, read the raster from this file instead of the default
+            location given by NATEARTH_COUNTRY_RASTER.
+
+    Returns:
+        codes (np.array): 2d array of numeric country codes or COUNTRY_AMBIGUOUS
+        transform (affine.Affine): affine transformation defining the raster
+    """
+    if path is None:
+        path = NATEARTH_COUNTRY_RASTER.format(res_as)
+    if path not in _COUNTRY_RASTER_CACHE:
+        if not os.path.isfile(path):
+            generate_country_raster(res_as=res_as, path=path)
+        LOGGER.info('Reading %s', path)
+        with rasterio.open(path, 'r') as src:
+            _COUNTRY_RASTER_CACHE[path] = (src.read(1), src.transform)
+    return _COUNTRY_RASTER_CACHE[path]
+
+def _get_country_code_indexed(lat, lon, res_as):
+    """Helper function for `get_country_code` using the multi-resolution country code index
+
+    Points in ambiguous pixels of the coarse level are looked up in tiles that are
+    rasterized at a finer resolution on demand. Only points that are still ambiguous are
+    checked against the country shapes.
+    """
+    codes, transform = get_country_raster(res_as=res_as)
+    lon = lon_normalize(lon.astype(np.float64))
+    row, col = _raster_pixels(lat, lon, transform)
+    region_id = _raster_sample_nearest(codes, row, col).astype(int)
+    ambiguous = np.nonzero(region_id == COUNTRY_AMBIGUOUS)[0]
+    if not ambiguous.size:
+        return region_id
+
+    LOGGER.debug('Refining country codes of %s points at country borders.', ambiguous.size)
+    countries = _country_shapes()
+    cntry_bounds = countries.bounds.values
+    res_deg = abs(transform[0])
+    tile_deg = COUNTRY_RASTER_TILE * res_deg
+    fine_res = res_deg / COUNTRY_RASTER_REFINE
+    tile_idx = np.floor(np.stack([row[ambiguous], col[ambiguous]], axis=1)
+                        / COUNTRY_RASTER_TILE).astype(int)
+    tiles, tile_inv = np.unique(tile_idx, axis=0, return_inverse=True)
+    for i_tile, (tile_row, tile_col) in enumerate(tiles):
+        sel = ambiguous[tile_inv.ravel() == i_tile]
+        west = transform[2] + tile_col * tile_deg
+        north = transform[5] - tile_row * tile_deg
+        # pad by one fine pixel to catch borders right outside of the tile
+        bounds = (west - fine_res, north - tile_deg - fine_res,
+                  west + tile_deg + fine_res, north + fine_res)
+        cand_msk = ((cntry_bounds[:, 0] <= bounds[2]) & (cntry_bounds[:, 2] >= bounds[0])
+                    & (cntry_bounds[:, 1] <= bounds[3]) & (cntry_bounds[:, 3] >= bounds[1]))
+        if not np.any(cand_msk):
+            region_id[sel] = 0
+            continue
+        cand = countries[cand_msk]
+        fine_codes, fine_trans = _rasterize_country_shapes(cand, bounds, fine_res)
+        region_id[sel] = _raster_sample_nearest(fine_codes,
+                                                *_raster_pixels(lat[sel], lon[sel], fine_trans))
+        unset = sel[region_id[sel] == COUNTRY_AMBIGUOUS]
+        region_id[unset] = 0
+        # as in `get_country_code`, larger countries are prioritized
+        for country in cand[::-1].itertuples():
+            if not unset.size:
+                break
+            select = shapely.vectorized.contains(country.geometry, lon[unset], lat[unset])
+            region_id[unset[select]] = country.region_id
+            unset = unset[~select]
+    return region_id
+
 def get_admin1_info(country_names):
     """Provide registry info and shape files for admin1 regions
 
@@ -1137,6 +1576,89 @@ def read_raster(file_name, band=None, src_crs=None, window=None, geometry=None,
 
     return dst_meta, intensity.reshape(dst_shape)
 
+def read_raster_sparse(file_name, band=None, window=None, tile_pixels=RASTER_TILE_PIXELS,
+                       max_workers=1):
+    """Read raster of bands tile by tile into a sparse matrix and set 0 values to the
+    masked ones. Each band is an event. Equivalent to `read_raster` without geometry
+    and reprojection, but the data of all bands is never held in memory as a dense array.
+
+    Every band is read in horizontal strips of at most `tile_pixels` pixels that are
+    converted to sparse format right away. Strips can be decoded in parallel threads.
+
+    Parameters:
+        file_name (str): name of the file
+        band (list(int), optional): band number to read. Default: 1
+        window (rasterio.windows.Window, optional): window to read
+        tile_pixels (int, optional): maximum number of pixels decoded at once per
+            thread. Default: RASTER_TILE_PIXELS
+        max_workers (int, optional): number of threads used to decode the strips.
+            Default: 1
+
+    Returns:
+        dict (meta), sparse.csr_matrix (band x coordinates_in_1d)
+    """
+    if not band:
+        band = [1]
+    LOGGER.info('Reading %s', file_name)
+    if os.path.splitext(file_name)[1] == '.gz':
+        file_name = '/vsigzip/' + file_name
+
+    with rasterio.Env():
+        with rasterio.open(file_name, 'r') as src:
+            dst_meta = src.meta.copy()
+            if window:
+                trans = rasterio.windows.transform(window, src.transform)
+            else:
+                window = rasterio.windows.Window(0, 0, src.width, src.height)
+                trans = dst_meta['transform']
+    width, height = int(window.width), int(window.height)
+    dst_meta.update({
+        "height": height,
+        "width": width,
+        "transform": trans,
+    })
+    if not dst_meta['crs']:
+        dst_meta['crs'] = rasterio.crs.CRS.from_dict(DEF_CRS)
+
+    strip_rows = max(1, tile_pixels // max(1, width))
+    tasks = [(i_row, i_band, row_off) for i_row, i_band in enumerate(band)
+             for row_off in range(0, height, strip_rows)]
+
+    # rasterio datasets are not thread-safe: open one handle per thread
+    local = threading.local()
+    handles = []
+    def read_strip(task):
+        _, i_band, row_off = task
+        if not hasattr(local, 'src'):
+            local.src = rasterio.open(file_name, 'r')
+            handles.append(local.src)
+        win = rasterio.windows.Window(int(window.col_off), int(window.row_off) + row_off,
+                                      width, min(strip_rows, height - row_off))
+        strip = local.src.read(i_band, window=win, masked=True).filled(0).ravel()
+        idx = np.flatnonzero(strip)
+        return idx + row_off * width, strip[idx]
+
+    with rasterio.Env():
+        try:
+            if max_workers > 1:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    strips = list(executor.map(read_strip, tasks))
+            else:
+                strips = [read_strip(task) for task in tasks]
+        finally:
+            for src in handles:
+                src.close()
+
+    nnz_band = np.zeros(len(band), dtype=int)
+    for (i_row, _, _), (idx, _) in zip(tasks, strips):
+        nnz_band[i_row] += idx.size
+    indptr = np.concatenate([[0], np.cumsum(nnz_band)])
+    # tasks are ordered by band and row, as required by the CSR format
+    indices = np.concatenate([idx for idx, _ in strips]) if strips else np.array([], int)
+    data = np.concatenate([val for _, val in strips]) if strips else np.array([])
+    return dst_meta, sparse.csr_matrix((data, indices, indptr),
+                                       shape=(len(band), height * width))
+
 def read_raster_bounds(path, bounds, res=None, bands=None):
     """Read raster file within given bounds and refine to given resolution
 
@@ -1206,7 +1728,326 @@ def read_raster_bounds(path, bounds, res=None, bands=None):
             data = np.concatenate(data, axis=2)
     return data, transform
 
-def read_raster_sample(path, lat, lon, intermediate_res=None, method='linear', fill_value=None):
+def read_raster_zoomed_window(path, zoom_factor, rows, cols):
+    """Read a window of the first band of a raster file resized with
+    scipy.ndimage.zoom(data, zoom_factor, order=1), decoding only the source
+    pixels required to interpolate the window. Negative (nodata) values are
+    set to zero before the interpolation.
+
+    Parameters:
+        path (str): raster file (e.g. GeoTiff) to read
+        zoom_factor (float): zoom factor applied to the full raster
+        rows (tuple): first and last + 1 row of the window in the zoomed raster
+        cols (tuple): first and last + 1 column of the window in the zoomed
+            raster
+
+    Returns:
+        np.array: 2d window (clipped to the zoomed raster) with the dtype of
+        the file
+    """
+    with rasterio.open(path, 'r') as src:
+        shape_in = (src.height, src.width)
+        dtype = np.dtype(src.dtypes[0])
+        # source coordinates of the zoomed pixels, as in scipy.ndimage.zoom
+        coords, bounds = [], []
+        for n_in, (start, stop) in zip(shape_in, (rows, cols)):
+            n_out = int(round(n_in * zoom_factor))
+            scale = (n_in - 1) / (n_out - 1) if n_out > 1 else 1
+            coord = np.arange(max(int(start), 0), min(int(stop), n_out)) * scale
+            coords.append(coord)
+            if coord.size:
+                bounds.append((int(coord[0]), min(int(coord[-1]) + 2, n_in)))
+        if len(bounds) < 2:
+            return np.zeros((coords[0].size, coords[1].size), dtype=dtype)
+        data = src.read(1, window=rasterio.windows.Window(
+            bounds[1][0], bounds[0][0], bounds[1][1] - bounds[1][0],
+            bounds[0][1] - bounds[0][0])).astype(np.float64)
+    data[data < 0] = 0
+
+    idx0, idx1, frac = [], [], []
+    for coord, (start, stop) in zip(coords, bounds):
+        coord_0 = np.floor(coord).astype(int)
+        frac.append(coord - coord_0)
+        idx0.append(coord_0 - start)
+        idx1.append(np.minimum(coord_0 + 1, stop - 1) - start)
+    frac_r, frac_c = frac[0][:, None], frac[1][None, :]
+    data = ((1 - frac_r) * ((1 - frac_c) * data[np.ix_(idx0[0], idx0[1])]
+                            + frac_c * data[np.ix_(idx0[0], idx1[1])])
+            + frac_r * ((1 - frac_c) * data[np.ix_(idx1[0], idx0[1])]
+                        + frac_c * data[np.ix_(idx1[0], idx1[1])]))
+    # zoom sets samples beyond the last source pixel to zero (mode 'constant')
+    data[coords[0] > shape_in[0] - 1, :] = 0
+    data[:, coords[1] > shape_in[1] - 1] = 0
+    if np.issubdtype(dtype, np.integer):
+        data = np.floor(data + 0.5)
+    return data.astype(dtype)
+
+class RasterBlockCache():
+    """Least recently used blocks decoded by `RasterSampler` instances, within a
+    memory budget
+
+    Attributes:
+        max_bytes (int): memory budget in bytes
+        nbytes (int): memory of the cached blocks in bytes
+    """
+
+    def __init__(self, max_bytes=RASTER_BLOCK_CACHE_BYTES):
+        """Empty cache
+
+        Parameters:
+            max_bytes (int, optional): memory budget in bytes.
+                Default: RASTER_BLOCK_CACHE_BYTES
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def get(self, keys):
+        """Cached blocks among keys, marked as recently used
+
+        Parameters:
+            keys (list(tuple)): (sampler token, block id) of the blocks
+
+        Returns:
+            dict
+        """
+        blocks = dict()
+        with self._lock:
+            for key in keys:
+                if key in self._blocks:
+                    self._blocks.move_to_end(key)
+                    blocks[key] = self._blocks[key]
+        return blocks
+
+    def put(self, blocks, n_keep=0):
+        """Add blocks and evict the least recently used ones over the budget
+
+        Parameters:
+            blocks (dict): blocks to add, by key
+            n_keep (int, optional): number of most recently used blocks never
+                evicted. Default: 0
+        """
+        with self._lock:
+            for key, block in blocks.items():
+                if key not in self._blocks:
+                    self._blocks[key] = block
+                    self.nbytes += block.nbytes
+            while self.nbytes > self.max_bytes and len(self._blocks) > n_keep:
+                _, block = self._blocks.popitem(last=False)
+                self.nbytes -= block.nbytes
+
+    def remove(self, token):
+        """Remove the blocks of a sampler
+
+        Parameters:
+            token (int): sampler token
+        """
+        with self._lock:
+            for key in [key for key in self._blocks if key[0] == token]:
+                self.nbytes -= self._blocks.pop(key).nbytes
+
+
+_RASTER_BLOCK_CACHE = RasterBlockCache()
+"""Block cache shared by the samplers of `get_raster_sampler`"""
+
+
+class RasterSampler():
+    """Point sampler of a raster file band that keeps decoded blocks in memory
+
+    The raster (optionally resampled to an intermediate resolution, on a grid anchored
+    at the raster origin) is split in square blocks of `block_size` pixels. Only the
+    blocks needed by a query are read from disk and the least recently used blocks
+    are evicted once the decoded data exceeds the budget of the block cache, which
+    can be shared by several samplers.
+
+    Attributes:
+        path (str): path of the raster file
+        band (int): band that is sampled
+        transform (affine.Affine): transform of the sampled grid
+        shape (tuple): (height, width) of the sampled grid
+        nodata (numeric): nodata value of the raster file
+        block_size (int): size of the cached blocks in pixels
+        block_cache (RasterBlockCache): cache of the decoded blocks
+    """
+
+    _tokens = itertools.count()
+
+    def __init__(self, path, intermediate_res=None, band=1, block_size=RASTER_BLOCK_SIZE,
+                 cache_bytes=RASTER_BLOCK_CACHE_BYTES, block_cache=None):
+        """Initialize the sampler from the file's metadata (no raster data is read)
+
+        Parameters:
+            path (str): path of the raster file
+            intermediate_res (float, optional): If given, the raster is not sampled in its
+                original resolution but in the given one (nearest neighbor resampling).
+            band (int, optional): band to sample. Default: 1
+            block_size (int, optional): size of the cached blocks in pixels.
+                Default: RASTER_BLOCK_SIZE
+            cache_bytes (int, optional): memory budget of the block cache in bytes,
+                if block_cache is not given. Default: RASTER_BLOCK_CACHE_BYTES
+            block_cache (RasterBlockCache, optional): block cache shared with other
+                samplers. Default: own cache of cache_bytes
+        """
+        self.path = path
+        if os.path.splitext(path)[1] == '.gz':
+            self.path = '/vsigzip/' + path
+        self.band = band
+        self.block_size = block_size
+        self.block_cache = RasterBlockCache(cache_bytes) if block_cache is None \
+            else block_cache
+        self._token = next(self._tokens)
+        with rasterio.open(self.path, 'r') as src:
+            self.src_transform = src.transform
+            self.nodata = src.nodata
+            if intermediate_res is None:
+                self.transform = src.transform
+                self.shape = (src.height, src.width)
+            else:
+                xres, yres = np.abs(src.transform[0]), np.abs(src.transform[4])
+                self.transform = rasterio.Affine(
+                    np.sign(src.transform[0]) * intermediate_res, 0, src.transform[2],
+                    0, np.sign(src.transform[4]) * intermediate_res, src.transform[5])
+                self.shape = (int(np.ceil(src.height * yres / intermediate_res)),
+                              int(np.ceil(src.width * xres / intermediate_res)))
+        self._intermediate_res = intermediate_res
+        self._n_blocks_x = int(np.ceil(self.shape[1] / block_size))
+
+    def clear(self):
+        """Remove the blocks of this sampler from the cache"""
+        self.block_cache.remove(self._token)
+
+    def _read_block(self, src, block_id):
+        """Decode a single block from the open raster file"""
+        row_off = (block_id // self._n_blocks_x) * self.block_size
+        col_off = (block_id % self._n_blocks_x) * self.block_size
+        shape = (min(self.block_size, self.shape[0] - row_off),
+                 min(self.block_size, self.shape[1] - col_off))
+        if self._intermediate_res is None:
+            win = rasterio.windows.Window(col_off, row_off, shape[1], shape[0])
+            return src.read(self.band, window=win)
+        fact_x = self._intermediate_res / np.abs(self.src_transform[0])
+        fact_y = self._intermediate_res / np.abs(self.src_transform[4])
+        win = rasterio.windows.Window(col_off * fact_x, row_off * fact_y,
+                                      shape[1] * fact_x, shape[0] * fact_y)
+        return src.read(self.band, window=win, out_shape=shape, boundless=True,
+                        fill_value=self.nodata)
+
+    def _load_blocks(self, block_ids):
+        """Return the requested blocks, reading the missing ones from disk"""
+        keys = [(self._token, block_id) for block_id in block_ids]
+        blocks = self.block_cache.get(keys)
+        missing = [key for key in keys if key not in blocks]
+        if missing:
+            with rasterio.open(self.path, 'r') as src:
+                for key in missing:
+                    blocks[key] = self._read_block(src, key[1])
+        # blocks of the current query are kept even if the budget is exceeded
+        self.block_cache.put({key: blocks[key] for key in missing}, len(keys))
+        return {key[1]: block for key, block in blocks.items()}
+
+    def _gather(self, rows, cols):
+        """Values of the pixels at integer row and column indices"""
+        block_ids = ((rows // self.block_size) * self._n_blocks_x
+                     + cols // self.block_size)
+        uni_ids, inv = np.unique(block_ids, return_inverse=True)
+        blocks = self._load_blocks(uni_ids.tolist())
+        values = np.zeros(rows.shape, dtype=np.float64)
+        for i_block, block_id in enumerate(uni_ids):
+            msk = (inv == i_block)
+            values[msk] = blocks[block_id][rows[msk] % self.block_size,
+                                           cols[msk] % self.block_size]
+        return values
+
+    def sample(self, lat, lon, method='linear', fill_value=None):
+        """Sample the raster at the given points
+
+        Parameters:
+            lat (np.array): latitudes in file's CRS
+            lon (np.array): longitudes in file's CRS
+            method (str, optional): The interpolation method, 'linear' or 'nearest'.
+                Default: 'linear'.
+            fill_value (numeric, optional): The value used outside of the raster
+                bounds and for nodata pixels. Default: The raster's nodata value or 0.
+
+        Returns:
+            np.array of same length as lat
+        """
+        lat, lon = [np.asarray(ar, dtype=np.float64).ravel() for ar in [lat, lon]]
+        replace_nodata = fill_value is not None and self.nodata is not None
+        if fill_value is None:
+            fill_value = self.nodata
+        fill_value = fill_value if fill_value else 0
+
+        row = (lat - self.transform[5]) / self.transform[4]
+        col = (lon - self.transform[2]) / self.transform[0]
+        values = np.full(lat.shape, fill_value, dtype=np.float64)
+        inside = (row >= 0) & (row <= self.shape[0]) & (col >= 0) & (col <= self.shape[1])
+        if not np.any(inside):
+            return values
+        row, col = row[inside], col[inside]
+
+        if method == 'nearest':
+            rows = np.clip(np.floor(row).astype(int), 0, self.shape[0] - 1)[None]
+            cols = np.clip(np.floor(col).astype(int), 0, self.shape[1] - 1)[None]
+            weights = np.ones((1, row.size))
+        elif method == 'linear':
+            row, col = row - 0.5, col - 0.5
+            row0 = np.clip(np.floor(row).astype(int), 0, max(0, self.shape[0] - 2))
+            col0 = np.clip(np.floor(col).astype(int), 0, max(0, self.shape[1] - 2))
+            frow = np.clip(row - row0, 0, 1)
+            fcol = np.clip(col - col0, 0, 1)
+            row1 = np.minimum(row0 + 1, self.shape[0] - 1)
+            col1 = np.minimum(col0 + 1, self.shape[1] - 1)
+            rows = np.stack([row0, row0, row1, row1])
+            cols = np.stack([col0, col1, col0, col1])
+            weights = np.stack([(1 - frow) * (1 - fcol), (1 - frow) * fcol,
+                                frow * (1 - fcol), frow * fcol])
+        else:
+            LOGGER.error('Interpolation method not supported: %s', method)
+            raise ValueError
+
+        pix_values = self._gather(rows.ravel(), cols.ravel()).reshape(rows.shape)
+        if replace_nodata:
+            pix_values[pix_values == self.nodata] = fill_value
+        pix_values[np.isnan(pix_values)] = fill_value
+        values[inside] = (weights * pix_values).sum(axis=0)
+        return values
+
+def get_raster_sampler(path, intermediate_res=None):
+    """Get the block cached sampler of the first band of a raster file
+
+    Samplers are kept in memory, so that repeated sampling from the same file reuses
+    the blocks that have already been read. A file modified since is sampled again.
+    All these samplers share one block cache of RASTER_BLOCK_CACHE_BYTES.
+
+    Parameters:
+        path (str): path of the raster file
+        intermediate_res (float, optional): If given, the raster is not sampled in its
+            original resolution but in the given one.
+
+    Returns:
+        RasterSampler
+    """
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    key = (abs_path, stat.st_mtime_ns, stat.st_size, intermediate_res)
+    with _RASTER_SAMPLER_LOCK:
+        if key not in _RASTER_SAMPLER_CACHE:
+            # drop the samplers of older versions of the file
+            for old_key in [old_key for old_key in _RASTER_SAMPLER_CACHE
+                            if old_key[0] == abs_path and old_key[3] == intermediate_res]:
+                _RASTER_SAMPLER_CACHE.pop(old_key).clear()
+            _RASTER_BLOCK_CACHE.max_bytes = RASTER_BLOCK_CACHE_BYTES
+            _RASTER_SAMPLER_CACHE[key] = RasterSampler(
+                path, intermediate_res=intermediate_res, block_cache=_RASTER_BLOCK_CACHE)
+        return _RASTER_SAMPLER_CACHE[key]
+
+def read_raster_sample(path, lat, lon, intermediate_res=None, method='linear', fill_value=None,
+                       cached=True):
     """Read point samples from raster file
 
     Parameters:
@@ -1220,6 +2061,10 @@ def read_raster_sample(path, lat, lon, intermediate_res=None, method='linear', f
             scipy.interp.interpn. Default: 'linear'.
         fill_value (numeric, optional): The value used outside of the raster
             bounds. Default: The raster's nodata value or 0.
+        cached (bool, optional): If True, intermediate_res is not given and method is
+            'linear' or 'nearest', sample through the block cache of
+            `get_raster_sampler` instead of reading a window of the file (the
+            intermediate grid is aligned with that window). Default: True
 
     Returns:
         np.array of same length as lat
@@ -1227,6 +2072,11 @@ def read_raster_sample(path, lat, lon, intermediate_res=None, method='linear', f
     if lat.size == 0:
         return np.zeros_like(lat)
 
+    if cached and intermediate_res is None and method in ['linear', 'nearest']:
+        LOGGER.info('Sampling from %s', path)
+        return get_raster_sampler(path, intermediate_res).sample(
+            lat, lon, method=method, fill_value=fill_value)
+
     LOGGER.info('Sampling from %s', path)
     if os.path.splitext(path)[1] == '.gz':
         path = '/vsigzip/' + path
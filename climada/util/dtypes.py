@@ -0,0 +1,128 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Define dtype profiles used to store hazard, centroids and impact arrays.
+
+The profile is selected with the "dtype_profile" key of the "global" section
+of the configuration file ("default" if not given):
+
+- "default": arrays are kept as created (float64 values, int64 ids, int32 or
+  int64 sparse indices depending on SciPy).
+- "compact": float32 values, int32 ids, dates and sparse indices and uint16
+  region ids. This halves the memory of large hazards. float32 has about 7
+  significant digits: intensities, fractions and impacts have a relative
+  error below 1e-7 each. Impacts are accumulated in float64 and only stored
+  in float32, and aai_agg stays float64. Coordinates are kept as they are.
+  Sparse matrices with more than 2**31 - 1 non-zero values keep their int64
+  indices.
+"""
+import logging
+import numpy as np
+from scipy import sparse
+
+from climada.util.config import CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+DTYPE_PROFILES = {
+    'default': {'float': None, 'int': None, 'index': None, 'region_id': None},
+    'compact': {'float': np.float32, 'int': np.int32, 'index': np.int32,
+                'region_id': np.uint16},
+}
+"""dtypes for every kind of array and profile. None keeps the dtype unchanged."""
+
+def get_profile():
+    """Get name of the dtype profile set in the configuration.
+
+    Returns:
+        str
+    """
+    profile = CONFIG['global'].get('dtype_profile', 'default')
+    if profile not in DTYPE_PROFILES:
+        LOGGER.error('Unknown dtype profile %s. Possible values: %s.', profile,
+                     list(DTYPE_PROFILES.keys()))
+        raise ValueError
+    return profile
+
+def get_dtype(kind, profile=None):
+    """Get dtype of a kind of array in a profile.
+
+    Parameters:
+        kind (str): 'float', 'int', 'index' or 'region_id'
+        profile (str, optional): profile name. Default: configuration value
+
+    Returns:
+        np.dtype or None (keep dtype)
+    """
+    if profile is None:
+        profile = get_profile()
+    return DTYPE_PROFILES[profile][kind]
+
+def cast_array(array, kind, profile=None):
+    """Cast array to the dtype of its kind in a profile. No copy is made if
+    the dtype is unchanged.
+
+    Parameters:
+        array (np.array): array to cast
+        kind (str): 'float', 'int', 'index' or 'region_id'
+        profile (str, optional): profile name. Default: configuration value
+
+    Returns:
+        np.array
+    """
+    dtype = get_dtype(kind, profile)
+    if dtype is None or not isinstance(array, np.ndarray) or not array.size:
+        return array
+    return array.astype(dtype, copy=False)
+
+def cast_sparse(matrix, profile=None):
+    """Cast data and (if they fit) indices of a CSR matrix to a profile, in
+    place.
+
+    Parameters:
+        matrix (sparse.csr_matrix): matrix to cast
+        profile (str, optional): profile name. Default: configuration value
+
+    Returns:
+        sparse.csr_matrix
+    """
+    if not isinstance(matrix, sparse.csr_matrix):
+        return matrix
+    matrix.data, matrix.indices, matrix.indptr = cast_sparse_arrays(matrix, profile)
+    return matrix
+
+def cast_sparse_arrays(matrix, profile=None):
+    """Data, indices and index pointers of a CSR matrix cast to a profile, as
+    cast_sparse, but without modifying the matrix. No copy is made of the
+    arrays whose dtype is unchanged.
+
+    Parameters:
+        matrix (sparse.csr_matrix): matrix to cast
+        profile (str, optional): profile name. Default: configuration value
+
+    Returns:
+        np.array (data), np.array (indices), np.array (indptr)
+    """
+    data = cast_array(matrix.data, 'float', profile)
+    indices, indptr = matrix.indices, matrix.indptr
+    idx_dtype = get_dtype('index', profile)
+    if idx_dtype is not None and max(matrix.nnz, max(matrix.shape)) \
+    <= np.iinfo(idx_dtype).max:
+        indices = indices.astype(idx_dtype, copy=False)
+        indptr = indptr.astype(idx_dtype, copy=False)
+    return data, indices, indptr
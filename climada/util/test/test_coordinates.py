@@ -19,19 +19,23 @@ with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
 Test coordinates module.
 """
 
+import os
+import tempfile
+
 from cartopy.io import shapereader
 from fiona.crs import from_epsg
 import geopandas as gpd
 import unittest
 import numpy as np
+from scipy import ndimage
 import shapely
 import geopandas
-from shapely.geometry import box
+from shapely.geometry import box, LineString
 from rasterio.windows import Window
 from rasterio.warp import Resampling
 from rasterio import Affine
 
-from climada.util.constants import HAZ_DEMO_FL, DEF_CRS
+from climada.util.constants import HAZ_DEMO_FL, DEF_CRS, ONE_LAT_KM
 from climada.util.coordinates import convert_wgs_to_utm, \
                                      coord_on_land, \
                                      dist_approx, \
@@ -39,6 +43,7 @@ from climada.util.coordinates import convert_wgs_to_utm, \
                                      dist_to_coast_nasa, \
                                      equal_crs, \
                                      get_admin1_info, \
+                                     get_land_raster, \
                                      get_coastlines, \
                                      get_country_code, \
                                      get_country_geometries, \
@@ -51,12 +56,27 @@ from climada.util.coordinates import convert_wgs_to_utm, \
                                      nat_earth_resolution, \
                                      points_to_raster, \
                                      pts_to_raster_meta, \
-                                     read_raster, \
-                                     read_raster_sample, \
+                                     read_raster, read_raster_sparse, \
+                                     read_raster_sample, RasterSampler, \
+                                     RasterBlockCache, get_raster_sampler, \
                                      read_raster_bounds, \
+                                     read_raster_zoomed_window, \
                                      read_vector, \
                                      refine_raster_data, \
                                      set_df_geometry_points, \
+                                     write_raster, \
+                                     _densify_lines, \
+                                     _country_shapes, \
+                                     _rasterize_country_shapes, \
+                                     _raster_pixels, \
+                                     _RASTER_SAMPLER_CACHE, \
+                                     _raster_sample_bilinear, \
+                                     _raster_sample_nearest, \
+                                     COUNTRY_AMBIGUOUS, \
+                                     LAND_CLS_COAST, \
+                                     LAND_CLS_LAND, \
+                                     LAND_CLS_SEA, \
+                                     NE_CRS, \
                                      NE_EPSG
 
 class TestFunc(unittest.TestCase):
@@ -145,6 +165,26 @@ class TestFunc(unittest.TestCase):
             # longitude from 179 to -179 is positive (!) in lon-direction
             self.assertTrue(np.all(vec[1, :] > 100))
 
+        # precomputed geospherical vectors
+        data = np.array([
+            [45.5, -32.2, 14, 56],
+            [-13, 179, 5, -179],
+            [10, 20, 10.00001, 20],
+            [0, 0, 0, 0],
+        ])
+        geosph1 = latlon_to_geosph_vector(data[:, None, 0], data[:, None, 1], basis=True)
+        geosph2 = latlon_to_geosph_vector(data[:, None, 2], data[:, None, 3], basis=True)
+        dist, vec = dist_approx(data[:, None, 0], data[:, None, 1], data[:, None, 2],
+                                data[:, None, 3], log=True, method="geosphere")
+        dist_vec, vec_vec = dist_approx(data[:, None, 0], data[:, None, 1],
+                                        data[:, None, 2], data[:, None, 3], log=True,
+                                        method="geosphere", geosph1=geosph1,
+                                        geosph2=geosph2)
+        self.assertTrue(np.allclose(dist, dist_vec, rtol=1e-9, atol=1e-9))
+        self.assertTrue(np.allclose(vec, vec_vec, rtol=1e-9, atol=1e-9))
+        self.assertAlmostEqual(dist_vec[2, 0, 0], 1e-5 * ONE_LAT_KM)
+        self.assertEqual(dist_vec[3, 0, 0], 0)
+
 
     def test_read_vector_pass(self):
         """Test one columns data"""
@@ -184,6 +224,15 @@ class TestFunc(unittest.TestCase):
         self.assertTrue(np.allclose(df_val.geometry[:].x.values, np.ones(10) * 0.5))
         self.assertTrue(np.allclose(df_val.geometry[:].y.values, np.ones(10) * 40.))
 
+    def test_densify_lines_pass(self):
+        """Test densification of coast lines"""
+        lines = [LineString([(0, 0), (1, 0), (1, 0.25)])]
+        points = _densify_lines(lines, 0.3)
+        self.assertEqual(points.shape, (6, 2))
+        np.testing.assert_allclose(points[:, 0], [0, 0.25, 0.5, 0.75, 1, 1])
+        np.testing.assert_allclose(points[:, 1], [0, 0, 0, 0, 0, 0.25])
+        self.assertTrue(np.all(np.hypot(*np.diff(points, axis=0).T) <= 0.3))
+
     def test_convert_wgs_to_utm_pass(self):
         """Test convert_wgs_to_utm"""
         lat, lon = 17.346597, -62.768669
@@ -458,6 +507,36 @@ class TestRasterMeta(unittest.TestCase):
         self.assertEqual(hei, 5)
         self.assertEqual(wid, 4)
 
+    def test_rasterize_country_shapes_pass(self):
+        """Test rasterization of country shapes with ambiguous border pixels"""
+        countries = gpd.GeoDataFrame({
+            'region_id': [1, 2, 3],
+            'geometry': [box(0, 0, 4, 4), box(4, 0, 10, 4), box(7, 0, 10, 4)],
+        })
+        # ascending area as returned by _country_shapes
+        countries = countries.iloc[[2, 0, 1]]
+        codes, transform = _rasterize_country_shapes(countries, (0, 0, 12, 4), 0.5)
+        self.assertEqual(codes.shape, (8, 24))
+        self.assertEqual(transform, Affine(0.5, 0, 0, 0, -0.5, 4))
+        # interior pixels
+        self.assertEqual(codes[4, 3], 1)
+        self.assertEqual(codes[4, 11], 2)
+        self.assertEqual(codes[4, 22], 0)
+        # larger country wins where shapes overlap
+        self.assertEqual(codes[4, 16], 2)
+        # pixels at borders and their neighbours are ambiguous
+        np.testing.assert_array_equal(codes[4, 7:10], COUNTRY_AMBIGUOUS)
+        np.testing.assert_array_equal(codes[4, 13:16], COUNTRY_AMBIGUOUS)
+        np.testing.assert_array_equal(codes[0, :22], COUNTRY_AMBIGUOUS)
+
+    def test_country_shapes_pass(self):
+        """Test that the country shapes are read once, sorted by area"""
+        countries = _country_shapes(resolution=110)
+        self.assertIs(_country_shapes(resolution=110), countries)
+        self.assertEqual(list(countries.columns), ['geometry', 'region_id'])
+        self.assertTrue(np.all(np.diff(countries.geometry.area) >= 0))
+        self.assertIn(756, countries.region_id.values)
+
     def test_get_resolution_pass(self):
         """Test _get_resolution method"""
         lat = np.array([13.125, 13.20833333, 13.29166667, 13.125,
@@ -524,6 +603,26 @@ class TestRasterMeta(unittest.TestCase):
         self.assertEqual(meta['width'], 5)
 
 class TestRasterIO(unittest.TestCase):
+    def test_read_raster_zoomed_window_pass(self):
+        """test read_raster_zoomed_window against zooming the full raster"""
+        rng = np.random.RandomState(0)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'test.tif')
+            for dtype in [np.uint8, np.float32]:
+                data = (rng.rand(301, 457) * 255).astype(dtype)
+                write_raster(path, data, {
+                    'crs': DEF_CRS, 'height': 301, 'width': 457,
+                    'transform': Affine(1, 0, -180, 0, -1, 90),
+                }, dtype=dtype)
+                for zoom_factor in [1, 0.5, 0.1, 2]:
+                    zoomed = ndimage.zoom(data, zoom_factor, order=1)
+                    for rows, cols in [((0, 1000), (0, 1000)), ((3, 40), (17, 90)),
+                                       ((zoomed.shape[0] - 5, zoomed.shape[0] + 3), (0, 7))]:
+                        window = read_raster_zoomed_window(path, zoom_factor, rows, cols)
+                        self.assertEqual(window.dtype, dtype)
+                        np.testing.assert_array_equal(
+                            window, zoomed[rows[0]:rows[1], cols[0]:cols[1]])
+
     def test_window_raster_pass(self):
         """Test window"""
         meta, inten_ras = read_raster(HAZ_DEMO_FL, window=Window(10, 20, 50.1, 60))
@@ -539,6 +638,24 @@ class TestRasterIO(unittest.TestCase):
         self.assertEqual(inten_ras.shape, (1, 60 * 50))
         self.assertAlmostEqual(inten_ras.reshape((60, 50))[25, 12], 0.056825936)
 
+    def test_read_raster_sparse_pass(self):
+        """Test tiled sparse reading against dense reading"""
+        meta, inten_ras = read_raster(HAZ_DEMO_FL)
+        meta_sp, inten_sp = read_raster_sparse(HAZ_DEMO_FL, tile_pixels=1000, max_workers=2)
+        self.assertEqual(meta_sp['crs'], meta['crs'])
+        self.assertEqual(meta_sp['transform'], meta['transform'])
+        self.assertEqual(meta_sp['height'], meta['height'])
+        self.assertEqual(meta_sp['width'], meta['width'])
+        self.assertEqual(inten_sp.shape, inten_ras.shape)
+        self.assertTrue(np.array_equal(inten_sp.toarray(), inten_ras))
+
+        window = Window(10, 20, 50, 60)
+        meta, inten_ras = read_raster(HAZ_DEMO_FL, window=window)
+        meta_sp, inten_sp = read_raster_sparse(HAZ_DEMO_FL, window=window, tile_pixels=120)
+        self.assertEqual(meta_sp['transform'], meta['transform'])
+        self.assertEqual(inten_sp.shape, (1, 60 * 50))
+        self.assertTrue(np.array_equal(inten_sp.toarray(), inten_ras))
+
     def test_poly_raster_pass(self):
         """Test geometry"""
         poly = box(-69.2471495969998, 9.708220966978912, -68.79714959699979, 10.248220966978932)
@@ -643,6 +760,137 @@ class TestRasterIO(unittest.TestCase):
         for i, val in enumerate(i_j_vals[:, 2]):
             self.assertAlmostEqual(values[i], val)
 
+    def test_raster_sampler_pass(self):
+        """Test block cached sampling against window based sampling"""
+        meta, _ = read_raster(HAZ_DEMO_FL)
+        trans = meta['transform']
+        rng = np.random.RandomState(1)
+        lat = trans.f + trans.e * rng.uniform(-2, meta['height'] + 2, 500)
+        lon = trans.c + trans.a * rng.uniform(-2, meta['width'] + 2, 500)
+        sampler = RasterSampler(HAZ_DEMO_FL, block_size=16, cache_bytes=10 * 16**2 * 4)
+        for method in ['linear', 'nearest']:
+            values = sampler.sample(lat, lon, method=method, fill_value=0)
+            values_win = read_raster_sample(HAZ_DEMO_FL, lat, lon, method=method,
+                                            fill_value=0, cached=False)
+            np.testing.assert_allclose(values, values_win, atol=1e-6)
+        self.assertGreater(len(sampler.block_cache), 10)
+
+        # the cache is trimmed to the budget by small queries
+        sampler.sample(lat[:1], lon[:1])
+        self.assertLessEqual(sampler.block_cache.nbytes, sampler.block_cache.max_bytes)
+        sampler.clear()
+        self.assertEqual(len(sampler.block_cache), 0)
+
+    def test_raster_sampler_shared_cache_pass(self):
+        """Test that samplers sharing a block cache stay within its budget"""
+        meta, _ = read_raster(HAZ_DEMO_FL)
+        trans = meta['transform']
+        rng = np.random.RandomState(2)
+        lat = trans.f + trans.e * rng.uniform(0, meta['height'], 200)
+        lon = trans.c + trans.a * rng.uniform(0, meta['width'], 200)
+        block_cache = RasterBlockCache(10 * 16**2 * 4)
+        samplers = [RasterSampler(HAZ_DEMO_FL, block_size=16, block_cache=block_cache)
+                    for _ in range(2)]
+        for sampler in samplers:
+            sampler.sample(lat, lon)
+            sampler.sample(lat[:1], lon[:1])
+            self.assertLessEqual(block_cache.nbytes, block_cache.max_bytes)
+        samplers[0].clear()
+        samplers[1].clear()
+        self.assertEqual(len(block_cache), 0)
+        self.assertEqual(block_cache.nbytes, 0)
+
+    def test_read_raster_sample_intermediate_res_pass(self):
+        """Test sampling with intermediate resolution against the window based grid"""
+        lat = np.array([7.481, 7.985, 8.075, 8.678, 8.606, 8.624])
+        lon = np.array([-64.572, -68.775, -68.712, -68.136, -68.109, -68.253])
+        # values of the resampling grid aligned with the points' window
+        values_ref = [1.7994758, 0.29304432, 0.2065476, 0.31868189, 0.29369674, 0.465672]
+        values = read_raster_sample(HAZ_DEMO_FL, lat, lon, intermediate_res=0.025,
+                                    fill_value=0)
+        np.testing.assert_allclose(values, values_ref, rtol=1e-6)
+
+    def test_get_raster_sampler_modified_pass(self):
+        """Test that a modified file is sampled again"""
+        meta = {
+            'crs': DEF_CRS,
+            'height': 2,
+            'width': 2,
+            'transform': Affine(1, 0, 0, 0, -1, 2),
+        }
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'sampler.tif')
+            write_raster(path, np.ones((1, 4)), meta)
+            values = read_raster_sample(path, np.array([1.5]), np.array([0.5]))
+            self.assertEqual(values[0], 1)
+            write_raster(path, np.full((1, 4), 2.), meta)
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            values = read_raster_sample(path, np.array([1.5]), np.array([0.5]))
+            self.assertEqual(values[0], 2)
+            self.assertEqual(len([key for key in _RASTER_SAMPLER_CACHE
+                                  if key[0] == os.path.abspath(path)]), 1)
+            get_raster_sampler(path).clear()
+
+    def test_land_raster_sample(self):
+        """Test reading and sampling of land raster"""
+        land_cls = np.array([
+            [LAND_CLS_SEA, LAND_CLS_SEA, LAND_CLS_COAST],
+            [LAND_CLS_SEA, LAND_CLS_COAST, LAND_CLS_LAND],
+        ])
+        dist = np.array([
+            [3000, 2000, 0],
+            [2000, 0, -1000],
+        ])
+        meta = {
+            'crs': NE_CRS,
+            'height': 2,
+            'width': 3,
+            'transform': Affine(1, 0, -1.5, 0, -1, 1),
+        }
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'land_raster.tif')
+            write_raster(path, np.stack([dist.ravel(), land_cls.ravel()]), meta)
+            r_dist, r_land_cls, r_transform = get_land_raster(path=path)
+            self.assertIs(get_land_raster(path=path)[0], r_dist)
+        np.testing.assert_array_equal(r_land_cls, land_cls)
+        np.testing.assert_array_equal(r_dist, dist)
+        self.assertEqual(r_transform, meta['transform'])
+
+        lat = np.array([0.5, -0.5, 0.0, 0.7])
+        lon = np.array([-1.0, 1.0, -0.5, 358.5])
+        row, col = _raster_pixels(lat, lon, r_transform)
+        np.testing.assert_allclose(col, [0.5, 2.5, 1, 0])
+        np.testing.assert_allclose(row, [0.5, 1.5, 1, 0.3])
+        np.testing.assert_array_equal(_raster_sample_nearest(r_land_cls, row, col),
+                                      [LAND_CLS_SEA, LAND_CLS_LAND, LAND_CLS_COAST, LAND_CLS_SEA])
+        np.testing.assert_allclose(_raster_sample_bilinear(r_dist, row, col),
+                                   [3000, -1000, 1750, 3000])
+
+    def test_raster_sample_bilinear_wrap(self):
+        """Test bilinear sampling across the antimeridian of a global raster"""
+        data = np.array([
+            [0.0, 10.0, 20.0, 40.0],
+            [0.0, 10.0, 20.0, 40.0],
+        ])
+        transform = Affine(90, 0, -180, 0, -90, 90)
+        lat = np.zeros(4)
+        lon = np.array([-180.0, 180.0, -157.5, 157.5])
+        row, col = _raster_pixels(lat, lon, transform)
+        np.testing.assert_allclose(_raster_sample_bilinear(data, row, col, wrap_cols=True),
+                                   [20, 20, 10, 30])
+        np.testing.assert_allclose(_raster_sample_bilinear(data, row, col),
+                                   [40, 40, 0, 40])
+
+    def test_coord_on_land_gridded_geom(self):
+        """Test that a given land geometry is used for all points if gridded"""
+        land_geom = box(-30, -30, -29, -29)
+        lat = np.array([-29.5, -29.9, -28.5, -31])
+        lon = np.array([-29.5, -29.1, -29.5, -29.5])
+        np.testing.assert_array_equal(
+            coord_on_land(lat, lon, land_geom=land_geom, gridded=True),
+            [True, True, False, False])
+
     def test_refine_raster(self):
         """Test refinement of given raster data"""
         data = np.array([
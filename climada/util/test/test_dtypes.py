@@ -0,0 +1,80 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Test dtypes module.
+"""
+import unittest
+import numpy as np
+from scipy import sparse
+
+from climada.util.config import CONFIG
+import climada.util.dtypes as u_dtype
+
+class TestProfile(unittest.TestCase):
+    """Test dtype profiles"""
+
+    def tearDown(self):
+        CONFIG['global']['dtype_profile'] = 'default'
+
+    def test_default_pass(self):
+        """Default profile keeps arrays unchanged"""
+        self.assertEqual(u_dtype.get_profile(), 'default')
+        array = np.arange(5, dtype=float)
+        self.assertIs(u_dtype.cast_array(array, 'float'), array)
+        mat = sparse.csr_matrix(np.eye(3))
+        data, indices, indptr = u_dtype.cast_sparse_arrays(mat)
+        self.assertIs(data, mat.data)
+        self.assertIs(indices, mat.indices)
+        self.assertIs(indptr, mat.indptr)
+        mat = u_dtype.cast_sparse(mat)
+        self.assertEqual(mat.dtype, np.float64)
+
+    def test_compact_pass(self):
+        """Compact profile casts values, ids and indices"""
+        CONFIG['global']['dtype_profile'] = 'compact'
+        self.assertEqual(u_dtype.cast_array(np.arange(5, dtype=float), 'float').dtype,
+                         np.float32)
+        self.assertEqual(u_dtype.cast_array(np.arange(5), 'int').dtype, np.int32)
+        self.assertEqual(u_dtype.cast_array(np.array([4, 894]), 'region_id').dtype,
+                         np.uint16)
+        mat = sparse.csr_matrix(np.array([[0, 1.5], [2.5, 0]]))
+        mat.indices = mat.indices.astype(np.int64)
+        mat.indptr = mat.indptr.astype(np.int64)
+        data, indices, _ = u_dtype.cast_sparse_arrays(mat)
+        self.assertEqual(data.dtype, np.float32)
+        self.assertEqual(indices.dtype, np.int32)
+        self.assertEqual(mat.dtype, np.float64)
+        self.assertEqual(mat.indices.dtype, np.int64)
+        mat = u_dtype.cast_sparse(mat)
+        self.assertEqual(mat.dtype, np.float32)
+        self.assertEqual(mat.indices.dtype, np.int32)
+        self.assertEqual(mat.indptr.dtype, np.int32)
+        self.assertTrue(np.array_equal(mat.toarray(), np.array([[0, 1.5], [2.5, 0]])))
+
+    def test_wrong_fail(self):
+        """Unknown profile raises ValueError"""
+        CONFIG['global']['dtype_profile'] = 'half'
+        with self.assertLogs('climada.util.dtypes', level='ERROR') as cm:
+            with self.assertRaises(ValueError):
+                u_dtype.get_dtype('float')
+        self.assertIn('Unknown dtype profile half', cm.output[0])
+
+# Execute Tests
+if __name__ == "__main__":
+    TESTS = unittest.TestLoader().loadTestsFromTestCase(TestProfile)
+    unittest.TextTestRunner(verbosity=2).run(TESTS)